@@ -0,0 +1,221 @@
+import ast
+import functools
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import Config
+from stage_catalog import SEARCH_METHOD_PRIORITY
+
+ARTIFACT_STORE_DIRNAME = "artifacts"
+HASH_CACHE_FILENAME = "hash_cache.json"
+HASH_BLOCK_SIZE = 1 << 20
+
+SCRIPT_DIR = Path(__file__).parent
+
+"""
+各 stage の出力を，コード・入力・パラメータの hash をキーにして content-addressed に保存する
+
+1. stage のキーを作成 (compute_stage_key)
+    - コード ... stage のスクリプトと，そこから import している同じ dir のモジュール (ast で再帰的に収集) の hash
+    - 入力 ... 入力ファイルの内容の hash (dir の場合は dir 内の全ファイルの相対パスと hash)
+        - ファイルの hash は (サイズ, 更新時刻) とともに hash_cache.json に保存し，変更がなければ読み直さない
+    - パラメータ ... Config.eligible_pub_year と SEARCH_METHOD_PRIORITY (stage_parameters)
+2. stage を実行した後，出力を内容の hash で objects/<hash> に保存 (store_outputs)
+    - 保存した出力の一覧を stages/<stage 名>/<キー>.json に記録
+    - いつものファイル名 (processed/db_search_records.parquet 等) は object への hard link にする
+        - symlink と異なり，git や Excel からは通常のファイルに見える
+3. 同じキーの記録があれば，stage を実行せずにいつものファイル名を object に張り直す (restore_outputs)
+    - 入力が変わっていない再実行や，以前のパラメータに戻した場合は link の張り直しのみで終わる
+    - object が記録時から変わっている (手で実行したスクリプトが link 越しに上書きした等) 場合は再実行
+4. stage を再実行する前に，出力を object から切り離す (detach_outputs)
+    - スクリプトが link 越しに書き込んで，保存済みの object を壊さないようにするため
+"""
+
+
+class ArtifactStore:
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.root = config.processed_data_dir / ARTIFACT_STORE_DIRNAME
+        self.hash_cache_path = self.root / HASH_CACHE_FILENAME
+        self.hash_cache: Dict[str, List] = {}
+        self.code_hashes: Dict[str, str] = {}
+
+        if self.hash_cache_path.exists():
+            self.hash_cache = json.loads(self.hash_cache_path.read_text())
+
+    def get_object_path(self, content_hash: str) -> Path:
+        return self.root / "objects" / content_hash[:2] / content_hash
+
+    def get_manifest_path(self, stage_name: str, stage_key: str) -> Path:
+        return self.root / "stages" / stage_name / f"{stage_key}.json"
+
+    def has_history(self, stage_name: str) -> bool:
+        return any((self.root / "stages" / stage_name).glob("*.json"))
+
+    def save_hash_cache(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.hash_cache_path.write_text(json.dumps(self.hash_cache))
+
+    def hash_file(self, path: Path) -> str:
+        stat = path.stat()
+        cache_key = str(path.resolve())
+        cached = self.hash_cache.get(cache_key)
+        if cached is not None and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+
+        self.hash_cache[cache_key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def hash_path(self, path: Path) -> Optional[str]:
+        if not path.exists():
+            return None
+        if path.is_file():
+            return self.hash_file(path)
+
+        digest = hashlib.sha256()
+        for child in sorted(child for child in path.rglob("*") if child.is_file()):
+            digest.update(f"{child.relative_to(path).as_posix()}:{self.hash_file(child)}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def hash_code(self, module_name: str) -> str:
+        if module_name not in self.code_hashes:
+            digest = hashlib.sha256()
+            for module_path in collect_local_modules(module_name):
+                digest.update(f"{module_path.name}:{self.hash_file(module_path)}\n".encode("utf-8"))
+            self.code_hashes[module_name] = digest.hexdigest()
+
+        return self.code_hashes[module_name]
+
+    def compute_stage_key(self, stage_name: str, input_paths: List[Path]) -> str:
+        key_source = {
+            "stage": stage_name,
+            "code": self.hash_code(stage_name),
+            "inputs": [[path.relative_to(self.config.processed_data_dir.parent).as_posix(), self.hash_path(path)]
+                       for path in input_paths],
+            "parameters": stage_parameters(self.config)
+        }
+
+        return hashlib.sha256(json.dumps(key_source, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def store_outputs(self, stage_name: str, stage_key: str, output_paths: List[Path]) -> None:
+        outputs = []
+        for output_path in output_paths:
+            if not output_path.is_file():
+                raise FileNotFoundError(f"{output_path} was not produced by {stage_name}")
+
+            content_hash = self.hash_file(output_path)
+            object_path = self.get_object_path(content_hash)
+            if not object_path.exists():
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                link_or_copy(output_path, object_path)
+            link_or_copy(object_path, output_path)
+
+            object_stat = object_path.stat()
+            outputs.append({
+                "path": output_path.relative_to(self.config.processed_data_dir.parent).as_posix(),
+                "hash": content_hash,
+                "size": object_stat.st_size,
+                "mtime_ns": object_stat.st_mtime_ns
+            })
+
+        manifest_path = self.get_manifest_path(stage_name, stage_key)
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps({"stage": stage_name, "key": stage_key, "outputs": outputs}, indent=4))
+
+    def restore_outputs(self, stage_name: str, stage_key: str) -> bool:
+        manifest_path = self.get_manifest_path(stage_name, stage_key)
+        if not manifest_path.exists():
+            return False
+        manifest = json.loads(manifest_path.read_text())
+
+        # object が記録時から変わっていないことを確認してから張り直す
+        object_paths = []
+        for output in manifest["outputs"]:
+            object_path = self.get_object_path(output["hash"])
+            if not object_path.exists():
+                return False
+            object_stat = object_path.stat()
+            if (object_stat.st_size, object_stat.st_mtime_ns) != (output["size"], output["mtime_ns"]):
+                return False
+            object_paths.append((object_path, self.config.processed_data_dir.parent / output["path"], output))
+
+        for object_path, output_path, output in object_paths:
+            link_or_copy(object_path, output_path)
+            # link 先の hash は分かっているので，次回は読み直さない
+            self.hash_cache[str(output_path.resolve())] = [output["size"], output["mtime_ns"], output["hash"]]
+        return True
+
+def stage_parameters(config: Config) -> Dict:
+    return {
+        "eligible_pub_year": config.eligible_pub_year,
+        "search_method_priority": SEARCH_METHOD_PRIORITY
+    }
+
+@functools.lru_cache(maxsize=None)
+def parse_imports(module_path: Path) -> Tuple[str, ...]:
+    # stage ごとに同じモジュールを何度も parse しないよう，1 回の実行の間は結果を使い回す
+    imported_names = []
+    for node in ast.walk(ast.parse(module_path.read_text(encoding="utf-8"))):
+        if isinstance(node, ast.Import):
+            imported_names += [alias.name.split(".")[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module is not None and node.level == 0:
+            imported_names.append(node.module.split(".")[0])
+
+    return tuple(imported_names)
+
+def collect_local_modules(module_name: str) -> List[Path]:
+    # スクリプトから import している同じ dir のモジュールを再帰的に集める
+    visited: Set[str] = set()
+    stack = [module_name]
+    while stack:
+        name = stack.pop()
+        module_path = SCRIPT_DIR / f"{name}.py"
+        if name in visited or not module_path.exists():
+            continue
+        visited.add(name)
+        stack += parse_imports(module_path)
+
+    return sorted(SCRIPT_DIR / f"{name}.py" for name in visited)
+
+def link_or_copy(source_path: Path, target_path: Path) -> None:
+    if target_path.exists() and os.path.samefile(source_path, target_path):
+        return
+
+    # 一時ファイルに link してから置き換えるため，途中で止まっても target が壊れない
+    temp_path = target_path.with_name(f".{target_path.name}.tmp")
+    temp_path.unlink(missing_ok=True)
+    try:
+        os.link(source_path, temp_path)
+    except OSError: # hard link を作れないファイルシステムではコピー
+        shutil.copy2(source_path, temp_path)
+    os.replace(temp_path, target_path)
+
+def detach_outputs(output_paths: List[Path]) -> None:
+    for output_path in output_paths:
+        if output_path.is_file() and output_path.stat().st_nlink > 1:
+            temp_path = output_path.with_name(f".{output_path.name}.tmp")
+            shutil.copy2(output_path, temp_path)
+            os.replace(temp_path, output_path)
+
+def main() -> None:
+    config = Config()
+    store = ArtifactStore(config)
+
+    stage_dirs = sorted((store.root / "stages").glob("*")) if store.root.exists() else []
+    for stage_dir in stage_dirs:
+        print(f"{stage_dir.name}: {len(list(stage_dir.glob('*.json')))} versions were stored")
+
+    object_paths = [path for path in (store.root / "objects").rglob("*") if path.is_file()] if stage_dirs else []
+    print(f"{len(object_paths)} objects ({sum(path.stat().st_size for path in object_paths) / 2**20:.1f} MB) in total")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import argparse
+import dataclasses
+import re
+import unicodedata
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from config import Config
+from record_export import read_records
+from record_schema import TEXT_DTYPE
+from source_adapters import SOURCE_ADAPTERS
+
+AUTHOR_SEPARATOR = ";"
+DEFAULT_AUTHOR_FORMAT = "comma" # scrape_*.py の結果等，search_method が adapter にない source
+
+COMMA_SEPARATOR_PATTERN = re.compile(r"\s*(?:[,，、;]|\band\b|&)\s*")
+INITIAL_SEPARATOR_PATTERN = re.compile(r"[\s.\-‐]+")
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+ELLIPSIS_PATTERN = re.compile(r"\.\.\.|…")
+
+"""
+source ごとに形式の異なる著者の文字列を (姓, イニシャル) のリストに変換し，姓の転置 index を作成する
+
+1. search_method から著者の形式を決め (SourceAdapter.author_format)，形式ごとに分割・解析 (parse_authors)
+    - comma ... "First Last, First Last" / "A and B" (Semantic Scholar, Google Scholar, scrape_*.py)
+    - semicolon ... "Last, First;Last, First" (ProQuest, EBSCO, RIS)，"," のない名前は "First Last" として扱う
+    - apa ... "Last, F., & Last, F. M." (convert_apa_2_meta_info)
+2. 1 人ずつ "姓 イニシャル" (アクセント・記号を除いて casefold) に正規化し，";" で連結した 1 つの文字列として保持
+    - 例: "Hirotani, Maki; Lyddon, Paul A." → "hirotani m;lyddon pa"
+    - 同じ (形式, 著者の文字列) は 1 度だけ解析する
+3. 姓 → レコードの位置の転置 index を作成 (build_author_index)
+    - 姓による照会・第一著者の比較は文字列の走査ではなく dict / 整数 code の比較で行う
+4. python author_index.py <姓> [--table <表>] で，その姓の著者を含むレコードを表示
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class AuthorIndex:
+    surnames: Dict[str, np.ndarray] # 姓 → レコードの位置 (昇順)
+
+    def lookup(self, surname: str) -> np.ndarray:
+        return self.surnames.get(fold_name(surname), np.empty(0, dtype=np.int64))
+
+def get_author_formats() -> Dict[str, str]:
+    # search_method → 著者の形式 (同じ search_method の adapter は同じ形式)
+    return {
+        adapter.constant_columns["search_method"]: adapter.author_format
+        for adapter in SOURCE_ADAPTERS.values() if "search_method" in adapter.constant_columns
+    }
+
+def fold_name(name: str) -> str:
+    # ラテン文字のアクセントを除き (Kẹ́hìndé → kehinde)，記号 (ハイフン・アポストロフィ等) を除いて casefold
+    # 仮名の濁点等も結合文字のため，直前が ASCII の文字の結合文字のみ除く
+    chars: List[str] = []
+    for char in unicodedata.normalize("NFKD", name):
+        if unicodedata.combining(char) and chars and chars[-1].isascii():
+            continue
+        chars.append(char)
+    name_folded = unicodedata.normalize("NFC", "".join(chars)).casefold()
+
+    return NON_WORD_PATTERN.sub("", name_folded)
+
+def get_initials(given_names: str) -> str:
+    return "".join(fold_name(token)[:1] for token in INITIAL_SEPARATOR_PATTERN.split(given_names))
+
+def parse_name(name: str) -> Tuple[str, str]:
+    if "," in name: # "Last, First"
+        surname, given_names = name.split(",", 1)
+    else: # "First Last" (空白のない名前は全体を姓とする)
+        tokens = name.split()
+        surname, given_names = tokens[-1], " ".join(tokens[:-1])
+
+    return fold_name(surname), get_initials(given_names)
+
+def split_apa_authors(authors: str) -> List[str]:
+    # "Last, F., & Last, F. M." は ", " で区切ると 姓, イニシャル, 姓, イニシャル ... の順になる
+    tokens = [token.strip() for token in authors.replace("&", ",").split(",")]
+    tokens = [token for token in tokens if token]
+
+    return [", ".join(tokens[idx:idx + 2]) for idx in range(0, len(tokens), 2)]
+
+def parse_authors(authors: str, author_format: str) -> List[Tuple[str, str]]:
+    authors = ELLIPSIS_PATTERN.sub("", authors) # "A, B, ... Z" / "木山幸子… " の省略記号
+
+    if author_format == "semicolon":
+        names = authors.split(";")
+    elif author_format == "apa":
+        names = split_apa_authors(authors)
+    else:
+        names = COMMA_SEPARATOR_PATTERN.split(authors)
+
+    parsed_names = [parse_name(name.strip()) for name in names if name.strip()]
+    return [(surname, initials) for surname, initials in parsed_names if surname]
+
+def canonicalize_authors(authors: str, author_format: str) -> str:
+    return AUTHOR_SEPARATOR.join(
+        f"{surname} {initials}".rstrip() for surname, initials in parse_authors(authors, author_format)
+    )
+
+def canonical_authors(df_records: pd.DataFrame) -> pd.Series:
+    author_formats = get_author_formats()
+    formats = df_records["search_method"].astype(str).map(author_formats).fillna(DEFAULT_AUTHOR_FORMAT)
+    authors = df_records["authors"].astype(TEXT_DTYPE).fillna("").astype(str)
+
+    # 同じ (形式, 著者) の組は 1 度だけ解析
+    pair_codes, unique_pairs = pd.factorize(pd.Series(list(zip(formats, authors)), index=df_records.index))
+    canonical_values = np.array([
+        canonicalize_authors(author, author_format) for author_format, author in unique_pairs
+    ])
+
+    return pd.Series(canonical_values[pair_codes], index=df_records.index, dtype=TEXT_DTYPE)
+
+def first_author_surnames(canonical: pd.Series) -> pd.Series:
+    return canonical.str.split(AUTHOR_SEPARATOR).str[0].str.split(" ").str[0].fillna("")
+
+def build_author_index(canonical: pd.Series) -> AuthorIndex:
+    names = canonical.fillna("").str.split(AUTHOR_SEPARATOR)
+    df_names = pd.DataFrame({
+        "surname": names.explode().str.split(" ").str[0].to_numpy(dtype=object),
+        "position": np.repeat(np.arange(len(canonical)), names.str.len().to_numpy())
+    })
+    df_names = df_names[df_names["surname"].notna() & (df_names["surname"] != "")].drop_duplicates()
+
+    # code 順に並べ替えると，i 番目の区間が unique_surnames[i] の位置になる (同じ姓の位置は昇順のまま)
+    surname_codes, unique_surnames = pd.factorize(df_names["surname"])
+    order = np.argsort(surname_codes, kind="stable")
+    boundaries = np.nonzero(np.diff(surname_codes[order]))[0] + 1
+    positions = np.split(df_names["position"].to_numpy(dtype=np.int64)[order], boundaries)
+
+    return AuthorIndex(dict(zip(unique_surnames, positions)))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Look up records by an author's surname")
+    parser.add_argument("surnames", nargs="+")
+    parser.add_argument("--table", default="db_manual_search_records", help="record table to search")
+    args = parser.parse_args()
+
+    config = Config()
+    df_records = read_records(config, args.table)
+    author_index = build_author_index(canonical_authors(df_records))
+
+    for surname in args.surnames:
+        positions = author_index.lookup(surname)
+        print(f"{len(positions)} records by {surname} were found")
+        if len(positions) > 0:
+            print(df_records.iloc[positions][["authors", "year", "title"]].to_string())
+
+if __name__ == "__main__":
+    main()
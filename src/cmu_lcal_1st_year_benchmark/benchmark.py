@@ -0,0 +1,253 @@
+import argparse
+import dataclasses
+import json
+import platform
+import tempfile
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+import ancestry_search
+import convert_apa_2_meta_info
+import google_scholar_search
+import pandas as pd
+import scrape_applied_linguistics
+import scrape_intercultural_pragmatics
+from bs4 import BeautifulSoup
+from config import WORK_DIR, Config
+from fuzzy_dedup import detect_fuzzy_duplicates
+from merge_db_manual_search_results import preprocess_db_search_result
+from organize_db_result_for_manual_dup_remove import filter_ineligible_year_records, sort_records
+from profiler import count_rows
+from record_export import export_csv, write_records
+from screening_workbook import build_screening_workbook, read_screening_workbook
+from source_adapters import SOURCE_ADAPTERS, SourceAdapter, apply_adapter, read_xls_source
+from stage_catalog import DB_SEARCH_SOURCES
+from summarize_db_result import merge_datasets, remove_doi_duplicated
+from synthetic_data import PROQUEST_DATABASES, generate_corpus, get_synthetic_config
+from text_normalizer import normalize_columns
+
+RESULTS_DIR = WORK_DIR / "results/tables"
+BENCHMARK_RESULTS_FILENAME = "benchmark_results.json"
+BENCHMARK_BASELINE_FILENAME = "benchmark_baseline.json"
+
+DEFAULT_SCALES = [1.0, 10.0]
+REGRESSION_RATIO = 1.2 # baseline の 1.2 倍以上の時間がかかった stage を regression とする
+MIN_REGRESSION_SECONDS = 0.1 # 短すぎる stage の揺らぎは無視
+
+"""
+synthetic_data で生成した任意の規模の入力に対して，各 stage の実行時間を計測し，保存した baseline と比較する
+
+1. scale ごとに一時 dir に synthetic な入力を生成 (synthetic_data.generate_corpus)
+2. 各 stage の関数を元のスクリプトと同じ順番で実行し，実行時間 (repeat 回の最小値) と出力の行数を計測
+    - parse ... xlsx (ProQuest 形式), csv (EBSCO 形式), RIS, HTML (Oxford Academic / De Gruyter), APA の tsv,
+      Semantic Scholar / SerpApi の json
+        - Semantic Scholar は API を呼ばず，生成した json を返す OfflineSemanticScholar で get_paper を置き換える
+    - preprocess / merge / dedup / sort / export ... summarize_db_result → organize → merge_db_manual と同じ関数
+        - export は stage の出力 (parquet) と，人が開く utf-16 の csv のコピー (record_export.export_csv)
+    - workbook ... スクリーニング用ワークブックの作成と読み込み (screening_workbook)
+3. 結果を results/tables/benchmark_results.json に保存
+    - results/tables/benchmark_baseline.json があれば，scale と stage ごとに時間の比を計算
+    - baseline の REGRESSION_RATIO 倍以上遅くなった stage を regression として表示
+    - --save-baseline を付けると，今回の結果を baseline として保存
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class StageTiming:
+    scale: float
+    stage: str
+    seconds: float
+    rows: Optional[int]
+
+class OfflineSemanticScholar:
+    def __init__(self, papers: Dict[str, Dict[str, Any]]) -> None:
+        self.papers = papers
+
+    def get_paper(self, paper_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        return self.papers[paper_id] # 存在しない id は retrieve_paper_meta_info 内で警告として扱われる
+
+def get_benchmark_adapter(source_name: str) -> SourceAdapter:
+    # synthetic な ProQuest 形式の結果は .xls ではなく .xlsx で生成している (reader は拡張子で engine を選ぶ)
+    adapter = SOURCE_ADAPTERS[source_name]
+    if adapter.reader is read_xls_source and source_name in PROQUEST_DATABASES:
+        adapter = dataclasses.replace(adapter, filename=PROQUEST_DATABASES[source_name][0])
+
+    return adapter
+
+def load_benchmark_sources(config: Config, source_names: List[str]) -> Dict[str, pd.DataFrame]:
+    datasets = {}
+    for source_name in source_names:
+        adapter = get_benchmark_adapter(source_name)
+        df_raw = adapter.reader(getattr(config, adapter.data_dir) / adapter.filename, adapter.usecols, adapter.dtype)
+        datasets[source_name] = apply_adapter(df_raw, adapter)
+
+    return datasets
+
+def scrape_html_pages(scraper: ModuleType, html_dir: Path) -> pd.DataFrame:
+    rows = []
+    for page_path in sorted(html_dir.glob("page_*.html"), key=lambda path: int(path.stem.split("_")[1])):
+        parsed_html = BeautifulSoup(page_path.read_text(), "html.parser")
+        for study_record_div in scraper.study_record_div_generator(parsed_html):
+            doi, doi_link = scraper.extract_doi(study_record_div)
+            rows.append({
+                "authors": scraper.extract_authors(study_record_div),
+                "title": scraper.extract_title(study_record_div),
+                "year": scraper.extract_pub_year(study_record_div),
+                "abstract": scraper.extract_abstract_snippet(study_record_div),
+                "doi": doi,
+                "link": doi_link
+            })
+
+    return normalize_columns(pd.DataFrame(rows), scraper.TEXT_NORMALIZATIONS)
+
+def parse_apa_references(config: Config) -> pd.DataFrame:
+    df_ancestry = pd.read_table(config.external_data_dir / "plonsky_zhuang.tsv", header=None)
+    apa_ancestry_dataset = convert_apa_2_meta_info.preprocess_ancestry_dataset({"plonsky_zhuang": df_ancestry})
+
+    return convert_apa_2_meta_info.merge_dataset(apa_ancestry_dataset)
+
+def parse_semantic_scholar(json_path: Path) -> pd.DataFrame:
+    papers = json.loads(json_path.read_text())
+    semantic_scholar = OfflineSemanticScholar(papers)
+
+    rows = [ancestry_search.retrieve_paper_meta_info(paper_id, semantic_scholar) for paper_id in papers]
+    return pd.DataFrame(rows)
+
+def parse_serpapi(bkup_dir: Path) -> pd.DataFrame:
+    rows = []
+    for json_path in sorted(bkup_dir.glob("*.json"), key=lambda path: int(path.stem.rsplit("_", 1)[1])):
+        rows += google_scholar_search.extract_meta_info(json.loads(json_path.read_text()))
+
+    return pd.DataFrame(rows)
+
+def time_stage(
+    timings: List[StageTiming], scale: float, stage: str, repeat: int, func: Callable[..., Any], *args: Any
+) -> Any:
+    best_seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+
+    timings.append(StageTiming(scale, stage, best_seconds, count_rows([result])))
+    return result
+
+def run_scale(scale: float, repeat: int) -> List[StageTiming]:
+    timings: List[StageTiming] = []
+
+    with tempfile.TemporaryDirectory() as root:
+        config = get_synthetic_config(Path(root))
+        start = time.perf_counter()
+        n_records = generate_corpus(Path(root), scale)
+        timings.append(StageTiming(scale, "generate", time.perf_counter() - start, sum(n_records.values())))
+
+        # 1. parse each input format (the outputs are written where the adapters read them)
+        time_stage(timings, scale, "parse_xlsx", repeat, load_benchmark_sources, config, list(PROQUEST_DATABASES))
+        time_stage(timings, scale, "parse_csv", repeat, load_benchmark_sources, config, ["psycinfo"])
+        time_stage(timings, scale, "parse_ris", repeat, load_benchmark_sources, config, ["journal_of_pragmatics"])
+        time_stage(
+            timings, scale, "parse_html_oxford", repeat,
+            scrape_html_pages, scrape_applied_linguistics, config.external_data_dir / "applied_linguistics"
+        )
+        time_stage(
+            timings, scale, "parse_html_de_gruyter", repeat,
+            scrape_html_pages, scrape_intercultural_pragmatics, config.external_data_dir / "intercultural_pragmatics"
+        )
+        df_apa = time_stage(timings, scale, "parse_apa", repeat, parse_apa_references, config)
+        write_records(config, df_apa, "apa_ancestry_search_result")
+        for search in ["ancestry", "forward"]:
+            df_search = time_stage(
+                timings, scale, f"parse_semantic_scholar_{search}", repeat,
+                parse_semantic_scholar, config.raw_data_dir / f"{search}_semantic_scholar.json"
+            )
+            write_records(config, df_search, f"{search}_search_result")
+        df_google = time_stage(
+            timings, scale, "parse_serpapi", repeat, parse_serpapi, config.raw_data_dir / "google_search_bkup"
+        )
+        write_records(config, df_google, "google_scholar_result")
+
+        # 2. the db search pipeline (summarize_db_result → organize → merge_db_manual)
+        datasets = time_stage(
+            timings, scale, "load_sources", repeat, load_benchmark_sources, config, DB_SEARCH_SOURCES
+        )
+        df_merged = time_stage(timings, scale, "merge", repeat, merge_datasets, datasets)
+        df_unique = time_stage(timings, scale, "dedup_doi", repeat, remove_doi_duplicated, df_merged)
+        time_stage(timings, scale, "dedup_fuzzy", repeat, detect_fuzzy_duplicates, df_unique)
+        df_filtered = time_stage(
+            timings, scale, "filter_year", repeat, filter_ineligible_year_records, df_unique, config.eligible_pub_year
+        )
+        df_sorted = time_stage(timings, scale, "sort", repeat, sort_records, df_filtered)
+        df_preprocessed = time_stage(
+            timings, scale, "preprocess", repeat, preprocess_db_search_result, df_sorted.assign(is_duplicated=0)
+        )
+        time_stage(
+            timings, scale, "export_parquet", repeat,
+            write_records, config, df_preprocessed, "db_manual_search_records"
+        )
+        time_stage(
+            timings, scale, "export_csv", repeat,
+            export_csv, df_preprocessed, config.processed_data_dir / "db_manual_search_records.csv", "utf-16"
+        )
+
+        # 3. the screening workbook (write-only build, then read-only load of the decisions)
+        workbook_path = config.processed_data_dir / "title_abstract_screening.xlsx"
+        time_stage(
+            timings, scale, "build_workbook", repeat,
+            build_screening_workbook, df_sorted.assign(is_duplicated=""), workbook_path, "is_duplicated"
+        )
+        time_stage(timings, scale, "read_workbook", repeat, read_screening_workbook, workbook_path)
+
+    return timings
+
+def compare_with_baseline(df_results: pd.DataFrame, baseline_path: Path) -> pd.DataFrame:
+    if not baseline_path.exists():
+        return df_results.assign(baseline_seconds=float("nan"), ratio=float("nan"), is_regression=False)
+
+    df_baseline = pd.DataFrame(json.loads(baseline_path.read_text())["results"])
+    df_baseline = df_baseline[["scale", "stage", "seconds"]].rename(columns={"seconds": "baseline_seconds"})
+
+    df_comparison = df_results.merge(df_baseline, on=["scale", "stage"], how="left")
+    df_comparison["ratio"] = df_comparison["seconds"] / df_comparison["baseline_seconds"]
+    df_comparison["is_regression"] = (
+        (df_comparison["ratio"] >= REGRESSION_RATIO)
+        & (df_comparison["seconds"] - df_comparison["baseline_seconds"] >= MIN_REGRESSION_SECONDS)
+    )
+
+    return df_comparison
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark every stage on synthetic inputs")
+    parser.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES, help="multipliers of the corpus")
+    parser.add_argument("--repeat", type=int, default=1, help="take the fastest of N runs for each stage")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    args = parser.parse_args()
+
+    timings = []
+    for scale in args.scales:
+        print(f"[benchmark] scale {scale:g}")
+        timings += run_scale(scale, args.repeat)
+
+    df_results = pd.DataFrame([dataclasses.asdict(timing) for timing in timings])
+    df_comparison = compare_with_baseline(df_results, RESULTS_DIR / BENCHMARK_BASELINE_FILENAME)
+    print(df_comparison.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+
+    n_regressions = int(df_comparison["is_regression"].sum())
+    if n_regressions:
+        print(f"{n_regressions} regressions were detected!")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "repeat": args.repeat,
+        "results": json.loads(df_comparison.to_json(orient="records"))
+    }
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    (RESULTS_DIR / BENCHMARK_RESULTS_FILENAME).write_text(json.dumps(report, indent=4))
+    if args.save_baseline:
+        (RESULTS_DIR / BENCHMARK_BASELINE_FILENAME).write_text(json.dumps(report, indent=4))
+
+if __name__ == "__main__":
+    main()
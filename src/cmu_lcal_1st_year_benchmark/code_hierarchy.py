@@ -0,0 +1,206 @@
+import argparse
+import dataclasses
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from coding_sheet import load_coding_sheet
+from config import Config
+
+CODE_HIERARCHY_FILENAME = "code_hierarchy_ver_1.json"
+
+PATH_SEPARATOR = " > " # 名前に "/" を含むコード (Honorific/Plain Styles 等) があるため
+VALUE_SEPARATOR = ", " # 1 つのセルに複数のコードがある列の区切り
+STUDY_ID_COLUMN = "Study ID"
+
+# コーディング結果の列 → その列のコードを探す階層 (葉の名前は階層ごとに一意だが，階層をまたぐと重複する)
+CODE_COLUMNS: Dict[str, str] = {
+    "Pragmatic Target": "Target Feature > Pragmatic Target",
+    "Input Materials": "Instructional Feature > Input Materials",
+    "Production Task": "Instructional Feature > Production Task",
+    "Outcome Measure 1": "Assessment Feature",
+    "Outcome Measure 2": "Assessment Feature",
+    "Outcome Measure 3": "Assessment Feature",
+    "Outcome Measure 4": "Assessment Feature"
+}
+
+"""
+code_hierarchy_ver_1.json のコードの階層を整数 id の表にまとめ，研究ごとのコードの集計を行列演算で行う
+
+1. 入れ子の dict / list を深さ優先の順に走査し，ノードの表を作成 (compile_hierarchy)
+    - node_id (走査順)，name，path ("Instructional Feature > Input Materials > Text")，parent_id (最上位は -1)
+    - depth，is_leaf
+    - 走査順のため，ノード i の子孫は [i, subtree_end[i]) の連続した id になる
+    - 各ノードについて，自身と祖先の id のビットを立てた bitset (np.packbits した uint8 の配列) を持つ
+2. coding_sheet で読み込んだコーディング結果のコードをノードの id に変換 (encode_study_codes)
+    - CODE_COLUMNS の列を ", " で分割し，列ごとに決まった階層の中で名前を探す (同名の葉の取り違えを防ぐ)
+    - "Study ID" が空の行 (同じ研究の別のグループ) は，直前の研究の行として扱う
+    - 階層にないコード ("Speech Act" 等) は unknown_codes に残す
+3. 研究ごとに，コードの祖先の bitset の OR をとった bitset を作成
+    - 「Input Materials のいずれかの下位コードを使った研究数」は，Input Materials のビットが立った研究数
+    - 全ノードの研究数も，bitset を展開した行列の列和で一度に求める (rollup_counts)
+4. python code_hierarchy.py [ノードの path ...] で，ノードごとの研究数と階層にないコードを表示
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class CodeHierarchy:
+    nodes: pd.DataFrame # node_id 順
+    subtree_end: np.ndarray
+    ancestor_bits: np.ndarray # (ノード数, ceil(ノード数 / 8))
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.nodes)
+
+    def get_node_id(self, path: str) -> int:
+        node_ids = np.nonzero(self.nodes["path"].to_numpy() == path)[0]
+        if len(node_ids) == 0:
+            raise KeyError(f"{path} is not in the code hierarchy")
+        return int(node_ids[0])
+
+@dataclasses.dataclass(frozen=True)
+class StudyCodes:
+    study_ids: np.ndarray
+    study_bits: np.ndarray # (研究数, ceil(ノード数 / 8))．研究のコードとその祖先のビット
+    unknown_codes: pd.DataFrame # 階層にないコード (column, code, n_studies)
+
+def load_code_hierarchy_json(file_path: Path) -> Dict[str, Any]:
+    with open(file_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def walk_hierarchy(
+    tree: Any, parent_id: int, parent_path: str, depth: int, rows: List[Tuple[str, str, int, int]]
+) -> None:
+    # (name, path, parent_id, depth) を深さ優先の順に rows に追加
+    children = list(tree.items()) if isinstance(tree, dict) else [(name, None) for name in tree]
+    for name, subtree in children:
+        path = f"{parent_path}{PATH_SEPARATOR}{name}" if parent_path else name
+        node_id = len(rows)
+        rows.append((name, path, parent_id, depth))
+        if subtree is not None:
+            walk_hierarchy(subtree, node_id, path, depth + 1, rows)
+
+def compile_hierarchy(tree: Dict[str, Any]) -> CodeHierarchy:
+    rows: List[Tuple[str, str, int, int]] = []
+    walk_hierarchy(tree, -1, "", 0, rows)
+
+    nodes = pd.DataFrame(rows, columns=["name", "path", "parent_id", "depth"])
+    nodes.insert(0, "node_id", np.arange(len(nodes)))
+    parent_ids = nodes["parent_id"].to_numpy()
+    nodes["is_leaf"] = ~np.isin(nodes["node_id"].to_numpy(), parent_ids)
+
+    # 祖先の行列は，親の行に自身のビットを足して作る (走査順のため親の行は先に完成している)
+    ancestors = np.eye(len(nodes), dtype=bool)
+    for node_id, parent_id in enumerate(parent_ids):
+        if parent_id >= 0:
+            ancestors[node_id] |= ancestors[parent_id]
+
+    # 子孫の範囲の終わりは，自身より後で depth が自身以下の最初のノード
+    depths = nodes["depth"].to_numpy()
+    subtree_end = np.array([
+        node_id + 1 + int(np.argmax(np.append(depths[node_id + 1:] <= depth, True)))
+        for node_id, depth in enumerate(depths)
+    ])
+
+    return CodeHierarchy(nodes, subtree_end, np.packbits(ancestors, axis=1, bitorder="little"))
+
+def load_code_hierarchy(config: Config) -> CodeHierarchy:
+    return compile_hierarchy(load_code_hierarchy_json(config.external_data_dir / CODE_HIERARCHY_FILENAME))
+
+def extract_study_codes(df_coding: pd.DataFrame) -> pd.DataFrame:
+    # coding_sheet の MultiIndex の列のうち，結果のブロック以外 (subgroup が "") は field の名前が重複しない
+    df_coding = df_coding.loc[:, df_coding.columns.get_level_values("subgroup") == ""].droplevel([0, 1], axis=1)
+    df_coding[STUDY_ID_COLUMN] = df_coding[STUDY_ID_COLUMN].ffill()
+
+    df_codes = df_coding.melt(
+        id_vars=STUDY_ID_COLUMN, value_vars=list(CODE_COLUMNS.keys()), var_name="column", value_name="code"
+    ).dropna(subset=["code"])
+    df_codes["code"] = df_codes["code"].str.split(VALUE_SEPARATOR)
+    df_codes = df_codes.explode("code")
+    df_codes["code"] = df_codes["code"].str.strip()
+
+    return df_codes[df_codes["code"] != ""].rename(columns={STUDY_ID_COLUMN: "study_id"}).reset_index(drop=True)
+
+def resolve_codes(hierarchy: CodeHierarchy, df_codes: pd.DataFrame) -> np.ndarray:
+    # (列の階層, 名前) → 階層の中の葉の id．見つからない場合は -1
+    leaf_ids: Dict[Tuple[str, str], int] = {}
+    for scope in set(CODE_COLUMNS.values()):
+        scope_id = hierarchy.get_node_id(scope)
+        df_scope = hierarchy.nodes.iloc[scope_id:hierarchy.subtree_end[scope_id]]
+        for node_id, name in df_scope.loc[df_scope["is_leaf"], ["node_id", "name"]].itertuples(index=False):
+            leaf_ids.setdefault((scope, name), node_id)
+
+    # 同じ (列, コード) の組は 1 度だけ探す
+    column_codes, columns = pd.factorize(df_codes["column"])
+    code_codes, codes = pd.factorize(df_codes["code"])
+    pair_codes, pair_keys = pd.factorize(column_codes.astype(np.int64) * len(codes) + code_codes)
+    unique_ids = np.array([
+        leaf_ids.get((CODE_COLUMNS.get(columns[int(key) // len(codes)], ""), codes[int(key) % len(codes)]), -1)
+        for key in pair_keys
+    ], dtype=np.int64)
+
+    return unique_ids[pair_codes]
+
+def encode_study_codes(hierarchy: CodeHierarchy, df_codes: pd.DataFrame) -> StudyCodes:
+    node_ids = resolve_codes(hierarchy, df_codes)
+    mask_known = node_ids >= 0
+
+    n_unknown_studies = df_codes[~mask_known].groupby(["column", "code"], sort=True)["study_id"].nunique()
+    df_unknown = n_unknown_studies.rename("n_studies").reset_index()
+
+    study_codes, study_ids = pd.factorize(df_codes["study_id"], sort=False)
+
+    # 研究ごとに，コードの祖先の bitset の OR をとる
+    study_bits = np.zeros((len(study_ids), hierarchy.ancestor_bits.shape[1]), dtype=np.uint8)
+    np.bitwise_or.at(study_bits, study_codes[mask_known], hierarchy.ancestor_bits[node_ids[mask_known]])
+
+    return StudyCodes(np.asarray(study_ids), study_bits, df_unknown)
+
+def load_study_codes(config: Config, hierarchy: CodeHierarchy) -> StudyCodes:
+    df_coding, _ = load_coding_sheet(config)
+    return encode_study_codes(hierarchy, extract_study_codes(df_coding))
+
+def get_study_matrix(hierarchy: CodeHierarchy, study_codes: StudyCodes) -> np.ndarray:
+    # (研究数, ノード数) の bool 行列
+    return np.unpackbits(study_codes.study_bits, axis=1, count=hierarchy.n_nodes, bitorder="little").astype(bool)
+
+def studies_with(hierarchy: CodeHierarchy, study_codes: StudyCodes, path: str) -> np.ndarray:
+    node_id = hierarchy.get_node_id(path)
+    return study_codes.study_ids[(study_codes.study_bits[:, node_id >> 3] >> (node_id & 7)) & 1 == 1]
+
+def rollup_counts(
+    hierarchy: CodeHierarchy, study_codes: StudyCodes, paths: Optional[List[str]] = None
+) -> pd.DataFrame:
+    df_counts = hierarchy.nodes[["path", "depth", "is_leaf"]].copy()
+    df_counts["n_studies"] = get_study_matrix(hierarchy, study_codes).sum(axis=0)
+
+    if paths is not None:
+        df_counts = df_counts.iloc[[hierarchy.get_node_id(path) for path in paths]]
+
+    return df_counts
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Count the coded studies under each node of the code hierarchy")
+    parser.add_argument("paths", nargs="*", help="node paths, e.g. 'Instructional Feature > Input Materials'")
+    args = parser.parse_args()
+
+    config = Config()
+    hierarchy = load_code_hierarchy(config)
+    study_codes = load_study_codes(config, hierarchy)
+
+    start = time.perf_counter()
+    df_counts = rollup_counts(hierarchy, study_codes, args.paths or None)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(df_counts.to_string(index=False))
+    print(f"{hierarchy.n_nodes} nodes were counted over {len(study_codes.study_ids)} studies in {elapsed_ms:.1f} ms")
+    if len(study_codes.unknown_codes) > 0:
+        print(f"{len(study_codes.unknown_codes)} codes were not found in the code hierarchy")
+        print(study_codes.unknown_codes.to_string(index=False))
+
+if __name__ == "__main__":
+    main()
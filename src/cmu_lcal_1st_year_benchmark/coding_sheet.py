@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from artifact_store import ArtifactStore
+from config import Config
+from record_export import write_table
+from record_schema import TEXT_DTYPE
+
+CODING_RESULT_FILENAME = "coding_result_ver_1.tsv"
+CODING_SHEET_DIRNAME = "coding_sheet"
+CODING_SHEET_MANIFEST_FILENAME = "manifest.json"
+
+HEADER_LEVELS = ["group", "subgroup", "field"]
+N_HEADER_ROWS = len(HEADER_LEVELS)
+STUDY_ID_COLUMN = ("Meta Info", "", "Study ID")
+GROUP_COLUMN = ("Learner Features", "", "Group")
+OUTCOME_MEASURE_FIELD = "Outcome Measure {}" # Assessment Feature の列．n 番目の結果のブロックの測定方法
+OUTCOME_SUBGROUP_PATTERN = re.compile(r"Outcome Measures ([0-9]+)")
+
+"""
+3 行のヘッダ (group → subgroup → field) のコーディングシート (coding_result_ver_1.tsv) を読み込み，parquet に保存する
+
+1. ヘッダの 3 行から列の MultiIndex (group, subgroup, field) を作成 (build_columns)
+    - group は左の列の値で埋める，subgroup は同じ group の中で左の列の値で埋め，ない場合は ""
+    - 例: ("Target Feature", "", "Pragmatic Target")，("Results", "Outcome Measures 2", "Within-group Results")
+    - "Within-group Results" 等は結果のブロック (Outcome Measures 1 〜 4) ごとに同じ名前で繰り返される
+2. 結果のブロックを縦に並べた long 形式の表を作成 (melt_outcomes)
+    - 1 行 = (シートの行, outcome_index, field) の値，値が空のものは除く
+    - study_id は "Study ID" が空の行 (同じ研究の別のグループ) を直前の研究で埋めたもの
+    - participant_group は Learner Features の "Group"，outcome_measure は同じ研究の "Outcome Measure <n>"
+    - 文字列の列は category 型 (categories は object，value は文字列型)
+3. processed/coding_sheet/<ファイル名>_wide.parquet と <ファイル名>_outcomes.parquet に保存 (load_coding_sheet)
+    - 元のファイルの内容の hash (artifact_store と同じ sha256) を manifest.json に記録し，変わった時のみ作り直す
+    - 保存先のファイル名は固定のため，R / Quarto のレポートや corpus_query からもそのまま読み込める
+4. python coding_sheet.py [--refresh] で，parquet を作成して各表の大きさを表示
+"""
+
+
+def build_columns(df_header: pd.DataFrame) -> pd.MultiIndex:
+    df_levels = df_header.T.set_axis(HEADER_LEVELS, axis=1)
+    df_levels["group"] = df_levels["group"].ffill()
+    df_levels["subgroup"] = df_levels.groupby("group")["subgroup"].ffill().fillna("")
+
+    return pd.MultiIndex.from_frame(df_levels.fillna(""))
+
+def read_coding_sheet(file_path: Path) -> pd.DataFrame:
+    df_raw = pd.read_table(file_path, header=None, dtype=str)
+
+    df_coding = df_raw.iloc[N_HEADER_ROWS:].reset_index(drop=True).astype(TEXT_DTYPE)
+    df_coding.columns = build_columns(df_raw.iloc[:N_HEADER_ROWS])
+
+    return df_coding
+
+def parse_outcome_index(subgroup: str, column: Tuple[str, ...]) -> int:
+    match = OUTCOME_SUBGROUP_PATTERN.fullmatch(subgroup)
+    if match is None:
+        raise ValueError(f"Outcome index was not found in the subgroup of column {column}")
+
+    return int(match.group(1))
+
+def melt_outcomes(df_coding: pd.DataFrame) -> pd.DataFrame:
+    subgroups = df_coding.columns.get_level_values("subgroup")
+    column_ids = np.nonzero(subgroups.str.fullmatch(OUTCOME_SUBGROUP_PATTERN.pattern))[0]
+    outcome_indices = np.array([
+        parse_outcome_index(subgroups[column_id], df_coding.columns[column_id]) for column_id in column_ids
+    ])
+    fields = df_coding.columns.get_level_values("field")[column_ids]
+
+    # 列の位置で melt し，位置から outcome_index と field を引く
+    df_long = df_coding.iloc[:, column_ids].set_axis(np.arange(len(column_ids)), axis=1).melt(
+        var_name="position", value_name="value", ignore_index=False
+    ).dropna(subset=["value"])
+    row_ids = df_long.index.to_numpy()
+    positions = df_long["position"].to_numpy()
+
+    study_ids = df_coding[STUDY_ID_COLUMN].ffill()
+    n_outcomes = int(outcome_indices.max()) if len(outcome_indices) > 0 else 0
+    df_measures = df_coding[
+        [("Assessment Feature", "", OUTCOME_MEASURE_FIELD.format(n)) for n in range(1, n_outcomes + 1)]
+    ]
+    measures = df_measures.groupby(study_ids.to_numpy()).ffill().to_numpy(dtype=object, na_value=np.nan)
+
+    # categories は parquet から読み込んだ時と同じく object にする
+    df_long = pd.DataFrame({
+        "study_id": pd.Categorical(
+            study_ids.to_numpy(dtype=object, na_value=np.nan)[row_ids],
+            categories=np.asarray(study_ids.dropna().unique(), dtype=object)
+        ),
+        "row_id": row_ids.astype(np.int32),
+        "participant_group": pd.Categorical(
+            df_coding[GROUP_COLUMN].to_numpy(dtype=object, na_value=np.nan)[row_ids]
+        ),
+        "outcome_index": outcome_indices[positions].astype(np.int8),
+        "outcome_measure": pd.Categorical(measures[row_ids, outcome_indices[positions] - 1]),
+        "field": pd.Categorical(fields[positions], categories=pd.unique(fields)),
+        "value": pd.Series(df_long["value"].to_numpy(), dtype=TEXT_DTYPE)
+    })
+
+    return df_long.sort_values(["row_id", "outcome_index"], kind="stable").reset_index(drop=True)
+
+def get_cache_paths(config: Config, file_path: Path) -> Tuple[Path, Path]:
+    cache_dir = config.processed_data_dir / CODING_SHEET_DIRNAME
+    return cache_dir / f"{file_path.stem}_wide.parquet", cache_dir / f"{file_path.stem}_outcomes.parquet"
+
+def write_wide_table(df_coding: pd.DataFrame, file_path: Path) -> None:
+    # index=False (record_export.write_table) では列の MultiIndex が文字列になるため，index ごと保存
+    temp_path = file_path.with_name(f".{file_path.name}.tmp")
+    df_coding.to_parquet(temp_path)
+    os.replace(temp_path, file_path)
+
+def load_manifest(config: Config) -> Dict[str, str]:
+    manifest_path = config.processed_data_dir / CODING_SHEET_DIRNAME / CODING_SHEET_MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return {}
+
+    return json.loads(manifest_path.read_text())
+
+def save_manifest(config: Config, manifest: Dict[str, str]) -> None:
+    manifest_path = config.processed_data_dir / CODING_SHEET_DIRNAME / CODING_SHEET_MANIFEST_FILENAME
+    manifest_path.write_text(json.dumps(manifest, indent=4))
+
+def get_content_hash(config: Config, file_path: Path) -> str:
+    artifact_store = ArtifactStore(config)
+    content_hash = artifact_store.hash_file(file_path)
+    artifact_store.save_hash_cache()
+
+    return content_hash
+
+def is_cache_valid(config: Config, file_path: Path, content_hash: str) -> bool:
+    wide_path, outcomes_path = get_cache_paths(config, file_path)
+    return load_manifest(config).get(file_path.name) == content_hash and wide_path.exists() and outcomes_path.exists()
+
+def load_coding_sheet(
+    config: Config, filename: str = CODING_RESULT_FILENAME, refresh: bool = False
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    file_path = config.external_data_dir / filename
+    wide_path, outcomes_path = get_cache_paths(config, file_path)
+
+    content_hash = get_content_hash(config, file_path)
+    if not refresh and is_cache_valid(config, file_path, content_hash):
+        df_outcomes = pd.read_parquet(outcomes_path)
+        return pd.read_parquet(wide_path).astype(TEXT_DTYPE), df_outcomes.astype({"value": TEXT_DTYPE})
+
+    df_coding = read_coding_sheet(file_path)
+    df_outcomes = melt_outcomes(df_coding)
+
+    wide_path.parent.mkdir(parents=True, exist_ok=True)
+    write_wide_table(df_coding, wide_path)
+    write_table(df_outcomes, outcomes_path)
+    manifest = load_manifest(config)
+    manifest[file_path.name] = content_hash
+    save_manifest(config, manifest)
+
+    return df_coding, df_outcomes
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load the coding sheet into a MultiIndex table and a long table")
+    parser.add_argument("--filename", default=CODING_RESULT_FILENAME, help="coding sheet in data/external")
+    parser.add_argument("--refresh", action="store_true", help="rebuild the parquet cache")
+    args = parser.parse_args()
+
+    config = Config()
+    file_path = config.external_data_dir / args.filename
+    is_cached = not args.refresh and is_cache_valid(config, file_path, get_content_hash(config, file_path))
+    df_coding, df_outcomes = load_coding_sheet(config, args.filename, args.refresh)
+    wide_path, outcomes_path = get_cache_paths(config, file_path)
+
+    status = "was reused" if is_cached else "was exported" # 元のファイルが変わっていなければ parquet は作り直さない
+    print(f"{wide_path.name} {status} with {len(df_coding)} rows and {df_coding.shape[1]} columns")
+    print(f"{outcomes_path.name} {status} with {len(df_outcomes)} outcome values")
+
+if __name__ == "__main__":
+    main()
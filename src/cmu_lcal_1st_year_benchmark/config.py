@@ -11,3 +11,4 @@ class Config:
     env_dir: Path = WORK_DIR / "environment"
 
     eligible_pub_year = 2010
+    memory_limit_mb: float = 512 # out_of_core で使用するメモリの上限
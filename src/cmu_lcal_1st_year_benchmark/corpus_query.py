@@ -0,0 +1,210 @@
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import duckdb
+import pandas as pd
+from artifact_store import ARTIFACT_STORE_DIRNAME
+from config import Config
+from record_export import CSV_ENCODINGS, get_source_stat, write_table
+from ris_reader import read_ris
+from spreadsheet_reader import read_spreadsheet
+
+QUERY_CACHE_DIRNAME = "query_cache"
+QUERY_CACHE_MANIFEST_FILENAME = "manifest.json"
+SCHEMAS = ["processed", "external"]
+
+CACHED_SUFFIXES = [".csv", ".tsv", ".xls", ".xlsx", ".txt", ".ris"]
+NON_IDENTIFIER_PATTERN = re.compile(r"[\W]+")
+
+# よく使う集計 (python corpus_query.py query --name <名前>)
+NAMED_QUERIES: Dict[str, str] = {
+    "search_method_counts": """
+        SELECT search_method, count(*) AS n_records
+        FROM db_search_merged_unique GROUP BY search_method ORDER BY n_records DESC
+    """,
+    # record_linkage のクラスタのうち，forward search でのみ見つかった 2015 年以降の文献
+    "forward_only_since_2015": """
+        SELECT count(*) AS n_records FROM db_search_linked WHERE year >= 2015 AND search_methods = 'forward'
+    """,
+    "source_overlap": """
+        SELECT search_methods, count(*) AS n_records
+        FROM db_search_linked GROUP BY search_methods ORDER BY n_records DESC
+    """,
+    "eligible_by_year": """
+        SELECT year, count(*) AS n_eligible FROM (
+            SELECT year, is_eligible FROM db_manual_search_records
+            UNION ALL
+            SELECT year, is_eligible FROM additional_db_manual_search_records
+        ) WHERE is_eligible = 1 GROUP BY year ORDER BY year
+    """,
+    # 判定が空欄で，人手の確認が必要なレコード数 (organize / merge の "records need review" と同じ)
+    "pending_decisions": """
+        SELECT 'db_search_records' AS table_name, count(*) AS n_pending
+        FROM db_search_records WHERE is_duplicated IS NULL
+        UNION ALL
+        SELECT 'additional_db_search_records', count(*) FROM additional_db_search_records WHERE is_duplicated IS NULL
+        UNION ALL
+        SELECT 'db_manual_search_records', count(*) FROM db_manual_search_records WHERE is_eligible IS NULL
+        UNION ALL
+        SELECT 'additional_db_manual_search_records', count(*)
+        FROM additional_db_manual_search_records WHERE is_eligible IS NULL
+    """
+}
+
+"""
+data/processed と data/external の全ての表を DuckDB の view として登録し，pandas に全て読み込まずに SQL で集計する
+
+1. 表のファイルを探し，schema (processed / external) と view 名を決める (iter_artifacts)
+    - view 名はファイルのパス (拡張子なし) の記号を "_" にしたもの (fingerprint_index/first → fingerprint_index_first)
+    - artifact_store と query_cache の中，隠しファイル，表でないもの (json, html のディレクトリ) は除く
+    - processed の csv は，同名の parquet がない場合 (以前のスクリプトの出力) のみ登録
+2. parquet は read_parquet の view としてそのまま登録
+3. それ以外 (csv, tsv, xls / xlsx, RIS) は一度 parquet に変換して processed/query_cache に保存 (cache_artifact)
+    - 元のファイルの (サイズ，更新時刻) が前回から変わっていなければ変換し直さない
+    - tsv はヘッダーのない形式 (plonsky_zhuang 等) があるため，全て文字列の column_<番号> として読み込む
+4. search_path を main, processed, external とし，schema を省略した表名でも参照できるようにする
+5. python API ... connect_corpus (DuckDB の接続)，query_corpus (結果を DataFrame で返す)
+6. CLI ... python corpus_query.py query "<SQL>" / query --name <NAMED_QUERIES の名前> / views
+    - 例: 2015 年以降に forward search でのみ見つかった文献数 (query --name forward_only_since_2015 と同じ)
+        python corpus_query.py query "SELECT count(*) FROM db_search_linked
+                                      WHERE year >= 2015 AND search_methods = 'forward'"
+"""
+
+
+def get_view_name(relative_path: Path) -> str:
+    view_name = NON_IDENTIFIER_PATTERN.sub("_", relative_path.with_suffix("").as_posix()).strip("_").lower()
+    return view_name if not view_name[:1].isdigit() else f"_{view_name}"
+
+def get_cache_dir(config: Config) -> Path:
+    return config.processed_data_dir / QUERY_CACHE_DIRNAME
+
+def iter_artifacts(config: Config) -> Iterator[Tuple[str, str, Path]]:
+    excluded_dirs = {ARTIFACT_STORE_DIRNAME, QUERY_CACHE_DIRNAME}
+    for schema, data_dir in [("processed", config.processed_data_dir), ("external", config.external_data_dir)]:
+        view_names = set()
+        for file_path in sorted(data_dir.rglob("*")):
+            relative_path = file_path.relative_to(data_dir)
+            if not file_path.is_file() or relative_path.parts[0] in excluded_dirs:
+                continue
+            if any(part.startswith(".") for part in relative_path.parts):
+                continue
+            if file_path.suffix not in [".parquet"] + CACHED_SUFFIXES:
+                continue
+            if schema == "processed" and file_path.suffix == ".csv" and file_path.with_suffix(".parquet").exists():
+                continue # parquet の csv のコピー
+
+            view_name = get_view_name(relative_path)
+            if view_name in view_names: # 拡張子のみが異なるファイル
+                view_name = f"{view_name}_{file_path.suffix[1:]}"
+            view_names.add(view_name)
+
+            yield schema, view_name, file_path
+
+def read_artifact(file_path: Path) -> pd.DataFrame:
+    if file_path.suffix == ".csv":
+        return pd.read_csv(file_path, encoding=CSV_ENCODINGS.get(file_path.stem))
+    if file_path.suffix == ".tsv":
+        df_artifact = pd.read_table(file_path, header=None, dtype=str)
+        return df_artifact.rename(columns=lambda column_id: f"column_{column_id}")
+    if file_path.suffix in [".xls", ".xlsx"]:
+        df_artifact = read_spreadsheet(file_path)
+        return df_artifact.rename(columns=str)
+
+    return read_ris(file_path) # .txt / .ris
+
+def load_cache_manifest(config: Config) -> Dict[str, List[int]]:
+    manifest_path = get_cache_dir(config) / QUERY_CACHE_MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return {}
+
+    return json.loads(manifest_path.read_text())
+
+def save_cache_manifest(config: Config, manifest: Dict[str, List[int]]) -> None:
+    (get_cache_dir(config) / QUERY_CACHE_MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=4))
+
+def cache_artifact(
+    config: Config, schema: str, view_name: str, file_path: Path, manifest: Dict[str, List[int]], refresh: bool
+) -> Path:
+    cache_path = get_cache_dir(config) / schema / f"{view_name}.parquet"
+    cache_key = f"{schema}/{view_name}"
+
+    source_stat = get_source_stat(file_path)
+    if not refresh and cache_path.exists() and manifest.get(cache_key) == source_stat:
+        return cache_path
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    write_table(read_artifact(file_path), cache_path)
+    manifest[cache_key] = source_stat
+
+    return cache_path
+
+def quote_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+def connect_corpus(config: Config, refresh: bool = False) -> duckdb.DuckDBPyConnection:
+    connection = duckdb.connect()
+    for schema in SCHEMAS:
+        connection.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+
+    get_cache_dir(config).mkdir(parents=True, exist_ok=True)
+    manifest = load_cache_manifest(config)
+    for schema, view_name, file_path in iter_artifacts(config):
+        if file_path.suffix != ".parquet":
+            file_path = cache_artifact(config, schema, view_name, file_path, manifest, refresh)
+
+        connection.execute(
+            f'CREATE OR REPLACE VIEW {schema}."{view_name}" AS '
+            f"SELECT * FROM read_parquet({quote_literal(str(file_path))})"
+        )
+    save_cache_manifest(config, manifest)
+
+    connection.execute(f"SET search_path = {quote_literal(','.join(['main'] + SCHEMAS))}")
+    return connection
+
+def query_corpus(config: Config, sql: str) -> pd.DataFrame:
+    connection = connect_corpus(config)
+    try:
+        return connection.sql(sql).df()
+    finally:
+        connection.close()
+
+def list_views(connection: duckdb.DuckDBPyConnection) -> pd.DataFrame:
+    return connection.sql(
+        "SELECT schema_name, view_name FROM duckdb_views() WHERE NOT internal ORDER BY schema_name, view_name"
+    ).df()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query the processed and external artifacts with DuckDB")
+    parser.add_argument("--refresh", action="store_true", help="rebuild the parquet cache of non-parquet files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    query_parser = subparsers.add_parser("query", help="run a SQL query")
+    query_parser.add_argument("sql", nargs="?")
+    query_parser.add_argument("--name", choices=list(NAMED_QUERIES.keys()), help="run a named query instead")
+    subparsers.add_parser("views", help="list the registered views")
+    args = parser.parse_args()
+
+    config = Config()
+    connection = connect_corpus(config, args.refresh)
+
+    if args.command == "views":
+        print(list_views(connection).to_string(index=False))
+        return
+
+    if args.sql is None and args.name is None:
+        parser.error("query needs a SQL string or --name")
+    sql = NAMED_QUERIES[args.name] if args.name is not None else args.sql
+
+    start = time.perf_counter()
+    df_result = connection.sql(sql).df()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    print(df_result.to_string(index=False))
+    print(f"{len(df_result)} rows were returned in {elapsed_ms:.1f} ms")
+
+if __name__ == "__main__":
+    main()
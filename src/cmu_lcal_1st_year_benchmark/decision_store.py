@@ -0,0 +1,129 @@
+import hashlib
+
+import pandas as pd
+from config import Config
+from doi_index import normalize_doi
+from fuzzy_dedup import normalize_title
+from record_linkage import build_title_year_key
+from record_schema import TEXT_DTYPE
+from screening_workbook import read_screening_workbook
+from stage_catalog import DECISION_STORE_FILENAME, DECISION_WORKBOOKS
+
+# 空欄も「確認済み (重複ではない)」を意味する判定
+BLANK_MEANS_NEGATIVE = ["is_duplicated"]
+
+"""
+人手の判定 (is_duplicated, is_eligible) を行番号ではなくレコードの fingerprint に紐づけて保存し，再生成時に再適用する
+
+1. レコードの fingerprint を作成 (record_fingerprint)
+    - doi → タイトル + 出版年 → 著者 + タイトル + 出版年 の順で最初に得られるキーと search_method の組の hash
+    - search_method を含めるのは，同じ文献の別 source のレコード (一方のみ is_duplicated = 1) を区別するため
+2. ワークブックから判定を取り出し，decision_store.parquet に保存 (main)
+    - 同じ fingerprint に異なる判定がある場合 (同じ source 内の重複の一方のみ is_duplicated = 1 等) は，
+      同じキーを持つレコードの中での順番を加えた fingerprint (ranked_fingerprint) で保存
+        - ワークブックと再生成したレコードは同じ順番 (sort_records) で並ぶため，順番で対応が取れる
+3. organize / merge のスクリプトで，再生成したレコードに判定を再適用 (apply_decisions)
+    - 順番を加えた fingerprint の判定を優先し，なければ通常の fingerprint の判定 (lookup_decisions)
+    - 判定のないレコードは空欄のまま残り，そのレコードのみ人手で確認すれば良い
+"""
+
+
+def build_record_key(df_records: pd.DataFrame) -> pd.Series:
+    year = pd.to_numeric(df_records["year"], errors="coerce").astype("Int64").astype(TEXT_DTYPE).fillna("")
+    authors = df_records["authors"].astype(TEXT_DTYPE).fillna("").str.casefold()
+    fallback_key = "record:" + authors + "|" + normalize_title(df_records["title"]).astype(TEXT_DTYPE) + "|" + year
+
+    record_key = ("doi:" + normalize_doi(df_records["doi"])).fillna("title:" + build_title_year_key(df_records))
+    return record_key.fillna(fallback_key) + "|" + df_records["search_method"].astype(str)
+
+def hash_record_keys(record_key: pd.Series) -> pd.Series:
+    fingerprint = [hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] for key in record_key]
+    return pd.Series(fingerprint, index=record_key.index, dtype=TEXT_DTYPE)
+
+def record_fingerprint(df_records: pd.DataFrame) -> pd.Series:
+    return hash_record_keys(build_record_key(df_records))
+
+def ranked_fingerprint(df_records: pd.DataFrame) -> pd.Series:
+    # 同じキーを持つレコードの中での順番 (0, 1, ...) を加え，同じ source 内の重複の各レコードを区別する
+    record_key = build_record_key(df_records)
+    rank = record_key.groupby(record_key, sort=False).cumcount()
+
+    return hash_record_keys(record_key + "#" + rank.astype(str))
+
+def lookup_decisions(df_records: pd.DataFrame, stored_values: pd.Series) -> pd.Series:
+    # 順番で区別して保存した判定を優先し，なければ順番を含まない fingerprint の判定
+    ranked_values = ranked_fingerprint(df_records).map(stored_values)
+
+    return ranked_values.fillna(record_fingerprint(df_records).map(stored_values))
+
+def harvest_decisions(df_workbook: pd.DataFrame, decision: str) -> pd.DataFrame:
+    value = pd.to_numeric(df_workbook[decision], errors="coerce")
+    if decision in BLANK_MEANS_NEGATIVE:
+        value = value.fillna(0)
+
+    df_decisions = pd.DataFrame({
+        "fingerprint": record_fingerprint(df_workbook),
+        "decision": decision,
+        "value": value.astype("Int8")
+    })
+
+    # 1 つの fingerprint に異なる判定がある場合 (同じ source 内の重複) は，順番で区別した fingerprint で保存
+    n_values = df_decisions.dropna(subset=["value"]).groupby("fingerprint")["value"].transform("nunique")
+    mask_ambiguous = (n_values > 1).reindex(df_decisions.index, fill_value=False)
+    if mask_ambiguous.any():
+        print(f"{df_decisions.loc[mask_ambiguous, 'fingerprint'].nunique()} ambiguous fingerprints were ranked")
+    df_decisions["fingerprint"] = ranked_fingerprint(df_workbook).where(mask_ambiguous, df_decisions["fingerprint"])
+
+    return df_decisions.dropna(subset=["value"]).drop_duplicates(subset="fingerprint")
+
+def load_decision_store(config: Config) -> pd.DataFrame:
+    store_path = config.processed_data_dir / DECISION_STORE_FILENAME
+    if not store_path.exists():
+        return pd.DataFrame({
+            "fingerprint": pd.Series(dtype=TEXT_DTYPE),
+            "decision": pd.Series(dtype=TEXT_DTYPE),
+            "value": pd.Series(dtype="Int8")
+        })
+
+    return pd.read_parquet(store_path)
+
+def save_decisions(config: Config, df_decisions: pd.DataFrame) -> None:
+    # 既存の判定は，新しく取り出した判定で上書き
+    df_store = pd.concat([load_decision_store(config), df_decisions], ignore_index=True)
+    df_store = df_store.drop_duplicates(subset=["fingerprint", "decision"], keep="last").reset_index(drop=True)
+
+    df_store.to_parquet(config.processed_data_dir / DECISION_STORE_FILENAME, index=False)
+
+def load_decision_values(config: Config, decision: str) -> pd.Series:
+    df_store = load_decision_store(config)
+
+    return df_store[df_store["decision"] == decision].set_index("fingerprint")["value"]
+
+def fill_decisions(df_records: pd.DataFrame, stored_values: pd.Series, decision: str) -> pd.DataFrame:
+    values = lookup_decisions(df_records, stored_values)
+
+    df_records = df_records.copy()
+    df_records[decision] = values.astype(object).where(values.notna(), "")
+
+    return df_records
+
+def apply_decisions(config: Config, df_records: pd.DataFrame, decision: str) -> pd.DataFrame:
+    df_records = fill_decisions(df_records, load_decision_values(config, decision), decision)
+
+    n_reapplied = (df_records[decision] != "").sum()
+    print(f"{n_reapplied} {decision} decisions were re-applied, {len(df_records) - n_reapplied} records need review")
+
+    return df_records
+
+def main() -> None:
+    config = Config()
+
+    for filename, decision in DECISION_WORKBOOKS.items():
+        df_workbook = read_screening_workbook(config.external_data_dir / filename)
+        df_decisions = harvest_decisions(df_workbook, decision)
+        save_decisions(config, df_decisions)
+
+        print(f"{len(df_decisions)} {decision} decisions were stored from {filename}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import json
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import unquote
+
+import pandas as pd
+import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+from config import Config
+from record_export import get_source_stat, get_table_path, read_table
+from record_schema import TEXT_DTYPE
+
+# pyarrow (RE2) でベクトル化して処理するため，パターンは文字列のまま渡す
+DOI_PREFIX_PATTERN = r"^(?:(?:https?://)?(?:dx\.)?doi\.org/|doi:\s*)+"
+DOI_TRAILING_PUNCTUATION_PATTERN = r"[\s.,;:]+$"
+SOURCE_STAT_KEY = b"source_stat" # index の parquet の metadata に記録する元の parquet の (サイズ，更新時刻)
+
+"""
+1. doi を正規化 (normalize_doi)
+    - 小文字化，前後の空白を除去
+    - https://doi.org/, http://dx.doi.org/, doi: などの prefix を除去
+    - URL エンコード (%2F 等) を復号
+    - 末尾の句読点 (. , ; :) を除去
+2. 正規化した doi のユニークな配列 (pyarrow.Array) を index として作成 (build_doi_index)
+3. summarize_db_result で index を parquet として保存し (export_doi_index)，manual search の stage で読み込み
+    - index は summarize_db_result の出力としてのみ書き込む (並列に実行される stage が同じファイルを書かないため)
+    - 一時ファイルに書き込んでから置き換える
+    - index を作成した時の元の parquet の (サイズ，更新時刻) を metadata に記録し，一致する場合のみ再利用
+    - 更新時刻の大小では比較しない (artifact_store が古い parquet を張り直すと，更新時刻が index より古くなるため)
+    - 一致しない場合は読み込む側でメモリ上に作り直す (load_or_build_doi_index，ファイルは書き換えない)
+4. pyarrow.compute.is_in (hash set) による一括照会で重複判定 (O(n + m))
+    - pandas の ArrowStringArray.isin は遅いため直接 pyarrow を使う
+"""
+
+
+def normalize_doi(doi: pd.Series) -> pd.Series:
+    doi_normalized = doi.astype(TEXT_DTYPE).str.strip().str.lower()
+    doi_normalized = doi_normalized.str.replace(DOI_PREFIX_PATTERN, "", regex=True)
+
+    # URL エンコードされている doi のみ unquote (全件に Python の関数を適用しないため)
+    mask_encoded = doi_normalized.str.contains("%", regex=False).fillna(False)
+    if mask_encoded.any():
+        doi_normalized[mask_encoded] = doi_normalized[mask_encoded].map(unquote).str.lower()
+
+    doi_normalized = doi_normalized.str.replace(DOI_TRAILING_PUNCTUATION_PATTERN, "", regex=True)
+
+    return doi_normalized.replace("", pd.NA)
+
+def build_doi_index(doi: pd.Series) -> pa.Array:
+    doi_normalized = normalize_doi(doi).dropna()
+
+    return pc.unique(pa.array(doi_normalized, type=pa.string()))
+
+def get_doi_index_path(config: Config, filename: str) -> Path:
+    return config.processed_data_dir / f"{filename}_doi_index.parquet"
+
+def save_doi_index(doi_index: pa.Array, index_path: Path, source_stat: List[int]) -> None:
+    table = pa.table({"doi": doi_index}).replace_schema_metadata({SOURCE_STAT_KEY: json.dumps(source_stat)})
+    temp_path = index_path.with_name(f".{index_path.name}.tmp")
+    pq.write_table(table, temp_path)
+    temp_path.replace(index_path)
+
+def load_doi_index(index_path: Path, source_stat: List[int]) -> Optional[pa.Array]:
+    # 元の parquet の (サイズ，更新時刻) が記録と一致しない場合は None
+    metadata = pq.read_schema(index_path).metadata or {}
+    if SOURCE_STAT_KEY not in metadata or json.loads(metadata[SOURCE_STAT_KEY]) != source_stat:
+        return None
+
+    return pq.read_table(index_path).column("doi").combine_chunks()
+
+def build_doi_index_from_table(source_path: Path) -> pa.Array:
+    df_source = read_table(source_path, ["doi"])
+    return build_doi_index(df_source["doi"])
+
+def export_doi_index(config: Config, filename: str = "db_search_merged_unique") -> pa.Array:
+    source_path = get_table_path(config, filename)
+    doi_index = build_doi_index_from_table(source_path)
+    save_doi_index(doi_index, get_doi_index_path(config, filename), get_source_stat(source_path))
+
+    return doi_index
+
+def load_or_build_doi_index(config: Config, filename: str = "db_search_merged_unique") -> pa.Array:
+    source_path = get_table_path(config, filename)
+    index_path = get_doi_index_path(config, filename)
+
+    doi_index = load_doi_index(index_path, get_source_stat(source_path)) if index_path.exists() else None
+    if doi_index is None:
+        doi_index = build_doi_index_from_table(source_path)
+
+    return doi_index
+
+def is_indexed_doi(doi: pd.Series, doi_index: pa.Array) -> pd.Series:
+    doi_normalized = pa.array(normalize_doi(doi), type=pa.string())
+    mask_indexed = pc.is_in(doi_normalized, value_set=doi_index) # null は False
+
+    return pd.Series(mask_indexed.to_numpy(zero_copy_only=False), index=doi.index, dtype=bool)
@@ -0,0 +1,97 @@
+import dataclasses
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+import pyarrow as pa  # type: ignore
+import pyarrow.compute as pc  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+from config import Config
+from doi_index import normalize_doi
+from record_linkage import build_title_year_key
+from stage_catalog import FINGERPRINT_INDEX_DIRNAME, SEARCH_ROUNDS
+
+FINGERPRINT_SCHEMA = pa.schema([("doi_key", pa.string()), ("title_key", pa.string())])
+
+"""
+スクリーニングに回したレコードの fingerprint を検索ラウンドごとに保存し，次のラウンドでは新しいレコードのみを取り出す
+
+1. レコードの fingerprint を作成 (compute_fingerprints)
+    - doi_key ... 正規化した doi (doi_index.normalize_doi)
+    - title_key ... 正規化したタイトル + 出版年 (record_linkage と同じキー，短いタイトルは使わない)
+        - 同名の別文献 (例: "Cross-cultural pragmatic failure" 1983 / 2019) を既出としないため出版年も含める
+2. ラウンドの最後 (merge_db_manual_search_results 等) に，そのラウンドの fingerprint を追記 (append_round)
+    - processed/fingerprint_index/<round>.parquet として保存 (既存のラウンドは読み書きしない)
+    - 同じラウンドを再実行した場合は上書き
+3. 新しいラウンドでは，SEARCH_ROUNDS の順番でそれより前のラウンドの fingerprint のみを読み込み (load_fingerprint_index)
+    - ラウンドの順番は stage_catalog.SEARCH_ROUNDS
+    - 前のラウンドを再実行した場合も，後のラウンド (re_* 等) の fingerprint では除去しない
+4. doi_key / title_key のどちらかが index にあるレコードを既出として除去 (filter_new_records)
+    - pyarrow.compute.is_in (hash set) による一括照会のため，新しいラウンドのレコード数に比例した時間で済む
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class FingerprintIndex:
+    doi_keys: pa.Array
+    title_keys: pa.Array
+
+def compute_fingerprints(df_records: pd.DataFrame) -> pd.DataFrame:
+    df_fingerprints = pd.DataFrame({
+        "doi_key": normalize_doi(df_records["doi"]),
+        "title_key": build_title_year_key(df_records)
+    }, index=df_records.index)
+
+    return df_fingerprints
+
+def get_round_path(config: Config, round_name: str) -> Path:
+    return config.processed_data_dir / FINGERPRINT_INDEX_DIRNAME / f"{round_name}.parquet"
+
+def get_previous_rounds(round_name: str) -> List[str]:
+    if round_name not in SEARCH_ROUNDS:
+        raise KeyError(f"Search round {round_name} was not found in {SEARCH_ROUNDS}")
+
+    return SEARCH_ROUNDS[:SEARCH_ROUNDS.index(round_name)]
+
+def append_round(config: Config, round_name: str, df_records: pd.DataFrame) -> None:
+    get_previous_rounds(round_name) # SEARCH_ROUNDS にないラウンドは保存しない
+    round_path = get_round_path(config, round_name)
+    round_path.parent.mkdir(parents=True, exist_ok=True)
+
+    table = pa.Table.from_pandas(compute_fingerprints(df_records), schema=FINGERPRINT_SCHEMA, preserve_index=False)
+    pq.write_table(table, round_path)
+    print(f"{len(df_records)} records were added to the fingerprint index as the {round_name} round")
+
+def load_fingerprint_index(config: Config, round_name: str) -> FingerprintIndex:
+    # round_name より前のラウンドのうち，保存済みのもの
+    round_paths = [get_round_path(config, previous_round) for previous_round in get_previous_rounds(round_name)]
+    round_paths = [round_path for round_path in round_paths if round_path.exists()]
+
+    if not round_paths:
+        return FingerprintIndex(pa.array([], type=pa.string()), pa.array([], type=pa.string()))
+
+    table = pa.concat_tables([pq.read_table(round_path, schema=FINGERPRINT_SCHEMA) for round_path in round_paths])
+    return FingerprintIndex(
+        doi_keys=pc.unique(pc.drop_null(table.column("doi_key")).combine_chunks()),
+        title_keys=pc.unique(pc.drop_null(table.column("title_key")).combine_chunks())
+    )
+
+def is_known_record(df_records: pd.DataFrame, fingerprint_index: FingerprintIndex) -> pd.Series:
+    df_fingerprints = compute_fingerprints(df_records)
+
+    mask_known_doi = pc.is_in(pa.array(df_fingerprints["doi_key"], type=pa.string()), fingerprint_index.doi_keys)
+    mask_known_title = pc.is_in(
+        pa.array(df_fingerprints["title_key"], type=pa.string()), fingerprint_index.title_keys
+    )
+    mask_known = pc.or_(mask_known_doi, mask_known_title) # null は False
+
+    return pd.Series(mask_known.to_numpy(zero_copy_only=False), index=df_records.index, dtype=bool)
+
+def filter_new_records(config: Config, df_records: pd.DataFrame, round_name: str) -> pd.DataFrame:
+    # 再実行時に自分自身や後のラウンドと照会しないよう，前のラウンドのみ
+    fingerprint_index = load_fingerprint_index(config, round_name)
+
+    mask_known = is_known_record(df_records, fingerprint_index)
+    print(f"{mask_known.sum()} records were already screened in the previous rounds!")
+
+    return df_records[~mask_known].reset_index(drop=True)
@@ -3,6 +3,8 @@ from typing import Dict, Generator, List, Tuple
 
 import pandas as pd
 from config import Config
+from profiler import count_api_call, profiled
+from record_export import write_records
 from semanticscholar import SemanticScholar  # type: ignore
 from tqdm import tqdm
 
@@ -48,8 +50,10 @@ def filter_duplicted_items(retrieved_items: List[dict]) -> pd.DataFrame:
 
     return df_citing_paper
 
+@profiled
 def retrieve_paper_meta_info(paper_id: str, semantic_scholar: SemanticScholar) -> Dict[str, str]:
     try:
+        count_api_call()
         paper_meta_info = semantic_scholar.get_paper(
             paper_id,
             fields=["authors", "year", "title", "abstract", "externalIds"]
@@ -103,6 +107,7 @@ def main() -> None:
     for paper, paper_id_for_search in generate_paper_meta_info(df_target_paper_meta_info):
         pbar.set_description(f"[{paper}] Retrieving citations from Sematinc Scholar...")
 
+        count_api_call()
         citations = semantic_scholar.get_paper_citations(paper_id_for_search, limit=CITATION_RETRIEVE_LIMIT)
         retrieved_items += citations.items
 
@@ -119,7 +124,7 @@ def main() -> None:
         pbar.update(1)
 
     df_forward_search_result = pd.DataFrame(data)
-    df_forward_search_result.to_csv(config.processed_data_dir / "forward_search_result.csv", index=False)
+    write_records(config, df_forward_search_result, "forward_search_result")
 
 if __name__ == "__main__":
     main()
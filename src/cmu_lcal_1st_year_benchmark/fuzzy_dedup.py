@@ -0,0 +1,224 @@
+import itertools
+import re
+import zlib
+from typing import Any, Dict, Hashable, List, Tuple
+
+import numpy as np
+import pandas as pd
+from author_index import canonical_authors, first_author_surnames
+from config import Config
+from doi_index import normalize_doi
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from record_export import read_records
+from record_schema import DUP_REMOVE_COLUMNS, TEXT_COLUMNS
+from text_normalizer import MATCH_KEY_NORMALIZATION, normalize_text
+
+N_PERMUTATIONS = 64
+N_BANDS = 16 # 1 band あたり 4 行 → Jaccard 0.5 前後から候補になる
+SHINGLE_SIZE = 3
+MINHASH_SEED = 42
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+CHUNK_SIZE = 2_000
+MAX_BUCKET_SIZE = 50 # 同じタイトルが大量にある bucket (空タイトル等) は候補にしない
+
+CANDIDATE_THRESHOLD = 0.8
+DUPLICATE_THRESHOLD = 0.9
+
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+
+"""
+doi を持たない重複レコードを自動で検出する
+
+1. タイトルを正規化 (text_normalizer による casefold 等の後に記号除去) し，文字 3-gram の shingle を作成
+2. shingle から MinHash signature を計算 (CHUNK_SIZE 件ずつ numpy で一括計算)
+3. signature を N_BANDS 個の band に分割し，band ごとに同じ値を持つレコードを候補ペアとする (LSH)
+    - 全ペアの比較 (O(n^2)) をせずに，ほぼ線形時間で候補を絞る
+4. 候補ペアについて，タイトルの類似度 (signature の一致率)・出版年・第一著者の姓 (author_index) を比較
+    - 3 つ全てが一致する (類似度 >= DUPLICATE_THRESHOLD) ペアは重複として is_duplicated = 1
+    - ただし，両方が異なる doi を持つペア (正誤表，再録，章と本など) は自動では重複とせず，境界的なペアとする
+    - それ以外 (類似度 >= CANDIDATE_THRESHOLD) は境界的なペアとして人手で確認
+5. manual_dup_remove.xlsx と同じレイアウトでワークブックを保存 (openpyxl が書き込めない制御文字は除去)
+    - records シート ... 全レコード (自動で判定した is_duplicated 付き)
+    - candidate_pairs シート ... 境界的なペアを類似度の高い順に 2 行ずつ
+"""
+
+
+def normalize_title(title: pd.Series) -> pd.Series:
+    title_normalized = normalize_text(title, MATCH_KEY_NORMALIZATION).fillna("").astype(str)
+    title_normalized = title_normalized.str.replace(NON_WORD_PATTERN, " ", regex=True).str.strip()
+
+    return title_normalized
+
+def shingle_hashes(title: str) -> np.ndarray:
+    if len(title) <= SHINGLE_SIZE:
+        shingles = {title} if title else set()
+    else:
+        shingles = {title[idx:idx + SHINGLE_SIZE] for idx in range(len(title) - SHINGLE_SIZE + 1)}
+
+    return np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64)
+
+def generate_permutations() -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(MINHASH_SEED)
+    coef_a = rng.integers(1, 1 << 32, size=N_PERMUTATIONS, dtype=np.uint64)
+    coef_b = rng.integers(0, 1 << 32, size=N_PERMUTATIONS, dtype=np.uint64)
+
+    return coef_a, coef_b
+
+def compute_minhash_signatures(titles: pd.Series) -> np.ndarray:
+    coef_a, coef_b = generate_permutations()
+    signatures = np.full((len(titles), N_PERMUTATIONS), np.iinfo(np.uint64).max, dtype=np.uint64)
+
+    shingle_list = [shingle_hashes(title) for title in titles]
+    for start in range(0, len(shingle_list), CHUNK_SIZE):
+        chunk = shingle_list[start:start + CHUNK_SIZE]
+        lengths = np.array([len(shingles) for shingles in chunk])
+        mask_nonempty = lengths > 0
+        if not mask_nonempty.any():
+            continue
+
+        # (a * x + b) mod p を chunk 内の全 shingle について一括計算し，レコードごとに最小値を取る
+        hashes = np.concatenate([shingles for shingles in chunk if len(shingles)])
+        permuted = (coef_a[:, None] * hashes[None, :] + coef_b[:, None]) % MERSENNE_PRIME
+        offsets = np.concatenate([[0], np.cumsum(lengths[mask_nonempty])[:-1]])
+        row_idx = start + np.nonzero(mask_nonempty)[0]
+        signatures[row_idx] = np.minimum.reduceat(permuted, offsets, axis=1).T
+
+    return signatures
+
+def find_candidate_pairs(signatures: np.ndarray, mask_valid: np.ndarray) -> np.ndarray:
+    n_records = len(signatures)
+    rows_per_band = N_PERMUTATIONS // N_BANDS
+    valid_idx = np.nonzero(mask_valid)[0]
+
+    pair_keys = []
+    for band in range(N_BANDS):
+        band_values = np.ascontiguousarray(
+            signatures[valid_idx, band * rows_per_band:(band + 1) * rows_per_band]
+        ).view(np.dtype((np.void, 8 * rows_per_band))).ravel()
+        _, bucket_ids, bucket_sizes = np.unique(band_values, return_inverse=True, return_counts=True)
+
+        mask_shared = (bucket_sizes[bucket_ids] > 1) & (bucket_sizes[bucket_ids] <= MAX_BUCKET_SIZE)
+        members = valid_idx[mask_shared]
+        member_buckets = bucket_ids[mask_shared]
+
+        order = np.argsort(member_buckets, kind="stable")
+        members, member_buckets = members[order], member_buckets[order]
+        boundaries = np.nonzero(np.diff(member_buckets))[0] + 1
+        for bucket in np.split(members, boundaries):
+            for idx_a, idx_b in itertools.combinations(bucket, 2):
+                pair_keys.append(idx_a * n_records + idx_b)
+
+    if not pair_keys:
+        return np.empty((0, 2), dtype=np.int64)
+
+    unique_keys = np.unique(np.array(pair_keys, dtype=np.int64))
+    return np.stack([unique_keys // n_records, unique_keys % n_records], axis=1)
+
+def detect_fuzzy_duplicates(df_records: pd.DataFrame) -> pd.DataFrame:
+    # 1. normalize match keys
+    titles = normalize_title(df_records["title"])
+    years = pd.to_numeric(df_records["year"], errors="coerce").to_numpy(dtype=float)
+    surnames = first_author_surnames(canonical_authors(df_records)).replace("", None)
+    surname_codes, _ = pd.factorize(surnames) # 姓のないレコードは -1
+    doi_codes, _ = pd.factorize(normalize_doi(df_records["doi"])) # doi のないレコードは -1
+
+    # 2. MinHash & LSH blocking
+    signatures = compute_minhash_signatures(titles)
+    pairs = find_candidate_pairs(signatures, (titles != "").to_numpy())
+
+    # 3. score candidate pairs
+    idx_a, idx_b = pairs[:, 0], pairs[:, 1]
+    similarity = (signatures[idx_a] == signatures[idx_b]).mean(axis=1)
+    same_year = years[idx_a] == years[idx_b]
+    same_first_author = (surname_codes[idx_a] == surname_codes[idx_b]) & (surname_codes[idx_a] != -1)
+    different_doi = (doi_codes[idx_a] != doi_codes[idx_b]) & (doi_codes[idx_a] != -1) & (doi_codes[idx_b] != -1)
+
+    df_pairs = pd.DataFrame({
+        "record_a": idx_a,
+        "record_b": idx_b,
+        "similarity": similarity,
+        "same_year": same_year,
+        "same_first_author": same_first_author,
+        "different_doi": different_doi
+    })
+    df_pairs = df_pairs[df_pairs["similarity"] >= CANDIDATE_THRESHOLD]
+    df_pairs["is_duplicated"] = (
+        (df_pairs["similarity"] >= DUPLICATE_THRESHOLD) & df_pairs["same_year"] & df_pairs["same_first_author"]
+        & ~df_pairs["different_doi"] # doi が異なる場合は別の文献の可能性があるため人手で確認
+    )
+
+    df_pairs = df_pairs.sort_values(
+        ["similarity", "same_year", "same_first_author"], ascending=False, kind="stable"
+    ).reset_index(drop=True)
+
+    return df_pairs
+
+def mark_duplicated_records(df_records: pd.DataFrame, df_pairs: pd.DataFrame) -> pd.Series:
+    # doi / abstract を持つ方を残し，情報の少ない方を重複とする (同じ場合は後ろのレコード)
+    completeness = (
+        (df_records["doi"].notna() & (df_records["doi"] != "")).astype(int).to_numpy()
+        + (df_records["abstract"].notna() & (df_records["abstract"] != "")).astype(int).to_numpy()
+    )
+
+    df_duplicated_pairs = df_pairs[df_pairs["is_duplicated"]]
+    idx_a = df_duplicated_pairs["record_a"].to_numpy()
+    idx_b = df_duplicated_pairs["record_b"].to_numpy()
+    idx_duplicated = np.where(completeness[idx_a] > completeness[idx_b], idx_b, idx_a)
+    idx_duplicated = np.where(completeness[idx_a] == completeness[idx_b], idx_b, idx_duplicated)
+
+    is_duplicated = pd.Series(pd.NA, index=df_records.index, dtype="Int8") # 空欄 (NA) は重複ではない
+    is_duplicated.iloc[np.unique(idx_duplicated)] = 1
+
+    return is_duplicated
+
+def build_candidate_pair_sheet(df_records: pd.DataFrame, df_pairs: pd.DataFrame) -> pd.DataFrame:
+    df_borderline_pairs = df_pairs[~df_pairs["is_duplicated"]].reset_index(drop=True)
+
+    pairs = zip(
+        df_borderline_pairs["record_a"].to_numpy(),
+        df_borderline_pairs["record_b"].to_numpy(),
+        df_borderline_pairs["similarity"].to_numpy()
+    )
+
+    rows: List[Dict] = []
+    for pair_id, (record_a, record_b, similarity) in enumerate(pairs, start=1):
+        for record_idx in [int(record_a), int(record_b)]:
+            row: Dict[Hashable, Any] = {
+                "pair_id": pair_id,
+                "similarity": round(float(similarity), 3),
+                "record_row": record_idx + 2 # records シートの行番号 (ヘッダー分 +1，1 始まり)
+            }
+            row.update(df_records.iloc[record_idx].to_dict())
+            row["is_duplicated"] = ""
+            rows.append(row)
+
+    return pd.DataFrame(rows, columns=["pair_id", "similarity", "record_row"] + DUP_REMOVE_COLUMNS)
+
+def remove_illegal_characters(df_records: pd.DataFrame) -> pd.DataFrame:
+    df_records = df_records.copy()
+    for column in TEXT_COLUMNS: # openpyxl が書き込めない制御文字を除去
+        df_records[column] = df_records[column].str.replace(ILLEGAL_CHARACTERS_RE.pattern, "", regex=True)
+
+    return df_records
+
+def main() -> None:
+    config = Config()
+    df_records = read_records(config, "db_search_records")
+    df_records = remove_illegal_characters(df_records)
+
+    df_pairs = detect_fuzzy_duplicates(df_records)
+    print(f"{df_pairs['is_duplicated'].sum()} duplicated pairs were automatically detected!")
+    print(f"{(~df_pairs['is_duplicated']).sum()} borderline pairs need manual review")
+
+    is_duplicated = mark_duplicated_records(df_records, df_pairs)
+    if "is_duplicated" in df_records.columns: # decision_store で再適用された人手の判定を優先
+        is_duplicated = df_records["is_duplicated"].astype("Int8").fillna(is_duplicated)
+    df_records["is_duplicated"] = is_duplicated.astype("Int8")
+    df_candidate_pairs = build_candidate_pair_sheet(df_records, df_pairs)
+
+    with pd.ExcelWriter(config.processed_data_dir / "db_search_records_auto_dup_remove.xlsx") as writer:
+        df_records[DUP_REMOVE_COLUMNS].to_excel(writer, sheet_name="records", index=False)
+        df_candidate_pairs.to_excel(writer, sheet_name="candidate_pairs", index=False)
+
+if __name__ == "__main__":
+    main()
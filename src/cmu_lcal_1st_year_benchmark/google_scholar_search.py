@@ -3,6 +3,8 @@ from typing import Any, Dict, Generator, List
 
 import pandas as pd
 from config import Config
+from profiler import count_api_call, profiled
+from record_export import write_records
 from serpapi import GoogleScholarSearch  # type: ignore
 from tqdm import tqdm
 
@@ -51,6 +53,7 @@ def google_scholar_retrieve_result_generator(query: str, api_key: str, config: C
         bkup_file_path = bkup_dir / f"{query}_{offset}.json"
 
         if not bkup_file_path.exists():
+            count_api_call()
             result = GoogleScholarSearch({"q": query, "api_key": api_key, "start": str(offset), "num": str(n_search)})
             result = result.get_dict()
 
@@ -70,6 +73,7 @@ def google_scholar_retrieve_result_generator(query: str, api_key: str, config: C
         offset += n_search
         yield result
 
+@profiled
 def extract_meta_info(retrieved_items: Dict[str, Any]) -> List[Dict[str, str]]:
     meta_info_list = []
     for item in retrieved_items["organic_results"]:
@@ -107,7 +111,7 @@ def main() -> None:
 
     # df として保存し，csv として書き出し
     df_google_scholar_result = pd.DataFrame(data)
-    df_google_scholar_result.to_csv(config.processed_data_dir / "google_scholar_result.csv", index=False)
+    write_records(config, df_google_scholar_result, "google_scholar_result")
 
 if __name__ == "__main__":
     main()
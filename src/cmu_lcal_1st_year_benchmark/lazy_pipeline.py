@@ -0,0 +1,100 @@
+import dataclasses
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+from config import Config
+from organize_db_result_for_manual_dup_remove import (
+    apply_duplicate_decisions,
+    filter_ineligible_year_records,
+    sort_records,
+)
+from record_export import write_records
+from record_schema import OUTPUT_COLUMNS, concat_records
+from source_adapters import load_source
+from stage_catalog import DB_SEARCH_SOURCES
+from summarize_db_result import remove_doi_duplicated
+
+# pipeline の stage が保存する db_search_records とは別の名前
+LAZY_OUTPUT_TABLE = "db_search_records_lazy"
+
+"""
+summarize_db_result → organize_db_result_for_manual_dup_remove の処理を 1 つの lazy plan として実行する
+
+1. plan を組み立てる (読み込む source, scan 時の predicate, 後続の処理)
+    - 読み込む列は adapter の usecols で決まる (projection は adapter 側で行い，plan では指定しない)
+2. collect で plan を実行
+    a. source ごとに読み込み，その場で predicate を適用 (predicate pushdown)
+    b. 残ったレコードのみ concat し，後続の処理 (doi 重複除去 → 年での filter → sort → 判定の再適用) を適用
+3. 結果を db_search_records_lazy.parquet として保存 (eager 版の 2 スクリプトを順に実行した結果と同一)
+    - db_search_records.parquet は pipeline の stage のみが書き込み，artifact_store に保存される
+
+※ 出版年の predicate はそのまま doi 重複除去より前に移動できない
+   (古い年の高優先度レコードが新しい年の重複レコードを除去するため)
+   scan 時には「年が条件を満たす，または doi を持つ」レコードのみ残し，正確な filter は重複除去後に行う
+"""
+
+Predicate = Callable[[pd.DataFrame], pd.Series]
+Operation = Callable[[pd.DataFrame], pd.DataFrame]
+
+
+@dataclasses.dataclass(frozen=True)
+class LazyPlan:
+    source_names: Tuple[str, ...]
+    scan_predicate: Optional[Predicate] = None
+    operations: Tuple[Operation, ...] = ()
+
+    def filter_at_scan(self, predicate: Predicate) -> "LazyPlan":
+        if self.scan_predicate is None:
+            return dataclasses.replace(self, scan_predicate=predicate)
+
+        current_predicate = self.scan_predicate
+        return dataclasses.replace(
+            self, scan_predicate=lambda df_result: current_predicate(df_result) & predicate(df_result)
+        )
+
+    def pipe(self, operation: Operation) -> "LazyPlan":
+        return dataclasses.replace(self, operations=self.operations + (operation,))
+
+    def collect(self, config: Config) -> pd.DataFrame:
+        dataset_list: List[pd.DataFrame] = []
+        for source_name in self.source_names:
+            df_result = load_source(config, source_name)[OUTPUT_COLUMNS] # adapter の extra_columns は除く
+
+            if self.scan_predicate is not None:
+                df_result = df_result[self.scan_predicate(df_result)]
+            dataset_list.append(df_result)
+
+        df_result_merged = concat_records(dataset_list)
+        for operation in self.operations:
+            df_result_merged = operation(df_result_merged)
+
+        return df_result_merged
+
+def eligible_year_or_has_doi(eligible_year: int) -> Predicate:
+    def predicate(df_result: pd.DataFrame) -> pd.Series:
+        mask_eligible = (df_result["year"] >= eligible_year).fillna(False)
+        mask_has_doi = (df_result["doi"].notna() & (df_result["doi"] != "")).fillna(False)
+        return mask_eligible | mask_has_doi
+
+    return predicate
+
+def build_db_search_records_plan(config: Config) -> LazyPlan:
+    plan = LazyPlan(source_names=tuple(DB_SEARCH_SOURCES))
+    plan = plan.filter_at_scan(eligible_year_or_has_doi(config.eligible_pub_year))
+    plan = plan.pipe(remove_doi_duplicated)
+    plan = plan.pipe(lambda df_result: filter_ineligible_year_records(df_result, config.eligible_pub_year))
+    plan = plan.pipe(sort_records)
+    plan = plan.pipe(lambda df_result: apply_duplicate_decisions(df_result, config))
+
+    return plan
+
+def main() -> None:
+    config = Config()
+    plan = build_db_search_records_plan(config)
+
+    df_db_result = plan.collect(config)
+
+    write_records(config, df_db_result, LAZY_OUTPUT_TABLE)
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,25 @@
 import pandas as pd
 from config import Config
+from decision_store import apply_decisions
+from record_export import read_records, write_records
+from record_schema import DUP_REMOVE_COLUMNS
 
 """
 1. doi ベースで重複を除去した DB search の結果を取得
 2. データを特定の年で filter (今回は 2010以降のみ)
 3. データを authors, year, title の順番で sort
-4. 結果を保存
+4. 以前の is_duplicated の判定を decision_store から再適用 (判定のないレコードは空欄)
+5. 結果を保存
 """
 
 
 def load_db_result(config: Config, filename: str ="db_search_merged_unique") -> pd.DataFrame:
-    db_result_path = config.processed_data_dir / f"{filename}.csv"
-
-    df_db_result = pd.read_csv(db_result_path)
+    df_db_result = read_records(config, filename)
 
     return df_db_result
 
 def filter_ineligible_year_records(df_db_result: pd.DataFrame, eligible_year: int) -> pd.DataFrame:
-    mask_eligible = df_db_result["year"] >= eligible_year
+    mask_eligible = (df_db_result["year"] >= eligible_year).fillna(False) # 出版年が不明なレコードは対象外
     print(f"{(~mask_eligible).sum()} ineligible records were detected!")
 
     df_db_result_filtered = df_db_result[mask_eligible].reset_index(drop=True)
@@ -29,13 +31,19 @@ def sort_records(df_db_result: pd.DataFrame) -> pd.DataFrame:
     df_db_result_sorted = df_db_result_sorted.reset_index(drop=True)
     return df_db_result_sorted
 
+def apply_duplicate_decisions(df_db_result: pd.DataFrame, config: Config) -> pd.DataFrame:
+    df_db_result = apply_decisions(config, df_db_result, "is_duplicated")
+
+    return df_db_result[DUP_REMOVE_COLUMNS]
+
 def main() -> None:
     config = Config()
     df_db_result = load_db_result(config)
     df_db_result = filter_ineligible_year_records(df_db_result, config.eligible_pub_year)
     df_db_result = sort_records(df_db_result)
+    df_db_result = apply_duplicate_decisions(df_db_result, config)
 
-    df_db_result.to_csv(config.processed_data_dir / "db_search_records.csv", index=False)
+    write_records(config, df_db_result, "db_search_records")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,242 @@
+import heapq
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Set, Tuple
+
+import pandas as pd
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+from config import Config
+from decision_store import fill_decisions, load_decision_values
+from parallel_dedup import POSITION_COLUMN, SORT_COLUMNS, iter_sort_keys
+from record_export import get_table_path, iter_table_chunks, normalize_for_parquet
+from record_schema import (
+    CATEGORICAL_COLUMNS,
+    DUP_REMOVE_COLUMNS,
+    OUTPUT_COLUMNS,
+    TEXT_DTYPE,
+    concat_records,
+    enforce_schema,
+    memory_usage_mb,
+)
+from ris_reader import ris_batch_generator
+from source_adapters import SOURCE_ADAPTERS, apply_adapter, read_csv_source, read_ris_source, read_table_source
+from stage_catalog import DB_SEARCH_SOURCES, SEARCH_METHOD_PRIORITY
+
+CHUNK_ROWS = 10_000
+SQLITE_MAX_VARIABLES = 900
+
+"""
+メモリに乗らない規模の検索結果に対して，summarize_db_result → organize_db_result_for_manual_dup_remove を
+chunk 単位で実行する
+
+1. source を search_method の優先度順に，CHUNK_ROWS 行ずつ読み込み (iter_source_chunks)
+    - csv は read_csv の chunksize，RIS は ris_batch_generator で分割して読み込み
+    - 各 stage が保存した表は iter_table_chunks で読み込み (parquet は iter_batches，まだない場合は csv の chunksize)
+    - xls / xlsx (spreadsheet_reader) は分割して読めないため，1 ファイルずつ読み込んだ後に分割
+    - 読み込んだ順番の行番号 (POSITION_COLUMN) を付与 (優先度で stable sort した順番と同じ)
+2. doi の重複除去を chunk ごとに行う (remove_doi_duplicated_chunk)
+    - 既出の doi は sqlite の on-disk index (DoiKeyIndex) に保存して照会
+3. 出版年で filter し，残ったレコードを外部 merge sort (ExternalSorter)
+    - バッファが Config.memory_limit_mb の半分を超えたら sort して parquet に書き出し (spill)
+    - 最後に spill した run を少しずつ読み込みながら k-way merge
+4. 以前の is_duplicated の判定を再適用しながら，chunk ごとに parquet に追記
+    - chunk ごとに型が変わらないように，category は文字列，is_duplicated は Int64 として書き込み (to_record_table)
+    - 結果は summarize_db_result → organize_db_result_for_manual_dup_remove の結果と同一
+"""
+
+
+class DoiKeyIndex:
+    def __init__(self, db_path: Path) -> None:
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS doi_keys (doi TEXT PRIMARY KEY)")
+
+    def contains(self, dois: List[str]) -> Set[str]:
+        seen_dois: Set[str] = set()
+        for start in range(0, len(dois), SQLITE_MAX_VARIABLES):
+            batch = dois[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.connection.execute(f"SELECT doi FROM doi_keys WHERE doi IN ({placeholders})", batch)
+            seen_dois.update(row[0] for row in rows)
+
+        return seen_dois
+
+    def add(self, dois: List[str]) -> None:
+        self.connection.executemany("INSERT OR IGNORE INTO doi_keys (doi) VALUES (?)", [(doi,) for doi in dois])
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+class ExternalSorter:
+    def __init__(self, spill_dir: Path, memory_limit_mb: float) -> None:
+        self.spill_dir = spill_dir
+        self.memory_limit_mb = memory_limit_mb
+        self.buffer: List[pd.DataFrame] = []
+        self.buffer_mb = 0.0
+        self.run_paths: List[Path] = []
+        self.n_rows = 0
+        self.total_mb = 0.0
+
+    def add(self, df_chunk: pd.DataFrame) -> None:
+        chunk_mb = memory_usage_mb(df_chunk)
+        self.buffer.append(df_chunk)
+        self.buffer_mb += chunk_mb
+        self.n_rows += len(df_chunk)
+        self.total_mb += chunk_mb
+
+        # sort 時のコピーを考慮して，上限の半分で書き出す
+        if self.buffer_mb > self.memory_limit_mb / 2:
+            self.spill()
+
+    def spill(self) -> None:
+        if not self.buffer:
+            return
+
+        df_run = concat_records(self.buffer).sort_values(by=SORT_COLUMNS + [POSITION_COLUMN])
+        run_path = self.spill_dir / f"run_{len(self.run_paths):05d}.parquet"
+        df_run.to_parquet(run_path, index=False)
+
+        self.run_paths.append(run_path)
+        self.buffer = []
+        self.buffer_mb = 0.0
+
+    def iter_run_rows(self, run_path: Path, run_id: int, batch_rows: int) -> Iterator[Tuple]:
+        for batch in pq.ParquetFile(run_path).iter_batches(batch_size=batch_rows):
+            df_batch = enforce_schema(batch.to_pandas())
+            records = df_batch[OUTPUT_COLUMNS].astype(object).where(df_batch[OUTPUT_COLUMNS].notna(), None)
+
+            for sort_key, record in zip(iter_sort_keys(df_batch, run_id), records.itertuples(index=False)):
+                yield sort_key[:-2] + (tuple(record),) # 行番号が一意なので record 同士は比較されない
+
+    def iter_sorted_chunks(self, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        self.spill()
+        if not self.run_paths:
+            return
+
+        # 各 run から同時に読み込む行数を，メモリの上限の半分に収まるように決める
+        row_mb = self.total_mb / max(self.n_rows, 1)
+        batch_rows = max(1, int(self.memory_limit_mb / 2 / len(self.run_paths) / max(row_mb, 1e-6)))
+        batch_rows = min(batch_rows, chunk_rows)
+
+        merged_rows = heapq.merge(*[
+            self.iter_run_rows(run_path, run_id, batch_rows) for run_id, run_path in enumerate(self.run_paths)
+        ])
+
+        records: List[Tuple] = []
+        for merged_row in merged_rows:
+            records.append(merged_row[-1])
+            if len(records) == chunk_rows:
+                yield enforce_schema(pd.DataFrame.from_records(records, columns=OUTPUT_COLUMNS))
+                records = []
+
+        if records:
+            yield enforce_schema(pd.DataFrame.from_records(records, columns=OUTPUT_COLUMNS))
+
+def iter_source_chunks(config: Config, source_name: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    if source_name not in SOURCE_ADAPTERS:
+        raise KeyError(f"Adapter for {source_name} was not found")
+    adapter = SOURCE_ADAPTERS[source_name]
+    file_path: Path = getattr(config, adapter.data_dir) / adapter.filename
+
+    if adapter.reader is read_csv_source:
+        raw_chunks: Iterator[pd.DataFrame] = pd.read_csv(
+            file_path, usecols=adapter.usecols, dtype=adapter.dtype, chunksize=chunk_rows
+        )
+    elif adapter.reader is read_ris_source:
+        raw_chunks = (batch.to_pandas() for batch in ris_batch_generator(file_path, chunk_rows))
+    elif adapter.reader is read_table_source:
+        raw_chunks = iter_table_chunks(file_path, adapter.usecols, chunk_rows)
+    else:
+        df_raw = adapter.reader(file_path, adapter.usecols, adapter.dtype)
+        raw_chunks = (df_raw.iloc[start:start + chunk_rows] for start in range(0, len(df_raw), chunk_rows))
+
+    for df_raw_chunk in raw_chunks: # xls の generator が参照する df_raw を上書きしないよう別の名前にする
+        if adapter.usecols is not None:
+            df_raw_chunk = df_raw_chunk[adapter.usecols]
+        yield apply_adapter(df_raw_chunk, adapter)[OUTPUT_COLUMNS]
+
+def sort_sources_by_priority(source_names: List[str]) -> List[str]:
+    return sorted(
+        source_names,
+        key=lambda source_name: SEARCH_METHOD_PRIORITY[SOURCE_ADAPTERS[source_name].constant_columns["search_method"]]
+    )
+
+def remove_doi_duplicated_chunk(df_chunk: pd.DataFrame, doi_index: DoiKeyIndex) -> Tuple[pd.DataFrame, int]:
+    doi = df_chunk["doi"].astype(object)
+    mask_has_doi = (doi.notna() & (doi != "")).to_numpy(dtype=bool)
+    chunk_dois = doi[mask_has_doi].unique().tolist()
+
+    mask_duplicated_in_chunk = df_chunk.duplicated(subset="doi", keep="first").to_numpy(dtype=bool)
+    mask_seen = doi.isin(doi_index.contains(chunk_dois)).to_numpy(dtype=bool)
+    mask_doi = mask_has_doi & (mask_duplicated_in_chunk | mask_seen)
+
+    doi_index.add(chunk_dois)
+
+    return df_chunk[~mask_doi], int(mask_doi.sum())
+
+def to_record_table(df_chunk: pd.DataFrame) -> pa.Table:
+    df_chunk = normalize_for_parquet(df_chunk)
+    for column in CATEGORICAL_COLUMNS:
+        df_chunk[column] = df_chunk[column].astype(TEXT_DTYPE) # chunk ごとに categories が異なるため
+    df_chunk["is_duplicated"] = df_chunk["is_duplicated"].astype("Int64")
+
+    return pa.Table.from_pandas(df_chunk, preserve_index=False)
+
+def run_out_of_core(config: Config, source_names: List[str], output_path: Path, chunk_rows: int = CHUNK_ROWS) -> None:
+    stored_values = load_decision_values(config, "is_duplicated")
+
+    with tempfile.TemporaryDirectory(dir=config.processed_data_dir) as spill_dir:
+        doi_index = DoiKeyIndex(Path(spill_dir) / "doi_keys.sqlite")
+        sorter = ExternalSorter(Path(spill_dir), config.memory_limit_mb)
+
+        # 1. - 3. read, dedup, filter and spill sorted runs
+        n_position = n_duplicated = n_ineligible = 0
+        for source_name in sort_sources_by_priority(source_names):
+            for df_chunk in iter_source_chunks(config, source_name, chunk_rows):
+                df_chunk = df_chunk.reset_index(drop=True)
+                df_chunk[POSITION_COLUMN] = range(n_position, n_position + len(df_chunk))
+                n_position += len(df_chunk)
+
+                df_chunk, n_chunk_duplicated = remove_doi_duplicated_chunk(df_chunk, doi_index)
+                n_duplicated += n_chunk_duplicated
+
+                mask_eligible = (df_chunk["year"] >= config.eligible_pub_year).fillna(False).to_numpy(dtype=bool)
+                n_ineligible += int((~mask_eligible).sum())
+                sorter.add(df_chunk[mask_eligible])
+
+        doi_index.close()
+        print(f"{n_duplicated} duplicated records were detected!")
+        print(f"{n_ineligible} ineligible records were detected!")
+
+        # 4. merge the sorted runs and write them chunk by chunk
+        n_reapplied = n_records = 0
+        temp_path = output_path.with_name(f".{output_path.name}.tmp")
+        writer = None
+        for df_chunk in sorter.iter_sorted_chunks(chunk_rows):
+            df_chunk = fill_decisions(df_chunk, stored_values, "is_duplicated")[DUP_REMOVE_COLUMNS]
+            n_reapplied += int((df_chunk["is_duplicated"] != "").sum())
+            n_records += len(df_chunk)
+
+            table = to_record_table(df_chunk)
+            writer = writer or pq.ParquetWriter(temp_path, table.schema)
+            writer.write_table(table)
+
+        if writer is None: # 対象のレコードが 1 件もない場合も空の parquet を作成
+            pq.write_table(to_record_table(enforce_schema(pd.DataFrame(columns=DUP_REMOVE_COLUMNS))), temp_path)
+        else:
+            writer.close()
+        os.replace(temp_path, output_path)
+
+        print(f"{len(sorter.run_paths)} sorted runs were merged")
+        print(f"{n_reapplied} is_duplicated decisions were re-applied, {n_records - n_reapplied} records need review")
+
+def main() -> None:
+    config = Config()
+
+    run_out_of_core(config, DB_SEARCH_SOURCES, get_table_path(config, "db_search_records"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from config import Config
+from organize_db_result_for_manual_dup_remove import apply_duplicate_decisions
+from record_export import write_records
+from record_schema import concat_records
+from source_adapters import load_sources
+from stage_catalog import DB_SEARCH_SOURCES, SEARCH_METHOD_PRIORITY
+
+SORT_COLUMNS = ["authors", "year", "title"]
+POSITION_COLUMN = "_position" # 優先度順に並べた時の行番号 (元の処理の順番を再現するために使用)
+
+"""
+summarize_db_result.remove_doi_duplicated → organize の年での filter → sort_records を並列に実行する
+
+1. search_method の優先度で stable sort し，行番号 (POSITION_COLUMN) を付与 (元の処理と同じ順番)
+2. doi (doi がなければタイトル) の hash でレコードを partition に分割
+    - 同じ doi のレコードは必ず同じ partition に入るため，doi の重複除去は partition ごとに独立して行える
+3. partition ごとに process pool で処理
+    a. doi の重複除去 (remove_doi_duplicated と同じく，元の doi 文字列で最初の行を残す)
+    b. 出版年での filter (行ごとの処理なので partition ごとに行っても結果は同じ)
+    c. authors, year, title, 行番号 の順で sort (行番号を最後のキーにして stable sort と同じ順番にする)
+4. sort 済みの partition を k-way merge (heapq.merge) で 1 つにまとめる
+    - 結果は summarize_db_result → organize_db_result_for_manual_dup_remove の結果と同一
+"""
+
+
+def sort_by_priority(df_result_merged: pd.DataFrame) -> pd.DataFrame:
+    df_result_sorted = df_result_merged.sort_values(
+        "search_method",
+        key=lambda col: col.astype(str).map(SEARCH_METHOD_PRIORITY),
+        kind="stable"
+    ).reset_index(drop=True)
+    df_result_sorted[POSITION_COLUMN] = np.arange(len(df_result_sorted))
+
+    return df_result_sorted
+
+def partition_records(df_result_sorted: pd.DataFrame, n_partitions: int) -> List[pd.DataFrame]:
+    # 重複除去と同じキー (元の doi 文字列) で分割すれば十分なため，正規化はしない
+    doi = df_result_sorted["doi"].replace("", pd.NA)
+    partition_key = doi.fillna(df_result_sorted["title"]).fillna("")
+    key_codes, _ = pd.factorize(partition_key) # hash table で同じキーに同じ番号を振る
+    partition_ids = key_codes % n_partitions
+
+    return [df_result_sorted[partition_ids == partition_id] for partition_id in range(n_partitions)]
+
+def dedup_filter_sort_partition(
+    df_partition: pd.DataFrame, eligible_year: Optional[int]
+) -> Tuple[pd.DataFrame, int, int]:
+    # a. remove doi duplicated records (same as summarize_db_result.remove_doi_duplicated)
+    mask_doi_duplicate = df_partition.duplicated(subset="doi", keep="first")
+    mask_doi_is_nan = df_partition["doi"].isna() | (df_partition["doi"] == "")
+    mask_doi = (mask_doi_duplicate & (~mask_doi_is_nan)).to_numpy(dtype=bool)
+    df_partition = df_partition[~mask_doi]
+
+    # b. filter ineligible year records (same as organize_db_result_for_manual_dup_remove)
+    n_ineligible = 0
+    if eligible_year is not None:
+        mask_eligible = (df_partition["year"] >= eligible_year).fillna(False).to_numpy(dtype=bool)
+        n_ineligible = int((~mask_eligible).sum())
+        df_partition = df_partition[mask_eligible]
+
+    # c. sort records (the position breaks ties as the stable sort does)
+    df_partition = df_partition.sort_values(by=SORT_COLUMNS + [POSITION_COLUMN])
+
+    return df_partition, int(mask_doi.sum()), n_ineligible
+
+def iter_sort_keys(df_partition: pd.DataFrame, partition_id: int) -> Iterator[Tuple]:
+    # pandas の sort_values と同じく NA は最後になるよう (is_na, value) の組で比較
+    key_columns = []
+    na_placeholders: List[Union[str, int]] = ["", 0, ""] # SORT_COLUMNS (authors, year, title) の順
+    for column, na_placeholder in zip(SORT_COLUMNS, na_placeholders):
+        values = df_partition[column]
+        key_columns.append(values.isna().to_numpy().tolist())
+        key_columns.append(values.astype(object).where(values.notna(), na_placeholder).tolist())
+    key_columns.append(df_partition[POSITION_COLUMN].tolist())
+
+    for row_idx, sort_key in enumerate(zip(*key_columns)):
+        yield sort_key + (partition_id, row_idx)
+
+def merge_sorted_partitions(partitions: List[pd.DataFrame]) -> pd.DataFrame:
+    merged_keys = heapq.merge(*[
+        iter_sort_keys(df_partition, partition_id) for partition_id, df_partition in enumerate(partitions)
+    ])
+    order = [(key[-2], key[-1]) for key in merged_keys]
+
+    # partition をまとめて concat し，merge の順番で行を取り出す
+    offsets = np.concatenate([[0], np.cumsum([len(df_partition) for df_partition in partitions])[:-1]])
+    take_idx = np.array([offsets[partition_id] + row_idx for partition_id, row_idx in order], dtype=np.int64)
+
+    df_result = concat_records(partitions).iloc[take_idx]
+    return df_result.drop(columns=POSITION_COLUMN).reset_index(drop=True)
+
+def parallel_dedup_and_sort(
+    df_result_merged: pd.DataFrame,
+    eligible_year: Optional[int] = None,
+    n_workers: Optional[int] = None
+) -> pd.DataFrame:
+    n_workers = n_workers or os.cpu_count() or 1
+
+    df_result_sorted = sort_by_priority(df_result_merged)
+    partitions = partition_records(df_result_sorted, n_workers)
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        results = list(executor.map(
+            dedup_filter_sort_partition, partitions, [eligible_year] * len(partitions)
+        ))
+
+    print(f"{sum(n_duplicated for _, n_duplicated, _ in results)} duplicated records were detected!")
+    if eligible_year is not None:
+        print(f"{sum(n_ineligible for _, _, n_ineligible in results)} ineligible records were detected!")
+
+    return merge_sorted_partitions([df_partition for df_partition, _, _ in results])
+
+def main() -> None:
+    config = Config()
+    datasets = load_sources(config, DB_SEARCH_SOURCES)
+
+    df_result_merged = concat_records(datasets.values())
+    df_db_result = parallel_dedup_and_sort(df_result_merged, config.eligible_pub_year)
+    df_db_result = apply_duplicate_decisions(df_db_result, config)
+
+    write_records(config, df_db_result, "db_search_records")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import argparse
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from artifact_store import ArtifactStore, detach_outputs
+from config import Config
+from pipeline_stages import STAGES, PathSpec, Stage, processed
+from stage_catalog import EXPORT_FORMATS, RECORD_TABLES
+from trace_events import run_profiled_command
+
+SCRIPT_DIR = Path(__file__).parent
+PROFILE_DIRNAME = "profile"
+
+"""
+各スクリプトを stage として，入出力のファイルから DAG を作り，古くなった stage のみを再実行する
+
+1. pipeline_stages.STAGES に stage (スクリプト名, 入力, 出力) を宣言
+    - 入出力は Config の dir (raw/processed/external) からの相対パス
+    - pipeline は pandas 等を import せず，stage のスクリプトは subprocess の中でのみ import される
+2. ある stage の出力を入力に持つ stage を依存先として DAG を作成 (循環があればエラー)
+3. 依存先が終わった stage から順に，artifact_store に同じキー (コード・入力・パラメータ) の出力があるか確認
+    - あれば stage を実行せずに，いつものファイル名を保存済みの出力に張り直す (restore_from_store)
+    - store に記録がまだない stage は，更新時刻で古くなっているか確認 (is_stale) し，新しければそのまま保存
+        - 出力がない，または入力・スクリプトが出力より新しい場合に再実行
+        - 入力が dir の場合は dir 内で最も新しいファイルの更新時刻を使う
+4. 古くなった stage は独立したもの同士を並列に実行 (python <stage>.py を subprocess で実行)
+    - 実行後の出力は artifact_store に保存
+    - 何も変わっていない場合は stat と link の確認のみで終わる
+5. --profile を付けた場合は，実行した stage と主要な関数を profiler で計測
+    - processed/profile/<実行時刻>/ に trace.json (Chrome trace event) と summary.csv を出力
+6. stage の出力は parquet (record_export) で，人が開く csv / xlsx のコピーは --export を付けた場合のみ作成
+    - parquet がなく以前の csv のみがある表は，実行前に parquet に変換 (API を使う stage を再実行しないため)
+    - --dry-run でも同じ表を探し，変換した前提で古い stage を判定する (ファイルは変更しない)
+    - 変換・コピーの作成・trace のまとめも，python record_export.py / profiler.py を subprocess で実行
+"""
+
+
+def resolve(config: Config, path_spec: PathSpec) -> Path:
+    dir_name, filename = path_spec
+    return getattr(config, dir_name) / filename
+
+def get_mtime(path: Path, assumed_mtimes: Dict[Path, float]) -> Optional[float]:
+    if path in assumed_mtimes: # dry run で csv から変換される前提の parquet
+        return assumed_mtimes[path]
+    if not path.exists():
+        return None
+    if path.is_dir():
+        return max((child.stat().st_mtime for child in path.rglob("*") if child.is_file()), default=None)
+
+    return path.stat().st_mtime
+
+def build_dependencies(config: Config, stages: List[Stage]) -> Dict[str, Set[str]]:
+    producers: Dict[Path, str] = {}
+    for stage in stages:
+        for output in stage.outputs:
+            output_path = resolve(config, output)
+            if output_path in producers:
+                raise ValueError(f"{output_path} is produced by both {producers[output_path]} and {stage.name}")
+            producers[output_path] = stage.name
+
+    dependencies: Dict[str, Set[str]] = {}
+    for stage in stages:
+        input_paths = [resolve(config, path_spec) for path_spec in stage.inputs]
+        dependencies[stage.name] = {producers[path] for path in input_paths if path in producers}
+
+    # check that the graph is a DAG (Kahn's algorithm)
+    n_remaining_deps = {name: len(deps) for name, deps in dependencies.items()}
+    queue = [name for name, n_deps in n_remaining_deps.items() if n_deps == 0]
+    n_visited = 0
+    while queue:
+        name = queue.pop()
+        n_visited += 1
+        for dependent, deps in dependencies.items():
+            if name in deps:
+                n_remaining_deps[dependent] -= 1
+                if n_remaining_deps[dependent] == 0:
+                    queue.append(dependent)
+    if n_visited != len(stages):
+        raise ValueError("Stage dependencies contain a cycle")
+
+    return dependencies
+
+def select_stages(stages: List[Stage], dependencies: Dict[str, Set[str]], targets: List[str]) -> List[Stage]:
+    # target とその依存先 (上流) の stage のみを残す
+    stage_names = {stage.name for stage in stages}
+    for target in targets:
+        if target not in stage_names:
+            raise KeyError(f"Stage {target} was not found")
+
+    selected: Set[str] = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack += dependencies[name]
+
+    return [stage for stage in stages if stage.name in selected]
+
+def is_stale(config: Config, stage: Stage, assumed_mtimes: Dict[Path, float]) -> bool:
+    output_mtimes = [get_mtime(resolve(config, output), assumed_mtimes) for output in stage.outputs]
+    if any(mtime is None for mtime in output_mtimes):
+        return True
+    oldest_output = min(mtime for mtime in output_mtimes if mtime is not None)
+
+    input_mtimes = [get_mtime(resolve(config, path_spec), assumed_mtimes) for path_spec in stage.inputs]
+    input_mtimes.append(get_mtime(SCRIPT_DIR / f"{stage.name}.py", assumed_mtimes))
+
+    return any(mtime is not None and mtime > oldest_output for mtime in input_mtimes)
+
+def restore_from_store(
+    config: Config,
+    store: ArtifactStore,
+    stage: Stage,
+    stage_key: str,
+    dry_run: bool,
+    assumed_mtimes: Dict[Path, float]
+) -> bool:
+    if store.get_manifest_path(stage.name, stage_key).exists():
+        return dry_run or store.restore_outputs(stage.name, stage_key)
+
+    # store を使い始める前に作られた出力は，更新時刻で新しければそのまま保存
+    if store.has_history(stage.name) or is_stale(config, stage, assumed_mtimes):
+        return False
+    if not dry_run:
+        store.store_outputs(stage.name, stage_key, [resolve(config, output) for output in stage.outputs])
+    return True
+
+def run_script(name: str, args: List[str]) -> None:
+    subprocess.run([sys.executable, f"{name}.py"] + args, cwd=SCRIPT_DIR, check=True)
+
+def run_stage(stage: Stage, trace_dir: Optional[Path] = None) -> None:
+    if trace_dir is None:
+        run_script(stage.name, [])
+    else:
+        run_profiled_command([sys.executable, f"{stage.name}.py"], SCRIPT_DIR, stage.name, trace_dir)
+
+def find_legacy_tables(config: Config) -> List[str]:
+    # parquet がなく，以前のスクリプトが保存した csv のみがある表
+    return [
+        name for name in RECORD_TABLES
+        if not resolve(config, processed(f"{name}.parquet")).exists()
+        and resolve(config, processed(f"{name}.csv")).exists()
+    ]
+
+def migrate_legacy_outputs(config: Config, dry_run: bool = False) -> List[str]:
+    # 以前の csv しかない表を parquet に変換し，API を使う stage が出力なしとして再実行されないようにする
+    legacy_names = find_legacy_tables(config)
+    if legacy_names:
+        print(f"[pipeline] {'would convert' if dry_run else 'converting'} {len(legacy_names)} csv files into parquet")
+        if not dry_run:
+            run_script("record_export", ["--from-csv"] + legacy_names)
+
+    return legacy_names
+
+def export_outputs(export_format: str) -> None:
+    # 元の parquet が変わっていないコピーは作り直されない
+    run_script("record_export", RECORD_TABLES + ["--format", export_format])
+
+def get_trace_dir(config: Config, profile: bool, dry_run: bool) -> Optional[Path]:
+    if not profile or dry_run:
+        return None
+    return config.processed_data_dir / PROFILE_DIRNAME / time.strftime("%Y%m%d_%H%M%S")
+
+def store_finished_stages(
+    config: Config,
+    store: ArtifactStore,
+    stage_by_name: Dict[str, Stage],
+    stage_keys: Dict[str, str],
+    running: Dict[Future, str]
+) -> None:
+    # 実行中の stage のいずれかが終わるまで待ち，終わった stage の出力を store に保存
+    done, _ = wait(running, return_when=FIRST_COMPLETED)
+    for future in done:
+        name = running.pop(future)
+        future.result() # stage が失敗した場合はここで CalledProcessError を送出
+        output_paths = [resolve(config, output) for output in stage_by_name[name].outputs]
+        store.store_outputs(name, stage_keys[name], output_paths)
+        print(f"[pipeline] finished {name}")
+
+def run_pipeline(
+    config: Config,
+    targets: Optional[List[str]] = None,
+    n_jobs: int = 4,
+    dry_run: bool = False,
+    force: bool = False,
+    profile: bool = False,
+    legacy_names: Optional[List[str]] = None
+) -> List[str]:
+    dependencies = build_dependencies(config, STAGES)
+    stages = select_stages(STAGES, dependencies, targets) if targets else STAGES
+    stage_by_name = {stage.name: stage for stage in stages}
+    store = ArtifactStore(config)
+    # dry run では，まだ変換していない表も今変換された parquet として古いか判定する (実際の実行と同じ計画にする)
+    migrated_at = time.time()
+    assumed_mtimes = {resolve(config, processed(f"{name}.parquet")): migrated_at for name in legacy_names or []}
+    trace_dir = get_trace_dir(config, profile, dry_run)
+
+    pending = set(stage_by_name)
+    executed: List[str] = []
+    stage_keys: Dict[str, str] = {}
+    running: Dict[Future, str] = {}
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        while pending or running:
+            # 依存先が全て終わった stage のうち，store にない (または古くなった) ものを実行
+            ready = [name for name in pending if not (dependencies[name] & (pending | set(running.values())))]
+            for name in sorted(ready):
+                pending.remove(name)
+                stage = stage_by_name[name]
+                output_paths = [resolve(config, output) for output in stage.outputs]
+
+                # dry run では上流が再実行される前提で，下流も古いとみなす
+                upstream_executed = dry_run and bool(dependencies[name] & set(executed))
+                if not upstream_executed:
+                    input_paths = [resolve(config, path_spec) for path_spec in stage.inputs]
+                    stage_keys[name] = store.compute_stage_key(name, input_paths)
+                    if not force and restore_from_store(
+                        config, store, stage, stage_keys[name], dry_run, assumed_mtimes
+                    ):
+                        continue
+
+                print(f"[pipeline] {'would run' if dry_run else 'running'} {name}")
+                executed.append(name)
+                if not dry_run:
+                    detach_outputs(output_paths)
+                    running[executor.submit(run_stage, stage, trace_dir)] = name
+
+            if running:
+                store_finished_stages(config, store, stage_by_name, stage_keys, running)
+
+    store.save_hash_cache()
+
+    if not executed:
+        print("[pipeline] every stage is up to date")
+    elif trace_dir is not None:
+        run_script("profiler", [str(trace_dir)])
+    return executed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the stages whose inputs have changed")
+    parser.add_argument("targets", nargs="*", help="stages to build (with their upstream stages)")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="number of stages run in parallel")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="only print the stages to run")
+    parser.add_argument("-f", "--force", action="store_true", help="rerun every selected stage")
+    parser.add_argument("-p", "--profile", action="store_true", help="export a trace and a summary of the run")
+    parser.add_argument("-e", "--export", choices=EXPORT_FORMATS, help="write human-facing copies of the outputs")
+    args = parser.parse_args()
+
+    config = Config()
+    legacy_names = migrate_legacy_outputs(config, args.dry_run)
+
+    run_pipeline(
+        config,
+        args.targets,
+        n_jobs=args.jobs,
+        dry_run=args.dry_run,
+        force=args.force,
+        profile=args.profile,
+        legacy_names=legacy_names if args.dry_run else None
+    )
+    if args.export is not None and not args.dry_run:
+        export_outputs(args.export)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import dataclasses
+from typing import List, Tuple
+
+from stage_catalog import (
+    ADDITIONAL_DB_SEARCH_SOURCES,
+    ADDITIONAL_MANUAL_SEARCH_SOURCES,
+    ADDITIONAL_ROUND,
+    DB_SEARCH_SOURCES,
+    DECISION_STORE_FILENAME,
+    DECISION_WORKBOOKS,
+    FINGERPRINT_INDEX_DIRNAME,
+    FIRST_ROUND,
+    MANUAL_SEARCH_SOURCES,
+    SCREENING_WORKBOOKS,
+    SOURCE_FILES,
+    PathSpec,
+)
+
+"""
+pipeline の stage (スクリプト名, 入力, 出力) の宣言
+
+1. 入出力は Config の dir (raw/processed/external) からの相対パス
+    - source_adapters を使う stage の入力は stage_catalog.SOURCE_FILES から作成
+2. pipeline の起動を軽くするため，stage_catalog 以外のスクリプトは import しない
+    - stage のスクリプトは pipeline から subprocess で実行
+"""
+
+
+def raw(filename: str) -> PathSpec:
+    return ("raw_data_dir", filename)
+
+def processed(filename: str) -> PathSpec:
+    return ("processed_data_dir", filename)
+
+def external(filename: str) -> PathSpec:
+    return ("external_data_dir", filename)
+
+def source_inputs(source_names: List[str]) -> Tuple[PathSpec, ...]:
+    return tuple(SOURCE_FILES[name] for name in source_names)
+
+def fingerprint_round(round_name: str) -> PathSpec:
+    return processed(f"{FINGERPRINT_INDEX_DIRNAME}/{round_name}.parquet")
+
+@dataclasses.dataclass(frozen=True)
+class Stage:
+    name: str # 実行するスクリプト名 (拡張子なし)
+    inputs: Tuple[PathSpec, ...]
+    outputs: Tuple[PathSpec, ...]
+
+STAGES: List[Stage] = [
+    # searches & scrapers
+    Stage(
+        "ancestry_search", (raw("ancestry_target_paper_list.csv"),), (processed("ancestry_search_result.parquet"),)
+    ),
+    Stage("forward_search", (raw("forward_target_paper_list.csv"),), (processed("forward_search_result.parquet"),)),
+    Stage(
+        "google_scholar_search",
+        (raw("google_scholar_search_keyword.json"),),
+        (processed("google_scholar_result.parquet"),)
+    ),
+    Stage(
+        "convert_apa_2_meta_info",
+        (external("plonsky_zhuang.tsv"), external("mori_mori_mori_et_al.tsv")),
+        (processed("apa_ancestry_search_result.parquet"),)
+    ),
+    Stage(
+        "scrape_applied_linguistics",
+        (external("applied_linguistics"),),
+        (processed("applied_linguistics_manual_search_result.parquet"),)
+    ),
+    Stage(
+        "scrape_intercultural_pragmatics",
+        (external("intercultural_pragmatics"),),
+        (processed("intercultural_pragmatics_manual_search_result.parquet"),)
+    ),
+
+    # first round
+    Stage(
+        "summarize_db_result",
+        source_inputs(DB_SEARCH_SOURCES),
+        (processed("db_search_merged_unique.parquet"), processed("db_search_merged_unique_doi_index.parquet"))
+    ),
+    Stage(
+        "decision_store",
+        tuple(external(filename) for filename in DECISION_WORKBOOKS),
+        (processed(DECISION_STORE_FILENAME),)
+    ),
+    Stage(
+        "organize_db_result_for_manual_dup_remove",
+        (processed("db_search_merged_unique.parquet"), processed(DECISION_STORE_FILENAME)),
+        (processed("db_search_records.parquet"),)
+    ),
+    Stage(
+        "mearge_manual_search_results",
+        source_inputs(MANUAL_SEARCH_SOURCES) + (
+            processed("db_search_merged_unique.parquet"), processed("db_search_merged_unique_doi_index.parquet")
+        ),
+        (processed("manual_search_merged_unique.parquet"),)
+    ),
+    Stage(
+        "merge_db_manual_search_results",
+        (
+            external("db_search_records_manual_dup_remove.xlsx"),
+            processed("manual_search_merged_unique.parquet"),
+            processed(DECISION_STORE_FILENAME)
+        ),
+        (processed("db_manual_search_records.parquet"), fingerprint_round(FIRST_ROUND))
+    ),
+
+    # additional round
+    Stage(
+        "re_ancestry_search",
+        (raw("additional_ancestry_target_paper_list.csv"),),
+        (processed("additional_ancestry_search_result.parquet"),)
+    ),
+    Stage(
+        "re_convert_apa_2_meta_info",
+        (external("additional_ancestry_apa.tsv"),),
+        (processed("additional_apa_ancestry_search_result.parquet"),)
+    ),
+    Stage(
+        "re_scrape_applied_linguistics",
+        (external("applied_linguistics_additional"),),
+        (processed("additional_applied_linguistics_manual_search_result.parquet"),)
+    ),
+    Stage(
+        "re_organize_db_result_for_manual_dup_remove",
+        source_inputs(ADDITIONAL_DB_SEARCH_SOURCES) + (
+            processed("db_search_merged_unique.parquet"),
+            processed(DECISION_STORE_FILENAME),
+            fingerprint_round(FIRST_ROUND)
+        ),
+        (processed("additional_db_search_records.parquet"),)
+    ),
+    Stage(
+        "re_mearge_manual_search_results",
+        source_inputs(ADDITIONAL_MANUAL_SEARCH_SOURCES) + (
+            processed("db_search_merged_unique.parquet"),
+            processed("db_search_merged_unique_doi_index.parquet"),
+            fingerprint_round(FIRST_ROUND)
+        ),
+        (processed("additional_manual_search_merged_unique.parquet"),)
+    ),
+    Stage(
+        "re_merge_db_manual_search_results",
+        (
+            external("additional_db_search_records_manual_dup_remove.xlsx"),
+            processed("additional_manual_search_merged_unique.parquet"),
+            processed(DECISION_STORE_FILENAME)
+        ),
+        (processed("additional_db_manual_search_records.parquet"), fingerprint_round(ADDITIONAL_ROUND))
+    ),
+
+    # screening workbooks
+    Stage(
+        "screening_workbook",
+        tuple(processed(f"{workbook.table_name}.parquet") for workbook in SCREENING_WORKBOOKS),
+        tuple(processed(workbook.filename) for workbook in SCREENING_WORKBOOKS)
+    ),
+
+    # auxiliary outputs
+    Stage("record_linkage", source_inputs(DB_SEARCH_SOURCES), (processed("db_search_linked.parquet"),)),
+    Stage(
+        "fuzzy_dedup",
+        (processed("db_search_records.parquet"),),
+        (processed("db_search_records_auto_dup_remove.xlsx"),)
+    ),
+]
@@ -0,0 +1,194 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+import pandas as pd
+from trace_events import TRACE_DIR_ENV, get_peak_rss_mb, write_events
+
+TRACE_FILENAME = "trace.json"
+SUMMARY_FILENAME = "summary.csv"
+
+TRACE_DIR = os.environ.get(TRACE_DIR_ENV) # 未設定の場合は計測しない
+
+Function = TypeVar("Function", bound=Callable[..., Any])
+
+"""
+pipeline の stage と主要な関数の実行時間などを計測し，Chrome の trace event 形式と集計表で出力する
+
+1. 環境変数 PIPELINE_TRACE_DIR が設定されている場合のみ計測 (未設定の場合は元の関数をそのまま呼ぶ)
+    - pipeline.py --profile で実行すると，stage ごとに設定される
+    - スクリプトを単体で実行する場合も PIPELINE_TRACE_DIR=<dir> python <stage>.py で計測できる
+2. @profiled を付けた関数の呼び出しごとに span を記録
+    - wall time, CPU time, その時点までの peak RSS, 入出力の行数 (DataFrame, dict of DataFrame, list の長さ)
+    - 外部 API の呼び出し回数 (count_api_call で，実行中の全ての span に加算)
+    - プロセスの終了時に，プロセス全体の event とともに <trace dir>/events_<pid>_<時刻>.json に書き出し
+3. stage 全体は pipeline の親プロセスから計測 (trace_events.run_profiled_command)
+    - 子プロセスの CPU time と peak RSS は os.wait4 の rusage から取得
+    - pipeline が pandas を import しないよう，計測と event の書き出しは trace_events に置く
+4. 全プロセスの event をまとめて trace.json (chrome://tracing, Perfetto で表示) と summary.csv を作成
+    - summary は stage / 関数ごとに呼び出し回数，合計時間，peak RSS，行数，API 呼び出し回数を集計
+"""
+
+
+_events: List[Dict[str, Any]] = []
+_local = threading.local()
+_process_start_us = time.time_ns() // 1000
+_process_api_calls = 0
+
+def flush_events() -> None:
+    if TRACE_DIR is None:
+        return
+
+    # プロセス全体の API 呼び出し回数は，関数の span の外で呼ばれたものも含めて記録
+    _events.append({
+        "name": Path(sys.argv[0]).stem,
+        "cat": "process",
+        "ph": "X",
+        "ts": _process_start_us,
+        "dur": time.time_ns() // 1000 - _process_start_us,
+        "pid": os.getpid(),
+        "tid": threading.get_native_id(),
+        "args": {"cpu_s": time.process_time(), "peak_rss_mb": get_peak_rss_mb(), "api_calls": _process_api_calls}
+    })
+    write_events(Path(TRACE_DIR), _events)
+    _events.clear()
+
+if TRACE_DIR is not None:
+    atexit.register(flush_events)
+
+def count_rows(values: Any) -> Optional[int]:
+    n_rows = None
+    for value in values:
+        if isinstance(value, (pd.DataFrame, pd.Series, list)):
+            n_rows = (n_rows or 0) + len(value)
+        elif isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+            n_rows = (n_rows or 0) + sum(len(v) for v in value.values())
+
+    return n_rows
+
+@contextmanager
+def profile_span(name: str, category: str = "function", rows_in: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    span_args: Dict[str, Any] = {"rows_in": rows_in, "rows_out": None, "api_calls": 0}
+    if TRACE_DIR is None:
+        yield span_args
+        return
+
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(span_args)
+    start_us = time.time_ns() // 1000
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+        yield span_args
+    finally:
+        stack.pop()
+        span_args["cpu_s"] = time.process_time() - start_cpu
+        span_args["peak_rss_mb"] = get_peak_rss_mb()
+        _events.append({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start_us,
+            "dur": (time.perf_counter() - start_wall) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+            "args": span_args
+        })
+
+def profiled(func: Function) -> Function:
+    name = f"{Path(func.__code__.co_filename).stem}.{func.__name__}" # __main__ ではなくファイル名を使う
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if TRACE_DIR is None:
+            return func(*args, **kwargs)
+
+        with profile_span(name, rows_in=count_rows(list(args) + list(kwargs.values()))) as span_args:
+            result = func(*args, **kwargs)
+            span_args["rows_out"] = count_rows([result] if not isinstance(result, tuple) else result)
+        return result
+
+    return wrapper # type: ignore
+
+def count_api_call(n_calls: int = 1) -> None:
+    global _process_api_calls
+    _process_api_calls += n_calls
+    for span_args in _local.__dict__.get("stack", []):
+        span_args["api_calls"] += n_calls
+
+def load_events(trace_dir: Path) -> List[Dict[str, Any]]:
+    events = []
+    for events_path in sorted(trace_dir.glob("events_*.json")):
+        events += json.loads(events_path.read_text())
+
+    return merge_process_events(events)
+
+def merge_process_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # pipeline から実行した stage は，親プロセスで計測した stage の event に API 呼び出し回数を移す
+    api_calls = {event["pid"]: event["args"]["api_calls"] for event in events if event["cat"] == "process"}
+    stage_pids = {event["pid"] for event in events if event["cat"] == "stage"}
+
+    merged_events = []
+    for event in events:
+        if event["cat"] == "stage":
+            event["args"]["api_calls"] = api_calls.get(event["pid"], 0)
+        elif event["cat"] == "process":
+            if event["pid"] in stage_pids:
+                continue
+            event["cat"] = "stage" # 単体で実行したスクリプト
+        merged_events.append(event)
+
+    return merged_events
+
+def summarize_events(events: List[Dict[str, Any]]) -> pd.DataFrame:
+    df_events = pd.DataFrame([{
+        "category": event["cat"],
+        "name": event["name"],
+        "wall_s": event["dur"] / 1e6,
+        "cpu_s": event["args"].get("cpu_s"),
+        "peak_rss_mb": event["args"].get("peak_rss_mb"),
+        "rows_in": event["args"].get("rows_in"),
+        "rows_out": event["args"].get("rows_out"),
+        "api_calls": event["args"].get("api_calls")
+    } for event in events])
+
+    df_summary = df_events.groupby(["category", "name"], sort=False).agg(
+        calls=("wall_s", "size"),
+        wall_s=("wall_s", "sum"),
+        cpu_s=("cpu_s", "sum"),
+        peak_rss_mb=("peak_rss_mb", "max"),
+        rows_in=("rows_in", lambda rows: rows.sum(min_count=1)), # 行数を数えられない関数は空欄
+        rows_out=("rows_out", lambda rows: rows.sum(min_count=1)),
+        api_calls=("api_calls", "sum")
+    ).reset_index()
+
+    return df_summary.sort_values("wall_s", ascending=False, kind="stable").reset_index(drop=True)
+
+def export_trace(trace_dir: Path) -> pd.DataFrame:
+    events = load_events(trace_dir)
+    if not events:
+        raise FileNotFoundError(f"No trace events were found in {trace_dir}")
+
+    (trace_dir / TRACE_FILENAME).write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+
+    df_summary = summarize_events(events)
+    df_summary.to_csv(trace_dir / SUMMARY_FILENAME, index=False)
+    print(df_summary.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+    print(f"trace was exported to {trace_dir / TRACE_FILENAME}")
+
+    return df_summary
+
+def main() -> None:
+    # 単体で実行したスクリプトの event をまとめる (python profiler.py <trace dir>)
+    trace_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(TRACE_DIR or ".")
+    export_trace(trace_dir)
+
+if __name__ == "__main__":
+    main()
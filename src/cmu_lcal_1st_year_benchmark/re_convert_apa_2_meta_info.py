@@ -3,6 +3,8 @@ from typing import Dict
 
 import pandas as pd
 from config import Config
+from profiler import profiled
+from record_export import write_records
 
 APA_ANCESTRY_CITING_PAPERS = ["additional_ancestry_apa"]
 
@@ -27,12 +29,14 @@ def load_apa_ancestry_results(config: Config) -> Dict[str, pd.DataFrame]:
 
     return dataset
 
+@profiled
 def extract_authors_from_apa(apa_record: str) -> str:
     authors = apa_record.split("(")[0] # 出版年の括弧の前のみ取得
     authors = authors.strip() # 文字列の先頭・末尾の余計なスペースを除去
 
     return authors
 
+@profiled
 def extract_year_from_apa(apa_record: str) -> str:
     year_pattern = r"\(([0-9]{4}).*?\)"
     year_regex = re.compile(year_pattern)
@@ -45,6 +49,7 @@ def extract_year_from_apa(apa_record: str) -> str:
 
     return year
 
+@profiled
 def extract_title_from_apa(apa_record: str) -> str:
     apa_segments = apa_record.split(").")
     title_segment = apa_segments[1] # year 以降の箇所を取り出す
@@ -53,6 +58,7 @@ def extract_title_from_apa(apa_record: str) -> str:
 
     return title
 
+@profiled
 def extract_doi_from_apa(apa_record: str) -> str:
     if "doi.org" not in apa_record:
         return ""
@@ -60,6 +66,7 @@ def extract_doi_from_apa(apa_record: str) -> str:
     doi = apa_record.split("doi.org/")[-1]
     return doi
 
+@profiled
 def preprocess_ancestry_dataset(apa_ancestry_dataset: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
     processed_dataset = {}
     for citing_paper, df_ancestry in apa_ancestry_dataset.items():
@@ -88,7 +95,7 @@ def main() -> None:
 
     df_ancestry_merged = merge_dataset(apa_ancestry_dataset)
 
-    df_ancestry_merged.to_csv(config.processed_data_dir / "additional_apa_ancestry_search_result.csv", index=False)
+    write_records(config, df_ancestry_merged, "additional_apa_ancestry_search_result")
 
 
 if __name__ == "__main__":
@@ -3,15 +3,22 @@ from typing import Dict
 
 import pandas as pd
 from config import Config
+from decision_store import apply_decisions
+from fingerprint_index import append_round
+from profiler import profiled
+from record_export import read_records, write_records
+from record_schema import concat_records, enforce_schema
+from screening_workbook import read_screening_workbook
+from stage_catalog import ADDITIONAL_ROUND
+from text_normalizer import normalize_text
 
 
 def load_dataset(config: Config) -> Dict[str, pd.DataFrame]:
-    df_db_search_result = pd.read_excel(
-        config.external_data_dir / "additional_db_search_records_manual_dup_remove.xlsx",
-        engine="openpyxl"
+    df_db_search_result = read_screening_workbook(
+        config.external_data_dir / "additional_db_search_records_manual_dup_remove.xlsx"
     )
 
-    df_manual_search_result = pd.read_csv(config.processed_data_dir / "additional_manual_search_merged_unique.csv")
+    df_manual_search_result = read_records(config, "additional_manual_search_merged_unique")
 
     dataset = {
         "db_search": df_db_search_result,
@@ -19,19 +26,11 @@ def load_dataset(config: Config) -> Dict[str, pd.DataFrame]:
     }
     return dataset
 
-def preprocess_abstract(abstract: str) -> str:
-    if pd.isna(abstract):
-        return ""
-    abstract_processed = abstract.replace("\n", " ")
-    abstract_processed = abstract_processed.replace("\t", " ")
-
-    while "  " in abstract_processed:
-        abstract_processed = abstract_processed.replace("  ", " ")
-
-    abstract_processed = abstract_processed.strip()
-
-    return abstract_processed
+@profiled
+def preprocess_abstract(abstract: pd.Series) -> pd.Series:
+    return normalize_text(abstract).fillna("")
 
+@profiled
 def preprocess_db_search_result(df_result: pd.DataFrame) -> pd.DataFrame:
     mask_duplicated = (df_result["is_duplicated"] == 1)
 
@@ -41,13 +40,15 @@ def preprocess_db_search_result(df_result: pd.DataFrame) -> pd.DataFrame:
 
     df_result_processed = df_result_processed.drop("is_duplicated", axis=1)
 
-    df_result_processed.loc[:, "abstract"] = df_result_processed["abstract"].apply(preprocess_abstract)
+    df_result_processed["abstract"] = preprocess_abstract(df_result_processed["abstract"])
 
-    return df_result_processed
+    return enforce_schema(df_result_processed)
 
-def merge_results(df_db_search_result: pd.DataFrame, df_manual_search_result: pd.DataFrame) -> pd.DataFrame:
-    df_merged_result = pd.concat([df_db_search_result, df_manual_search_result])
-    df_merged_result.loc[:, "is_eligible"] = ""
+def merge_results(
+    df_db_search_result: pd.DataFrame, df_manual_search_result: pd.DataFrame, config: Config
+) -> pd.DataFrame:
+    df_merged_result = concat_records([df_db_search_result, df_manual_search_result])
+    df_merged_result = apply_decisions(config, df_merged_result, "is_eligible") # 判定のないレコードは空欄
     df_merged_result = df_merged_result.sort_values(by=["authors", "year", "title"])
     df_merged_result = df_merged_result.reset_index(drop=True)
 
@@ -67,11 +68,10 @@ def main() -> None:
 
     df_db_search_result = preprocess_db_search_result(df_db_search_result)
 
-    df_merged_result = merge_results(df_db_search_result, df_manual_search_result)
+    df_merged_result = merge_results(df_db_search_result, df_manual_search_result, config)
 
-    df_merged_result.to_csv(
-        config.processed_data_dir / "additional_db_manual_search_records.csv", encoding="utf-16", index=False
-    )
+    write_records(config, df_merged_result, "additional_db_manual_search_records")
+    append_round(config, ADDITIONAL_ROUND, df_merged_result) # 次のラウンドではスクリーニング済みとして除外
 
 if __name__ == "__main__":
     main()
@@ -2,116 +2,57 @@ from typing import Dict
 
 import pandas as pd
 from config import Config
+from decision_store import apply_decisions
+from fingerprint_index import filter_new_records
+from profiler import profiled
+from record_export import read_records, write_records
+from record_schema import DUP_REMOVE_COLUMNS, OUTPUT_COLUMNS, concat_records
+from source_adapters import load_sources
+from stage_catalog import ADDITIONAL_DB_SEARCH_SOURCES, ADDITIONAL_ROUND, SEARCH_METHOD_PRIORITY
 
 """
 1. doi ベースで重複を除去した DB search の結果を取得
 2. データを特定の年で filter (今回は 2010以降のみ)
-3. データを authors, year, title の順番で sort
-4. 結果を保存
+3. 前のラウンドでスクリーニング済みのレコードを fingerprint_index で除去
+4. データを authors, year, title の順番で sort
+5. 以前の is_duplicated の判定を decision_store から再適用 (判定のないレコードは空欄)
+6. 結果を保存
 """
 
 
 def load_db_result(config: Config, filename: str ="db_search_merged_unique") -> pd.DataFrame:
-    db_result_path = config.processed_data_dir / f"{filename}.csv"
-
-    df_db_result = pd.read_csv(db_result_path)
+    df_db_result = read_records(config, filename)
 
     return df_db_result
 
 def load_additional_ancestry_search_datasets(config: Config) -> Dict[str, pd.DataFrame]:
-    ancestry_search_result_path = config.processed_data_dir / "additional_ancestry_search_result.csv"
-    apa_ancestry_search_result_path = config.processed_data_dir / "additional_apa_ancestry_search_result.csv"
-
-    df_ancestry_result = pd.read_csv(ancestry_search_result_path)
-    df_apa_result = pd.read_csv(apa_ancestry_search_result_path)
-
-    datasets = {
-        "ancestry": df_ancestry_result,
-        "apa": df_apa_result
-    }
+    datasets = load_sources(config, ADDITIONAL_DB_SEARCH_SOURCES)
 
     return datasets
 
-
-def preprocess_semantic_scholar_dataset(df_result: pd.DataFrame) -> pd.DataFrame:
-    # 1. remove author column
-    df_result_processed = df_result.drop(["author", "corpus_id"], axis=1)
-
-    # 2. remove authors, year, title is NA
-    df_result_processed = df_result_processed.dropna(
-        subset=["authors", "year", "title"], how="all"
-    )
-
-    # 3. add empty document_type column
-    df_result_processed.loc[:, "document_type"] = ""
-
-    # 4. add link column
-    df_result_processed.loc[:, "link"] = "https://doi.org/" + df_result_processed["doi"]
-
-    return df_result_processed
-
-def preprocess_apa_dataset(df_result: pd.DataFrame) -> pd.DataFrame:
-    # 1. remove apa
-    df_result_processed = df_result.drop("apa", axis=1)
-
-    # 2. add empty abstract & document_type
-    df_result_processed.loc[:, "abstract"] = ""
-    df_result_processed.loc[:, "document_type"] = ""
-
-    # skip the following process because there are no doi in additional apa search result
-    # 3. add link column
-    # df_result_processed.loc[:, "link"] = "https://doi.org/" + df_result_processed["doi"]
-
-    return df_result_processed
-
-def preprocess(datasets: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
-    datasets_processed = {}
-    for dataset_name, df_result in datasets.items():
-        if dataset_name == "ancestry":
-            df_result_processed = preprocess_semantic_scholar_dataset(df_result)
-        elif dataset_name == "apa":
-            df_result_processed = preprocess_apa_dataset(df_result)
-        else:
-            raise KeyError(f"Preprocess for {dataset_name} was not found")
-
-        df_result_processed.loc[:, "search_method"] = dataset_name
-        datasets_processed[dataset_name] = df_result_processed
-
-    return datasets_processed
-
 def merge_datasets(datasets: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     dataset_list = datasets.values()
 
-    df_result_merged = pd.concat(dataset_list)
+    df_result_merged = concat_records(dataset_list)
 
-    column_order = ["authors", "year", "title", "abstract", "document_type", "doi", "link", "search_method"]
-    df_result_merged = df_result_merged[column_order]
+    df_result_merged = df_result_merged[OUTPUT_COLUMNS]
 
     return df_result_merged
 
 def filter_ineligible_year_records(df_db_result: pd.DataFrame, eligible_year: int) -> pd.DataFrame:
-    mask_eligible = df_db_result["year"] < eligible_year
+    mask_eligible = (df_db_result["year"] < eligible_year).fillna(False) # 出版年が不明なレコードは対象外
     print(f"{(~mask_eligible).sum()} ineligible records were detected!")
 
     df_db_result_filtered = df_db_result[mask_eligible].reset_index(drop=True)
 
     return df_db_result_filtered
 
+@profiled
 def remove_doi_duplicated(df_result_merged: pd.DataFrame) -> pd.DataFrame:
-    search_method_priority = {
-        "llba": 0,
-        "eric": 1,
-        "psycinfo": 2,
-        "proquest": 3,
-        "ancestry": 4,
-        "forward": 5,
-        "apa": 6,
-        "google": 7
-    }
-
     df_result_merged_sorted = df_result_merged.sort_values(
         "search_method",
-        key=lambda col: col.map(search_method_priority)
+        key=lambda col: col.astype(str).map(SEARCH_METHOD_PRIORITY),
+        kind="stable" # 同じ search_method 内では元の順番を保持
     ).reset_index(drop=True)
 
     mask_doi_duplicate = df_result_merged_sorted.duplicated(subset="doi", keep="first")
@@ -133,16 +74,17 @@ def main() -> None:
     df_db_result = load_db_result(config)
 
     additional_results = load_additional_ancestry_search_datasets(config)
-    additional_results = preprocess(additional_results)
     additional_results["db"] = df_db_result
 
     df_merged = merge_datasets(additional_results)
 
     df_merged = filter_ineligible_year_records(df_merged, config.eligible_pub_year)
     df_merged = remove_doi_duplicated(df_merged)
+    df_merged = filter_new_records(config, df_merged, ADDITIONAL_ROUND)
     df_merged = sort_records(df_merged)
+    df_merged = apply_decisions(config, df_merged, "is_duplicated")[DUP_REMOVE_COLUMNS]
 
-    df_merged.to_csv(config.processed_data_dir / "additional_db_search_records.csv", index=False, encoding="utf-16")
+    write_records(config, df_merged, "additional_db_search_records")
 
 if __name__ == "__main__":
     main()
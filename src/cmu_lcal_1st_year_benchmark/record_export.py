@@ -0,0 +1,248 @@
+import argparse
+import codecs
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+from config import Config
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from record_schema import TEXT_COLUMNS, TEXT_DTYPE, enforce_schema
+from stage_catalog import EXPORT_FORMATS, RECORD_TABLES
+
+EXPORT_CHUNK_ROWS = 5_000
+EXPORT_MANIFEST_FILENAME = "exports.json"
+
+# Excel で開くため utf-16 で書き出す csv のコピー (それ以外は utf-8)
+CSV_ENCODINGS: Dict[str, str] = {
+    "db_manual_search_records": "utf-16",
+    "additional_db_search_records": "utf-16",
+    "additional_db_manual_search_records": "utf-16"
+}
+
+"""
+各 stage の出力を parquet (processed/<名前>.parquet) で保存し，後続の stage は parquet を読み込む
+人が開く csv / xlsx のコピーは，頼まれた時にのみ作成する
+
+1. stage の出力を write_records で parquet として保存
+    - 以前の csv を経由した場合と同じ値になるように，空文字は欠損に揃える (normalize_for_parquet)
+    - 型の混ざった列 (空文字と 0/1 の is_duplicated 等) は，数値または文字列の列に揃える
+2. 後続の stage は read_records (共通スキーマを適用) / read_table (そのまま) で読み込み
+    - parquet がまだない場合は，以前のスクリプトが保存した csv を読み込む
+    - iter_table_chunks は同じ表を chunk ごとに読み込む (parquet は row group をまたいで batch ごと，csv は chunksize)
+    - python record_export.py --from-csv で，既存の csv を parquet に変換できる (API を呼び直さないため)
+        - 変換元の csv は，そのまま作成した parquet のコピーとして扱う
+3. python record_export.py [名前 ...] で csv (--format xlsx で xlsx) のコピーを作成 (export_records)
+    - 元の parquet (サイズ，更新時刻) が前回書き出した時から変わっていないコピーは作り直さない
+    - csv は EXPORT_CHUNK_ROWS 行ごとの chunk を複数プロセスで並列に文字列化し，順番に書き込み
+        - utf-16 は先頭に BOM を付け，各 chunk を utf-16-le で encode (to_csv(encoding="utf-16") と同一)
+    - xlsx は openpyxl の write_only モードで 1 行ずつ書き込み
+"""
+
+
+def get_table_path(config: Config, name: str) -> Path:
+    return config.processed_data_dir / f"{name}.parquet"
+
+def get_export_path(config: Config, name: str, export_format: str) -> Path:
+    return config.processed_data_dir / f"{name}.{export_format}"
+
+def normalize_column(column: pd.Series) -> pd.Series:
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        if "" in column.cat.categories:
+            return column.cat.remove_categories([""])
+        return column
+    if pd.api.types.is_float_dtype(column):
+        # csv では整数として書かれていた列 (欠損を含む出版年等)
+        values = column.dropna()
+        if (values == values.round()).all():
+            return column.astype("Int64")
+        return column
+    if pd.api.types.is_string_dtype(column) or column.dtype == object:
+        column = column.mask(column.astype(object) == "")
+    if column.dtype != object:
+        return column
+
+    try:
+        pa.array(column, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError): # 数値と文字列が混ざった列
+        return column.astype(TEXT_DTYPE)
+    return column.convert_dtypes(convert_boolean=False) # 欠損を含む整数の列は Int64 (float にしない)
+
+def normalize_for_parquet(df_result: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame(
+        {column: normalize_column(df_result[column]) for column in df_result.columns}, index=df_result.index
+    ).reset_index(drop=True)
+
+def write_table(df_result: pd.DataFrame, file_path: Path) -> None:
+    # 途中で止まっても以前の parquet が壊れないように，一時ファイルに書いてから置き換える
+    temp_path = file_path.with_name(f".{file_path.name}.tmp")
+    normalize_for_parquet(df_result).to_parquet(temp_path, index=False)
+    os.replace(temp_path, file_path)
+
+def write_records(config: Config, df_result: pd.DataFrame, name: str) -> None:
+    write_table(df_result, get_table_path(config, name))
+
+def read_table(file_path: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    if file_path.exists():
+        return pd.read_parquet(file_path, columns=columns, dtype_backend="numpy_nullable")
+
+    # parquet がまだない場合は，以前のスクリプトが保存した csv のコピーを読み込む
+    csv_path = file_path.with_suffix(".csv")
+    return pd.read_csv(
+        csv_path,
+        usecols=columns,
+        encoding=CSV_ENCODINGS.get(file_path.stem),
+        dtype={column: TEXT_DTYPE for column in TEXT_COLUMNS}
+    )
+
+def iter_table_chunks(file_path: Path, columns: Optional[List[str]], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    if file_path.exists():
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    # read_table と同様に，parquet がまだない場合は csv のコピーを chunk ごとに読み込む
+    csv_path = file_path.with_suffix(".csv")
+    yield from pd.read_csv(
+        csv_path,
+        usecols=columns,
+        encoding=CSV_ENCODINGS.get(file_path.stem),
+        dtype={column: TEXT_DTYPE for column in TEXT_COLUMNS},
+        chunksize=chunk_rows
+    )
+
+def read_records(config: Config, name: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    return enforce_schema(read_table(get_table_path(config, name), columns))
+
+def encode_csv_chunk(df_chunk: pd.DataFrame, header: bool, encoding: str) -> bytes:
+    csv_text = df_chunk.to_csv(index=False, header=header)
+
+    if encoding.replace("-", "").lower() == "utf16":
+        # to_csv(encoding="utf-16") と同様に，先頭の chunk のみ BOM を付ける
+        return (codecs.BOM_UTF16_LE if header else b"") + csv_text.encode("utf-16-le")
+    return csv_text.encode(encoding)
+
+def export_csv(df_result: pd.DataFrame, export_path: Path, encoding: str = "utf-8", n_workers: int = 0) -> None:
+    chunks = [df_result.iloc[start:start + EXPORT_CHUNK_ROWS] for start in range(0, len(df_result), EXPORT_CHUNK_ROWS)]
+    chunks = chunks or [df_result] # 0 行でもヘッダは書き出す
+    headers = [chunk_id == 0 for chunk_id in range(len(chunks))]
+    encodings = [encoding] * len(chunks)
+
+    n_workers = min(n_workers or os.cpu_count() or 1, len(chunks))
+    temp_path = export_path.with_name(f".{export_path.name}.tmp")
+    with open(temp_path, "wb") as f:
+        if n_workers == 1:
+            for encoded_chunk in map(encode_csv_chunk, chunks, headers, encodings):
+                f.write(encoded_chunk)
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                for encoded_chunk in executor.map(encode_csv_chunk, chunks, headers, encodings): # 順番は保たれる
+                    f.write(encoded_chunk)
+    os.replace(temp_path, export_path)
+
+def to_cell_value(value: object) -> object:
+    if pd.isna(value): # type: ignore
+        return None
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value) # openpyxl は制御文字を書き込めない
+    return value
+
+def export_xlsx(df_result: pd.DataFrame, export_path: Path) -> None:
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(list(df_result.columns))
+    for record in df_result.astype(object).itertuples(index=False):
+        worksheet.append([to_cell_value(value) for value in record])
+
+    temp_path = export_path.with_name(f".{export_path.name}.tmp")
+    workbook.save(temp_path)
+    os.replace(temp_path, export_path)
+
+def load_export_manifest(config: Config) -> Dict[str, List[int]]:
+    manifest_path = config.processed_data_dir / EXPORT_MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return {}
+
+    return json.loads(manifest_path.read_text())
+
+def save_export_manifest(config: Config, manifest: Dict[str, List[int]]) -> None:
+    (config.processed_data_dir / EXPORT_MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=4))
+
+def get_source_stat(table_path: Path) -> List[int]:
+    table_stat = table_path.stat()
+    return [table_stat.st_size, table_stat.st_mtime_ns]
+
+def export_records(
+    config: Config, names: List[str], export_format: str = "csv", force: bool = False, n_workers: int = 0
+) -> List[Path]:
+    manifest = load_export_manifest(config)
+
+    exported_paths = []
+    for name in names:
+        table_path = get_table_path(config, name)
+        if not table_path.exists():
+            print(f"{table_path.name} was not found, skipped")
+            continue
+        export_path = get_export_path(config, name, export_format)
+
+        # artifact_store で以前の出力に張り直した場合も検出できるように，更新時刻の大小ではなく一致で比較
+        source_stat = get_source_stat(table_path)
+        if not force and export_path.exists() and manifest.get(export_path.name) == source_stat:
+            continue
+
+        df_result = read_table(table_path)
+        if export_format == "csv":
+            export_csv(df_result, export_path, CSV_ENCODINGS.get(name, "utf-8"), n_workers)
+        else:
+            export_xlsx(df_result, export_path)
+
+        manifest[export_path.name] = source_stat
+        exported_paths.append(export_path)
+
+    save_export_manifest(config, manifest)
+    return exported_paths
+
+def migrate_csv_records(config: Config, names: List[str]) -> List[str]:
+    # parquet がまだない表は，以前のスクリプトが保存した csv から作成する
+    manifest = load_export_manifest(config)
+    migrated_names = []
+    for name in names:
+        table_path = get_table_path(config, name)
+        csv_path = get_export_path(config, name, "csv")
+        if table_path.exists() or not csv_path.exists():
+            continue
+
+        write_table(pd.read_csv(csv_path, encoding=CSV_ENCODINGS.get(name)), table_path)
+        manifest[csv_path.name] = get_source_stat(table_path) # 元の csv は作成した parquet のコピーとして扱う
+        migrated_names.append(name)
+
+    save_export_manifest(config, manifest)
+    return migrated_names
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the parquet tables as human-facing copies")
+    parser.add_argument("names", nargs="*", default=RECORD_TABLES, help="tables to export (default: all)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv", dest="export_format")
+    parser.add_argument("--force", action="store_true", help="re-export even if the copy is up to date")
+    parser.add_argument("--workers", type=int, default=0, help="processes to encode the csv chunks")
+    parser.add_argument("--from-csv", action="store_true", help="convert the existing csv copies into parquet")
+    args = parser.parse_args()
+
+    config = Config()
+    if args.from_csv:
+        migrated_names = migrate_csv_records(config, args.names)
+        print(f"{len(migrated_names)} tables were converted into parquet")
+        return
+
+    exported_paths = export_records(config, args.names, args.export_format, args.force, args.workers)
+    for export_path in exported_paths:
+        print(f"{export_path.name} was exported")
+    print(f"{len(exported_paths)} copies were exported")
+
+if __name__ == "__main__":
+    main()
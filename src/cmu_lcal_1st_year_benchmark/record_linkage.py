@@ -0,0 +1,137 @@
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from config import Config
+from doi_index import normalize_doi
+from fuzzy_dedup import normalize_title
+from record_export import write_records
+from record_schema import OUTPUT_COLUMNS, TEXT_COLUMNS, TEXT_DTYPE, concat_records
+from source_adapters import load_sources
+from stage_catalog import DB_SEARCH_SOURCES, SEARCH_METHOD_PRIORITY
+
+MIN_TITLE_LENGTH = 20 # "Introduction", "Index" 等の短いタイトルは title + year のキーに使わない
+SEARCH_METHODS_SEPARATOR = ";"
+
+"""
+全 source のレコードを複数のキーで同一文献ごとのクラスタにまとめる (record linkage)
+
+1. 各レコードからマッチングのキーを作成
+    - 正規化した doi (doi_index.normalize_doi)
+    - 正規化したタイトル + 出版年 (fuzzy_dedup.normalize_title)
+    - Semantic Scholar の corpus_id
+2. union-find で，いずれかのキーが一致するレコードを同じクラスタに統合
+    - キーごとに最初に出現したレコードと union するため，辺の数はレコード数以下 (ほぼ線形時間)
+3. クラスタごとに 1 件の代表レコードを作成
+    - SEARCH_METHOD_PRIORITY の高い source から順に，欠損していない値で各列を埋める
+    - search_method ... 最も優先度の高い source
+    - search_methods ... クラスタ内の全 search_method (";" 区切り，優先度順)
+4. 結果を db_search_linked.parquet として保存
+    - remove_doi_duplicated と異なり，優先度の低い source にのみある abstract や link も残る
+"""
+
+
+class UnionFind:
+    def __init__(self, size: int) -> None:
+        self.parent: List[int] = list(range(size))
+        self.size: List[int] = [1] * size
+
+    def find(self, idx: int) -> int:
+        parent = self.parent
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]] # path halving
+            idx = parent[idx]
+
+        return idx
+
+    def union(self, idx_a: int, idx_b: int) -> None:
+        root_a, root_b = self.find(idx_a), self.find(idx_b)
+        if root_a == root_b:
+            return
+
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+
+    def union_by_key(self, keys: pd.Series) -> None:
+        # 同じキーを持つレコードを，そのキーで最初に出現したレコードと union する (NA は無視)
+        mask_valid = keys.notna().to_numpy()
+        record_idx = np.nonzero(mask_valid)[0]
+        key_codes, _ = pd.factorize(keys[mask_valid])
+
+        first_idx = np.empty(key_codes.max() + 1 if len(key_codes) else 0, dtype=np.int64)
+        first_idx[key_codes[::-1]] = record_idx[::-1]
+
+        record_first_idx = first_idx[key_codes]
+        mask_linked = record_idx != record_first_idx # キーで最初に出現したレコード自身は除く
+        for idx, idx_first in zip(record_idx[mask_linked], record_first_idx[mask_linked]):
+            self.union(int(idx), int(idx_first))
+
+    def cluster_labels(self) -> np.ndarray:
+        roots = np.array([self.find(idx) for idx in range(len(self.parent))], dtype=np.int64)
+        labels, _ = pd.factorize(roots) # 最初に出現した順に 0, 1, 2, ...
+
+        return labels
+
+def build_title_year_key(df_records: pd.DataFrame) -> pd.Series:
+    title = normalize_title(df_records["title"])
+    year = df_records["year"].astype("Int64").astype(TEXT_DTYPE)
+
+    title_year = (title + "|" + year).astype(TEXT_DTYPE)
+    mask_valid = (title.str.len() >= MIN_TITLE_LENGTH) & year.notna()
+
+    return title_year.where(mask_valid)
+
+def build_corpus_id_key(df_records: pd.DataFrame) -> pd.Series:
+    if "corpus_id" not in df_records.columns:
+        return pd.Series(pd.NA, index=df_records.index, dtype=TEXT_DTYPE)
+
+    corpus_id = pd.to_numeric(df_records["corpus_id"], errors="coerce").astype("Int64")
+    return corpus_id.astype(TEXT_DTYPE)
+
+def cluster_records(df_records: pd.DataFrame) -> np.ndarray:
+    union_find = UnionFind(len(df_records))
+    union_find.union_by_key(normalize_doi(df_records["doi"]))
+    union_find.union_by_key(build_title_year_key(df_records))
+    union_find.union_by_key(build_corpus_id_key(df_records))
+
+    return union_find.cluster_labels()
+
+def link_records(df_result_merged: pd.DataFrame, search_method_priority: Dict[str, int]) -> pd.DataFrame:
+    # 1. sort by source priority (each cluster is filled from the best source first)
+    df_result_sorted = df_result_merged.sort_values(
+        "search_method",
+        key=lambda col: col.astype(str).map(search_method_priority),
+        kind="stable"
+    ).reset_index(drop=True)
+
+    # 2. cluster records by doi / title + year / corpus_id
+    cluster = cluster_records(df_result_sorted)
+    print(f"{len(df_result_sorted)} records were linked into {cluster.max() + 1} clusters!")
+
+    # 3. fill each field from the best source that has a value ("" is regarded as missing)
+    df_fields = df_result_sorted[OUTPUT_COLUMNS].copy()
+    for column in TEXT_COLUMNS:
+        df_fields[column] = df_fields[column].replace("", pd.NA)
+    df_result_linked = df_fields.groupby(cluster, sort=True).first()
+
+    # 4. keep every search method that found the record
+    search_methods = df_result_sorted["search_method"].astype(str).groupby(cluster, sort=True).agg(
+        lambda methods: SEARCH_METHODS_SEPARATOR.join(dict.fromkeys(methods))
+    )
+    df_result_linked["search_methods"] = search_methods
+
+    return df_result_linked.reset_index(drop=True)
+
+def main() -> None:
+    config = Config()
+    datasets = load_sources(config, DB_SEARCH_SOURCES)
+
+    df_result_merged = concat_records(datasets.values())
+    df_result_linked = link_records(df_result_merged, SEARCH_METHOD_PRIORITY)
+
+    write_records(config, df_result_linked, "db_search_linked")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import pandas as pd
+
+OUTPUT_COLUMNS = ["authors", "year", "title", "abstract", "document_type", "doi", "link", "search_method"]
+# 重複を人手で確認するワークブック (*_manual_dup_remove.xlsx) の列
+DUP_REMOVE_COLUMNS = [
+    "authors", "is_duplicated", "year", "title", "abstract", "document_type", "doi", "link", "search_method"
+]
+TEXT_COLUMNS = ["authors", "title", "abstract", "doi", "link"]
+CATEGORICAL_COLUMNS = ["document_type", "search_method"]
+
+TEXT_DTYPE = pd.StringDtype("pyarrow")
+YEAR_DTYPE = pd.Int16Dtype()
+
+"""
+検索結果レコードの共通スキーマ
+    - authors, title, abstract, doi, link ... pyarrow の string
+    - document_type, search_method ... category
+    - year ... Int16 (欠損は <NA>)
+
+1. source_adapters で読み込んだ直後に enforce_schema を適用 (adapter の境界でスキーマを揃える)
+2. 複数の DataFrame は concat_records で結合 (category を保ったまま結合するため)
+3. 保存済みの表は record_export.read_records，人が編集した csv は read_records_csv で読み込み
+"""
+
+
+def to_year(year: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(year):
+        return year.astype(YEAR_DTYPE)
+
+    # "2013", "2010///", "J Cenoz - 2005 - ..." 等から最初の 4 桁の数字を出版年として取り出す
+    year_str = year.astype(TEXT_DTYPE).str.extract(r"([0-9]{4})", expand=False)
+    return pd.to_numeric(year_str).astype(YEAR_DTYPE)
+
+def enforce_schema(df_result: pd.DataFrame) -> pd.DataFrame:
+    dtypes: Dict[str, Any] = {}
+    for column in df_result.columns:
+        if column in TEXT_COLUMNS:
+            dtypes[column] = TEXT_DTYPE
+        elif column in CATEGORICAL_COLUMNS:
+            dtypes[column] = "category"
+
+    df_result_typed = df_result.astype(dtypes)
+    if "year" in df_result_typed.columns:
+        df_result_typed["year"] = to_year(df_result_typed["year"])
+
+    return df_result_typed
+
+def concat_records(dataset_list: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    # category が異なる DataFrame をそのまま concat すると object に戻るため，先に category を揃える
+    dataset_list = [enforce_schema(df_result) for df_result in dataset_list]
+
+    for column in CATEGORICAL_COLUMNS:
+        categories = pd.Index([])
+        for df_result in dataset_list:
+            if column in df_result.columns:
+                categories = categories.union(df_result[column].cat.categories)
+
+        dataset_list = [
+            df_result.assign(**{column: df_result[column].cat.set_categories(categories)})
+            if column in df_result.columns else df_result
+            for df_result in dataset_list
+        ]
+
+    return pd.concat(dataset_list)
+
+def read_records_csv(file_path: Path, encoding: Optional[str] = None) -> pd.DataFrame:
+    df_result = pd.read_csv(
+        file_path,
+        encoding=encoding,
+        dtype={column: TEXT_DTYPE for column in TEXT_COLUMNS}
+    )
+
+    return enforce_schema(df_result)
+
+def memory_usage_mb(df_result: pd.DataFrame) -> float:
+    return df_result.memory_usage(deep=True).sum() / 1024 ** 2
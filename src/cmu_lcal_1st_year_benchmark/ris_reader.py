@@ -0,0 +1,122 @@
+from pathlib import Path
+from typing import Dict, Generator, List, Optional
+
+import pandas as pd
+import pyarrow as pa  # type: ignore
+
+RIS_TAG_COLUMN_MAPPING = {
+    "AU": "authors",
+    "PY": "year",
+    "TI": "title",
+    "T1": "primary_title",
+    "AB": "abstract",
+    "N2": "abstract",
+    "DO": "doi",
+    "UR": "url"
+}
+RIS_LIST_TAGS = ("AU",)
+RIS_COLUMNS = ["authors", "year", "title", "primary_title", "abstract", "doi", "url"]
+RIS_SCHEMA = pa.schema([(column, pa.string()) for column in RIS_COLUMNS])
+
+START_TAG = "TY"
+END_TAG = "ER"
+BATCH_SIZE = 10_000
+AUTHOR_SEPARATOR = "; " # 空白で連結すると著者の区切りが分からなくなるため
+
+"""
+1. ris ファイルを 1 行ずつ読み込み (ファイル全体を readlines しない)
+2. タグ行 ("XX  - ") のうち，必要なタグ (authors, year, title/primary_title, abstract, doi, url) のみ保持
+    - タグのない行は直前のタグの続きとして扱う (RISparser と同じ挙動)
+    - 同じタグが複数回出現した場合は最初の値を採用 (AU のみリストとして保持)
+3. AU はレコード終了時に AUTHOR_SEPARATOR で連結した文字列に変換
+4. BATCH_SIZE 件ごとに固定スキーマの pyarrow.RecordBatch として出力
+"""
+
+
+def append_continuation(record: Dict[str, str], authors: List[str], last_tag: str, content: str) -> None:
+    if not content:
+        return
+
+    if last_tag in RIS_LIST_TAGS:
+        authors.append(content)
+    else:
+        column = RIS_TAG_COLUMN_MAPPING[last_tag]
+        record[column] = f"{record[column]} {content}"
+
+def ris_record_generator(
+        file_path: Path,
+        list_separator: str = AUTHOR_SEPARATOR
+) -> Generator[Dict[str, Optional[str]], None, None]:
+    record: Dict[str, str] = {}
+    authors: List[str] = []
+    in_record = False
+    last_tag: Optional[str] = None
+
+    with open(file_path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            tag = line[:2]
+            if line[2:6] != "  - " or not tag.isupper():
+                # 1. continuation of the previous tag
+                if in_record and last_tag in RIS_TAG_COLUMN_MAPPING:
+                    append_continuation(record, authors, last_tag, line.strip())
+                continue
+
+            last_tag = tag
+
+            if tag == START_TAG:
+                if in_record:
+                    raise IOError(f"Missing end of record tag before:\n {line}")
+                in_record = True
+                continue
+
+            if tag == END_TAG:
+                record["authors"] = list_separator.join(authors)
+                yield record # type: ignore
+
+                record = {}
+                authors = []
+                in_record = False
+                last_tag = None
+                continue
+
+            if tag not in RIS_TAG_COLUMN_MAPPING:
+                continue
+
+            # 2. keep the first value of each tag (authors are kept as list)
+            content = line[6:].strip()
+            if tag in RIS_LIST_TAGS:
+                authors.append(content)
+                continue
+
+            column = RIS_TAG_COLUMN_MAPPING[tag]
+            if column in record:
+                last_tag = None # 2 回目以降のタグの続き行は無視
+                continue
+            record[column] = content
+
+def ris_batch_generator(
+        file_path: Path,
+        batch_size: int = BATCH_SIZE,
+        list_separator: str = AUTHOR_SEPARATOR
+) -> Generator[pa.RecordBatch, None, None]:
+    columns: Dict[str, List[Optional[str]]] = {column: [] for column in RIS_COLUMNS}
+    n_records = 0
+
+    for record in ris_record_generator(file_path, list_separator):
+        for column, values in columns.items():
+            values.append(record.get(column))
+        n_records += 1
+
+        if n_records == batch_size:
+            yield pa.RecordBatch.from_pydict(columns, schema=RIS_SCHEMA)
+            columns = {column: [] for column in RIS_COLUMNS}
+            n_records = 0
+
+    if n_records:
+        yield pa.RecordBatch.from_pydict(columns, schema=RIS_SCHEMA)
+
+def read_ris(file_path: Path, batch_size: int = BATCH_SIZE, list_separator: str = AUTHOR_SEPARATOR) -> pd.DataFrame:
+    batches = list(ris_batch_generator(file_path, batch_size, list_separator))
+    table = pa.Table.from_batches(batches, schema=RIS_SCHEMA)
+
+    return table.to_pandas()
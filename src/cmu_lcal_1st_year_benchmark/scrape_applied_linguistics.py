@@ -1,18 +1,28 @@
 import re
-from typing import Generator, Tuple
+from typing import Dict, Generator, Tuple
 
 import pandas as pd
 from bs4 import BeautifulSoup, Tag
 from config import Config
+from profiler import profiled
+from record_export import write_records
+from text_normalizer import TEXT_NORMALIZATION, TextNormalization, normalize_columns
 from tqdm import tqdm
 
 STUDY_RECORD_DIV_CLASS = "sr-list al-article-box al-normal clearfix"
 N_PAGES = 12
 
+TEXT_NORMALIZATIONS: Dict[str, TextNormalization] = {
+    "authors": TEXT_NORMALIZATION,
+    "title": TEXT_NORMALIZATION,
+    "abstract": TEXT_NORMALIZATION
+}
+
 """
 1. 指定のURLから html を取得
 2. beautiful soup で html を解析
 3. 著者，タイトル，出版年，アブスト，doi を取得
+    - 改行・空白等は，全ページの取得後に TEXT_NORMALIZATIONS でまとめて正規化
 4. データを保存，次のページへ
 """
 
@@ -34,17 +44,20 @@ def study_record_div_generator(parsed_html: BeautifulSoup) -> Generator[Tag, Non
     for study_record_div in parsed_html.find_all("div", class_=STUDY_RECORD_DIV_CLASS):
         yield study_record_div # type: ignore
 
+@profiled
 def extract_authors(study_record_div: Tag) -> str:
     authors = study_record_div.find("div", class_="sri-authors al-authors-list")
 
     return authors.text # type: ignore
 
+@profiled
 def extract_title(study_record_div: Tag) -> str:
     title_area = study_record_div.find("a", class_="article-link at-sr-article-title-link")
     title = title_area.find("span") # type: ignore
 
     return title.text # type: ignore
 
+@profiled
 def extract_pub_year(study_record_div: Tag) -> str:
     pub_year = study_record_div.find("div", class_="sri-date al-pub-date")
 
@@ -54,16 +67,16 @@ def extract_pub_year(study_record_div: Tag) -> str:
 
     return ""
 
+@profiled
 def extract_abstract_snippet(study_record_div: Tag) -> str:
     abstract_snippet = study_record_div.find("div", class_="snippet")
 
     if abstract_snippet is None:
         return ""
 
-    abstract_snippet_str: str = abstract_snippet.text # type: ignore
-    abstract_snippet_str = abstract_snippet_str.strip().replace("\n", " ")
-    return abstract_snippet_str
+    return abstract_snippet.text # type: ignore
 
+@profiled
 def extract_doi(study_record_div: Tag) -> Tuple[str, str]:
     citation_info = study_record_div.find("div", class_="al-citation-list")
     doi_link: str = citation_info.find("a").text # type: ignore
@@ -97,11 +110,8 @@ def main() -> None:
             data.append(row)
             pbar.update(1)
 
-    df_applied_linguistics = pd.DataFrame(data)
-    df_applied_linguistics.to_csv(
-        config.processed_data_dir / "applied_linguistics_manual_search_result.csv",
-        index=False
-    )
+    df_applied_linguistics = normalize_columns(pd.DataFrame(data), TEXT_NORMALIZATIONS)
+    write_records(config, df_applied_linguistics, "applied_linguistics_manual_search_result")
 
 if __name__ == "__main__":
     main()
@@ -1,18 +1,28 @@
 import re
-from typing import Generator, Tuple
+from typing import Dict, Generator, Tuple
 
 import pandas as pd
 from bs4 import BeautifulSoup, Tag
 from config import Config
+from profiler import profiled
+from record_export import write_records
+from text_normalizer import TEXT_NORMALIZATION, UNQUOTED_TEXT_NORMALIZATION, TextNormalization, normalize_columns
 from tqdm import tqdm
 
 STUDY_RECORD_DIV_ID = "main-content"
 N_PAGES = 2
+# 著者とタイトルは二重引用符で囲まれている
+TEXT_NORMALIZATIONS: Dict[str, TextNormalization] = {
+    "authors": UNQUOTED_TEXT_NORMALIZATION,
+    "title": UNQUOTED_TEXT_NORMALIZATION,
+    "abstract": TEXT_NORMALIZATION
+}
 
 """
 1. 指定のURLから html を取得
 2. beautiful soup で html を解析
 3. 著者，タイトル，出版年，アブスト，doi を取得
+    - 改行・引用符・空白等は，全ページの取得後に TEXT_NORMALIZATIONS でまとめて正規化
 4. データを保存，次のページへ
 """
 
@@ -34,28 +44,22 @@ def study_record_div_generator(parsed_html: BeautifulSoup) -> Generator[Tag, Non
     for study_record_div in parsed_html.find_all("div", id=STUDY_RECORD_DIV_ID):
         yield study_record_div # type: ignore
 
+@profiled
 def extract_authors(study_record_div: Tag) -> str:
     authors = study_record_div.find("span", class_="contributors suggested-products__tertiary-author-info me-2")
 
     if authors is None:
         return ""
 
-    authors_str: str = authors.text # type: ignore
-    authors_str = authors_str.replace("\n", "").replace("\"", "").strip()
-
-    while "  " in authors_str:
-        authors_str = authors_str.replace("  ", " ")
-
-    return authors_str
+    return authors.text # type: ignore
 
+@profiled
 def extract_title(study_record_div: Tag) -> str:
     title = study_record_div.find("h3", class_="titleSearchPageResult mb-0") # type: ignore
 
-    title_str: str = title.text # type: ignore
-    title_str = title_str.replace("\n", "").replace("\"", "").strip()
-
-    return title_str
+    return title.text # type: ignore
 
+@profiled
 def extract_pub_year(study_record_div: Tag) -> str:
     pub_year = study_record_div.find("span", class_="pubDate")
 
@@ -65,16 +69,16 @@ def extract_pub_year(study_record_div: Tag) -> str:
 
     return ""
 
+@profiled
 def extract_abstract_snippet(study_record_div: Tag) -> str:
     abstract_snippet = study_record_div.find("div", class_="snippets snippetsContent three-line-ellipsis my-2")
 
     if abstract_snippet is None:
         return ""
 
-    abstract_snippet_str: str = abstract_snippet.text # type: ignore
-    abstract_snippet_str = abstract_snippet_str.strip().replace("\n", " ")
-    return abstract_snippet_str
+    return abstract_snippet.text # type: ignore
 
+@profiled
 def extract_doi(study_record_div: Tag) -> Tuple[str, str]:
     download_link_div = study_record_div.find(
         "div", class_="searchResultActions d-flex flex-wrap mt-2 pt-1"
@@ -111,11 +115,8 @@ def main() -> None:
             data.append(row)
             pbar.update(1)
 
-    df_applied_linguistics = pd.DataFrame(data)
-    df_applied_linguistics.to_csv(
-        config.processed_data_dir / "intercultural_pragmatics_manual_search_result.csv",
-        index=False
-    )
+    df_applied_linguistics = normalize_columns(pd.DataFrame(data), TEXT_NORMALIZATIONS)
+    write_records(config, df_applied_linguistics, "intercultural_pragmatics_manual_search_result")
 
 if __name__ == "__main__":
     main()
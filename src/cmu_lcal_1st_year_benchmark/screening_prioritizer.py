@@ -0,0 +1,288 @@
+import argparse
+import dataclasses
+import time
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from config import Config
+from decision_store import harvest_decisions, lookup_decisions, record_fingerprint
+from record_export import get_source_stat, get_table_path, read_records
+from screening_workbook import read_screening_workbook
+from search_index import DEFAULT_TABLE, SearchIndex, load_search_index
+from stage_catalog import DECISION_WORKBOOKS
+
+SCREENING_MODEL_DIRNAME = "screening_model"
+DECISION = "is_eligible"
+TRAINING_LABELS = [0, 1] # 不適合・適合 (-1 等のその他の判定は学習に使わない)
+
+LEARNING_RATE = 0.5
+L2_PENALTY = 1e-4
+N_EPOCHS = 10 # 1 回の更新で新しいラベル (と replay) を学習する回数
+BATCH_SIZE = 64
+REPLAY_SIZE = 256 # 新しいラベルと一緒に学習し直す，学習済みのラベルの数 (以前のラベルを忘れないように)
+RANDOM_SEED = 0
+MIN_CALIBRATION_LABELS = 5 # 確率の補正 (Platt scaling) に必要な適合・不適合のラベルの数
+
+"""
+スクリーニング (is_eligible) のラベルから線形モデルを逐次学習し，未判定のレコードを適合しそうな順に並べる
+
+1. search_index の転置 index から，レコード × 語の TF-IDF の疎行列 (CSR 形式) を作成 (build_feature_matrix)
+    - tf は 1 + log(tf)，各レコードのベクトルは L2 正規化
+    - processed/screening_model/<表>_features.npz に保存し，元の parquet が変わるまで作り直さない
+2. ラベルは title_abstract_screening*.xlsx (external) と表の is_eligible から取得 (load_labels)
+    - ワークブックのレコードは decision_store の fingerprint で表のレコードと対応付け，ワークブックの判定を優先
+    - 学習と確率の補正には 0 / 1 の判定のみ使い，-1 (保留等) のレコードは判定済みとして順位付けから除く
+3. ロジスティック回帰を mini-batch SGD で学習し，モデル (重み，学習済みのラベル) を <表>_model.npz に保存
+    - 実行するたびに，前回から増えた (または変わった) ラベルのみと，学習済みのラベルの一部 (REPLAY_SIZE) で更新
+    - 適合 (1) のレコードは少ないため，ラベルの数の逆比で重み付け (class weight)
+    - 疎行列の積は，非ゼロ要素に対する np.bincount で計算 (scipy / scikit-learn なし)
+4. 未判定のレコードを予測確率の高い順に並べ，残りの適合レコード数を推定 (rank_unscreened)
+    - class weight で偏った確率を，判定済みのレコードの logit と判定から Platt scaling で補正した上で合計
+    - 適合・不適合の判定が MIN_CALIBRATION_LABELS 未満の間は，ラベルの適合率で補正 (logit + log(正例 / 負例))
+5. python screening_prioritizer.py [--table] [--top] [--reset]
+    - スクリーニングのバッチごとにワークブックを external に置いて実行すると，モデルを更新して次の候補を表示
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class FeatureMatrix:
+    indptr: np.ndarray # レコード i の非ゼロ要素は [indptr[i], indptr[i + 1])
+    indices: np.ndarray
+    data: np.ndarray
+    n_features: np.ndarray # np.savez で保存するため 0 次元の配列
+    source_stat: np.ndarray
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.indptr) - 1
+
+@dataclasses.dataclass(frozen=True)
+class ScreeningModel:
+    weights: np.ndarray
+    bias: np.ndarray
+    n_labels: np.ndarray # [negative, positive] の数
+    trained_fingerprints: np.ndarray
+    trained_labels: np.ndarray
+    source_stat: np.ndarray # モデルを学習した特徴量の元の parquet の (サイズ，更新時刻)
+
+def build_feature_matrix(search_index: SearchIndex) -> FeatureMatrix:
+    n_docs, n_terms = search_index.n_docs, len(search_index.vocabulary)
+    postings_term = np.repeat(np.arange(n_terms), np.diff(search_index.term_offsets))
+    document_frequencies = np.diff(search_index.term_offsets)
+    idf = np.log((1 + n_docs) / (1 + document_frequencies)) + 1
+
+    # 語の順の postings を，レコードの順に並べ替える
+    order = np.argsort(search_index.postings_doc, kind="stable")
+    docs = search_index.postings_doc[order]
+    indices = postings_term[order]
+    data = (1 + np.log(search_index.postings_tf[order])) * idf[indices]
+
+    norms = np.sqrt(np.bincount(docs, weights=data ** 2, minlength=n_docs))
+    data = data / np.maximum(norms, 1e-12)[docs]
+
+    return FeatureMatrix(
+        indptr=np.concatenate([[0], np.cumsum(np.bincount(docs, minlength=n_docs))]).astype(np.int64),
+        indices=indices.astype(np.int32),
+        data=data.astype(np.float32),
+        n_features=np.array(n_terms),
+        source_stat=search_index.source_stat
+    )
+
+def get_model_dir(config: Config) -> Path:
+    return config.processed_data_dir / SCREENING_MODEL_DIRNAME
+
+def save_arrays(arrays: Union[FeatureMatrix, ScreeningModel], file_path: Path) -> None:
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = file_path.with_name(f".{file_path.stem}.tmp.npz")
+    np.savez(temp_path, **dataclasses.asdict(arrays))
+    temp_path.replace(file_path)
+
+def load_feature_matrix(config: Config, table_name: str = DEFAULT_TABLE) -> FeatureMatrix:
+    features_path = get_model_dir(config) / f"{table_name}_features.npz"
+    source_stat = get_source_stat(get_table_path(config, table_name))
+
+    if features_path.exists():
+        with np.load(features_path) as arrays:
+            features = FeatureMatrix(**{field.name: arrays[field.name] for field in dataclasses.fields(FeatureMatrix)})
+        if features.source_stat.tolist() == source_stat:
+            return features
+
+    features = build_feature_matrix(load_search_index(config, table_name))
+    save_arrays(features, features_path)
+    return features
+
+def init_model(n_features: int, source_stat: np.ndarray) -> ScreeningModel:
+    return ScreeningModel(
+        weights=np.zeros(n_features, dtype=np.float32),
+        bias=np.zeros(1, dtype=np.float32),
+        n_labels=np.zeros(2, dtype=np.int64),
+        trained_fingerprints=np.empty(0, dtype=str),
+        trained_labels=np.empty(0, dtype=np.int8),
+        source_stat=source_stat
+    )
+
+def load_model(config: Config, table_name: str, features: FeatureMatrix) -> ScreeningModel:
+    model_path = get_model_dir(config) / f"{table_name}_model.npz"
+    if model_path.exists():
+        with np.load(model_path) as arrays:
+            model = ScreeningModel(**{field.name: arrays[field.name] for field in dataclasses.fields(ScreeningModel)})
+        # 特徴量 (語彙) が作り直された場合は，全てのラベルで学習し直す
+        if np.array_equal(model.source_stat, features.source_stat):
+            return model
+
+    return init_model(int(features.n_features), features.source_stat)
+
+def load_labels(config: Config, df_records: pd.DataFrame) -> pd.Series:
+    fingerprints = record_fingerprint(df_records)
+    labels = pd.to_numeric(df_records[DECISION], errors="coerce")
+
+    for filename, decision in DECISION_WORKBOOKS.items():
+        workbook_path = config.external_data_dir / filename
+        if decision != DECISION or not workbook_path.exists():
+            continue
+        df_decisions = harvest_decisions(read_screening_workbook(workbook_path), decision)
+        workbook_labels = lookup_decisions(df_records, df_decisions.set_index("fingerprint")["value"])
+        labels = workbook_labels.astype("Float64").fillna(labels.astype("Float64"))
+
+    return pd.Series(labels.to_numpy(dtype=float, na_value=np.nan), index=fingerprints.to_numpy(dtype=str))
+
+def gather_rows(features: FeatureMatrix, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # rows の非ゼロ要素を連結し，各要素が何番目の行のものかを返す
+    starts, ends = features.indptr[rows], features.indptr[rows + 1]
+    lengths = ends - starts
+    positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    row_ids = np.repeat(np.arange(len(rows)), lengths)
+
+    return row_ids, features.indices[positions], features.data[positions]
+
+def decision_function(features: FeatureMatrix, model: ScreeningModel, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    if rows is None:
+        row_ids = np.repeat(np.arange(features.n_docs), np.diff(features.indptr))
+        indices, data, n_rows = features.indices, features.data, features.n_docs
+    else:
+        (row_ids, indices, data), n_rows = gather_rows(features, rows), len(rows)
+
+    return np.bincount(row_ids, weights=data * model.weights[indices], minlength=n_rows) + model.bias[0]
+
+def sigmoid(logits: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-np.clip(logits, -30, 30)))
+
+def partial_fit(
+    features: FeatureMatrix, model: ScreeningModel, rows: np.ndarray, labels: np.ndarray, rng: np.random.Generator
+) -> ScreeningModel:
+    weights, bias = model.weights.copy(), model.bias.copy()
+    n_labels = np.maximum(model.n_labels, 1)
+    class_weights = n_labels.sum() / (2 * n_labels) # 少ないクラスほど大きな重み
+
+    for _ in range(N_EPOCHS):
+        order = rng.permutation(len(rows))
+        for batch_start in range(0, len(rows), BATCH_SIZE):
+            batch = order[batch_start:batch_start + BATCH_SIZE]
+            row_ids, indices, data = gather_rows(features, rows[batch])
+
+            logits = np.bincount(row_ids, weights=data * weights[indices], minlength=len(batch)) + bias[0]
+            errors = (sigmoid(logits) - labels[batch]) * class_weights[labels[batch]] / len(batch)
+
+            gradient = np.bincount(indices, weights=data * errors[row_ids], minlength=len(weights))
+            weights -= LEARNING_RATE * (gradient + L2_PENALTY * weights).astype(np.float32)
+            bias -= LEARNING_RATE * np.float32(errors.sum())
+
+    return dataclasses.replace(model, weights=weights, bias=bias)
+
+def update_model(features: FeatureMatrix, model: ScreeningModel, labels: pd.Series) -> Tuple[ScreeningModel, int]:
+    df_labels = pd.DataFrame({"fingerprint": labels.index, "label": labels.to_numpy(), "row": np.arange(len(labels))})
+    df_labels = df_labels[df_labels["label"].isin(TRAINING_LABELS)].drop_duplicates(subset="fingerprint", keep="first")
+    df_labels["label"] = df_labels["label"].astype(np.int8)
+
+    # 学習済みの (fingerprint, ラベル) の組にないものが新しいラベル
+    df_trained = pd.DataFrame({"fingerprint": model.trained_fingerprints, "label": model.trained_labels})
+    df_labels = df_labels.merge(df_trained.assign(is_trained=True), on=["fingerprint", "label"], how="left")
+    mask_new = df_labels["is_trained"].isna().to_numpy()
+    if not mask_new.any():
+        return model, 0
+
+    rng = np.random.default_rng(RANDOM_SEED + len(model.trained_fingerprints))
+    trained_rows = df_labels.loc[~mask_new, "row"].to_numpy()
+    replay_rows = rng.choice(trained_rows, min(REPLAY_SIZE, len(trained_rows)), replace=False)
+    replay_labels = df_labels.set_index("row").loc[replay_rows, "label"].to_numpy()
+
+    model = dataclasses.replace(
+        model,
+        n_labels=np.bincount(df_labels["label"], minlength=2),
+        trained_fingerprints=df_labels["fingerprint"].to_numpy(dtype=str),
+        trained_labels=df_labels["label"].to_numpy(dtype=np.int8)
+    )
+    rows = np.concatenate([df_labels.loc[mask_new, "row"].to_numpy(), replay_rows]).astype(np.int64)
+    labels_trained = np.concatenate([df_labels.loc[mask_new, "label"].to_numpy(), replay_labels]).astype(np.int64)
+
+    return partial_fit(features, model, rows, labels_trained, rng), int(mask_new.sum())
+
+def fit_calibration(logits: np.ndarray, labels: np.ndarray) -> Optional[Tuple[float, float]]:
+    # Platt scaling (sigmoid(a * logit + b)) を Newton 法で推定
+    labels = labels.astype(float)
+    if min(labels.sum(), len(labels) - labels.sum()) < MIN_CALIBRATION_LABELS:
+        return None
+
+    design = np.column_stack([logits, np.ones_like(logits)])
+    params = np.zeros(2)
+    for _ in range(25):
+        probabilities = sigmoid(design @ params)
+        hessian = design.T @ (design * (probabilities * (1 - probabilities))[:, np.newaxis]) + 1e-6 * np.eye(2)
+        params -= np.linalg.solve(hessian, design.T @ (probabilities - labels))
+
+    return float(params[0]), float(params[1])
+
+def rank_unscreened(
+    features: FeatureMatrix, model: ScreeningModel, labels: pd.Series
+) -> Tuple[np.ndarray, np.ndarray, float]:
+    mask_screened = labels.notna().to_numpy() # -1 (保留等) も判定済み
+    unscreened_rows = np.nonzero(~mask_screened)[0]
+    logits = decision_function(features, model, unscreened_rows)
+    order = np.argsort(-logits, kind="stable")
+
+    # 判定済みのレコードの logit と判定から確率を補正 (class weight と，適合しそうな順に判定することによる偏りを除く)
+    labeled_rows = np.nonzero(labels.isin(TRAINING_LABELS).to_numpy())[0]
+    calibration = fit_calibration(
+        decision_function(features, model, labeled_rows), labels.to_numpy()[labeled_rows].astype(np.int8)
+    )
+    if calibration is not None:
+        probabilities = sigmoid(calibration[0] * logits + calibration[1])
+    else: # 判定が少ない間は，ラベルの適合率で補正
+        n_negative, n_positive = np.maximum(model.n_labels, 1)
+        probabilities = sigmoid(logits + np.log(n_positive / n_negative))
+
+    return unscreened_rows[order], probabilities[order], float(probabilities.sum())
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prioritize unscreened records with an incrementally trained model")
+    parser.add_argument("--table", default=DEFAULT_TABLE)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--reset", action="store_true", help="discard the saved model and train from all labels")
+    args = parser.parse_args()
+
+    config = Config()
+    df_records = read_records(config, args.table)
+    features = load_feature_matrix(config, args.table)
+    labels = load_labels(config, df_records)
+
+    model = init_model(int(features.n_features), features.source_stat) if args.reset else \
+        load_model(config, args.table, features)
+
+    start = time.perf_counter()
+    model, n_new_labels = update_model(features, model, labels)
+    positions, probabilities, n_remaining = rank_unscreened(features, model, labels)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    save_arrays(model, get_model_dir(config) / f"{args.table}_model.npz")
+
+    df_result = df_records.iloc[positions[:args.top]][["authors", "year", "title", "search_method"]]
+    df_result.insert(0, "probability", np.round(probabilities[:args.top], 3))
+    print(df_result.to_string())
+    print(f"{n_new_labels} new labels were learned and {len(positions)} unscreened records were ranked in "
+          f"{elapsed_ms:.1f} ms")
+    print(f"{n_remaining:.1f} eligible records are estimated to remain "
+          f"({model.n_labels[1]} eligible out of {model.n_labels.sum()} screened)")
+
+if __name__ == "__main__":
+    main()
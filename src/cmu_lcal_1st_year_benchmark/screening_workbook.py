@@ -0,0 +1,109 @@
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+from config import Config
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.datavalidation import DataValidation
+from record_export import read_records, to_cell_value
+from search_index import load_search_index, rank_by_relevance
+from spreadsheet_reader import read_spreadsheet
+from stage_catalog import SCREENING_WORKBOOKS
+
+DEFAULT_COLUMN_WIDTH = 12
+COLUMN_WIDTHS: Dict[str, float] = {
+    "authors": 30,
+    "year": 6,
+    "title": 60,
+    "abstract": 80,
+    "is_eligible": 11,
+    "is_duplicated": 13,
+    "Downloaded": 12,
+    "document_type": 18,
+    "doi": 28,
+    "link": 40,
+    "search_method": 20
+}
+DECISION_VALUES = "0,1"
+MAX_SHEET_TITLE_LENGTH = 31 # Excel のシート名の上限
+
+"""
+人手の判定を行うワークブック (重複の確認・タイトルと抄録のスクリーニング) を parquet の表から直接作成し，読み込む
+
+1. stage_catalog.SCREENING_WORKBOOKS に，作成するワークブック (元の表，判定の列，追加する空の列) を登録
+    - 判定の列には decision_store から再適用された判定がそのまま入る (空欄のレコードのみ確認すれば良い)
+2. openpyxl の write_only モードで 1 行ずつ書き込み (build_screening_workbook)
+    - 列幅は COLUMN_WIDTHS で指定，1 行目 (ヘッダ) は固定
+    - 判定の列には 0 / 1 のドロップダウン (data validation) を設定
+3. 判定を記入したワークブックは spreadsheet_reader で読み込み (read_screening_workbook)
+    - 手で追加された名前のない列と，空行は除く
+4. python screening_workbook.py で全てのワークブックを processed に作成
+    - --by-relevance で，タイトルと抄録のスクリーニング (is_eligible) を search_index の BM25 のスコアの高い順に並べる
+    - 重複の確認は，重複の候補が隣り合うように元の順番 (著者順) のまま
+    - 判定を記入したものを external に置くと，decision_store と merge_db_manual_search_results が読み込む
+"""
+
+
+def insert_extra_columns(df_records: pd.DataFrame, decision: str, extra_columns: List[str]) -> pd.DataFrame:
+    columns = list(df_records.columns)
+    position = columns.index(decision) + 1
+    new_columns = columns[:position] + extra_columns + columns[position:]
+
+    return df_records.reindex(columns=new_columns)
+
+def build_screening_workbook(
+    df_records: pd.DataFrame, workbook_path: Path, decision: str, sheet_title: str = "records"
+) -> None:
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_title[:MAX_SHEET_TITLE_LENGTH])
+
+    # write_only モードでは，列幅・固定・入力規則を行を書き込む前に設定する必要がある
+    for column_id, column in enumerate(df_records.columns, start=1):
+        width = COLUMN_WIDTHS.get(column, DEFAULT_COLUMN_WIDTH)
+        worksheet.column_dimensions[get_column_letter(column_id)].width = width
+    worksheet.freeze_panes = "A2"
+
+    if len(df_records) > 0:
+        decision_letter = get_column_letter(list(df_records.columns).index(decision) + 1)
+        validation = DataValidation(type="list", formula1=f'"{DECISION_VALUES}"', allow_blank=True)
+        validation.add(f"{decision_letter}2:{decision_letter}{len(df_records) + 1}")
+        worksheet.data_validations.append(validation)
+
+    worksheet.append(list(df_records.columns))
+    for record in df_records.astype(object).itertuples(index=False):
+        worksheet.append([to_cell_value(value) for value in record])
+
+    workbook.save(workbook_path)
+
+def read_screening_workbook(workbook_path: Path) -> pd.DataFrame:
+    df_workbook = read_spreadsheet(workbook_path)
+
+    # 名前のない列 (手で書式だけ設定された列等) と空行は除く
+    df_workbook = df_workbook.loc[:, ~df_workbook.columns.astype(str).str.startswith("Unnamed: ")]
+    return df_workbook.dropna(how="all").reset_index(drop=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create the screening workbooks")
+    parser.add_argument("--by-relevance", action="store_true", help="order the title/abstract screening by BM25 score")
+    args = parser.parse_args()
+
+    config = Config()
+
+    for screening_workbook in SCREENING_WORKBOOKS:
+        df_records = read_records(config, screening_workbook.table_name)
+        if args.by_relevance and screening_workbook.decision == "is_eligible":
+            df_records = rank_by_relevance(df_records, load_search_index(config, screening_workbook.table_name))
+        df_records = insert_extra_columns(df_records, screening_workbook.decision, screening_workbook.extra_columns)
+
+        build_screening_workbook(
+            df_records,
+            config.processed_data_dir / screening_workbook.filename,
+            screening_workbook.decision,
+            screening_workbook.table_name
+        )
+        print(f"{screening_workbook.filename} was created with {len(df_records)} records")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import argparse
+import dataclasses
+import re
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from config import Config
+from record_export import get_source_stat, get_table_path, read_records
+from text_normalizer import MATCH_KEY_NORMALIZATION, normalize_text
+
+SEARCH_INDEX_DIRNAME = "search_index"
+DEFAULT_TABLE = "db_manual_search_records"
+
+# synthetic_data.SERPAPI_QUERY (pragmatics AND (L2 Japanese) AND (instruction OR teaching)) の語と活用形
+REVIEW_QUERY = "pragmatics pragmatic japanese l2 instruction instructional instructed teaching"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 2 # タイトルの語は抄録の語の 2 回分として数える
+
+# 日本語 (仮名・漢字) は空白で区切られないため，連続した部分を文字 2-gram に分割
+TOKEN_PATTERN = re.compile(r"[぀-ヿ㐀-鿿]+|[^\W_]+")
+CJK_PATTERN = re.compile(r"[぀-ヿ㐀-鿿]")
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it", "its", "of",
+    "on", "or", "that", "the", "their", "this", "to", "was", "were", "which", "with"
+}
+
+"""
+統合したレコードのタイトル・抄録から転置 index (語 → postings) を作成し，レビューの検索語に対する BM25 の順位を求める
+
+1. タイトルと抄録を text_normalizer で正規化 (casefold 等) し，語に分割 (tokenize)
+    - 英語等は単語 (1 文字の語と STOP_WORDS は除く)，日本語は文字 2-gram
+    - タイトルの語は TITLE_WEIGHT 回として数える
+2. 語の id 順・レコードの位置順の CSR 形式の numpy 配列として index を作成 (build_search_index)
+    - vocabulary (語，昇順) / term_offsets / postings_doc / postings_tf / doc_lengths
+    - 出版年と search_method の code も持ち，filter に使う
+3. processed/search_index/<表>.npz に保存し，元の parquet (サイズ，更新時刻) が変わっていなければそのまま読み込む
+4. 検索語の postings のみを走査して BM25 を計算し (search)，出版年・search_method で filter した上で上位を返す
+    - 語の検索は vocabulary の二分探索，レコードごとの加算は numpy でまとめて行う
+5. python search_index.py [検索語 ...] [--table] [--year-min] [--year-max] [--search-method] [--top]
+    - 検索語を省略した場合は REVIEW_QUERY
+    - screening_workbook.py --by-relevance で，タイトルと抄録のスクリーニングをスコアの高い順に並べる
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class SearchIndex:
+    vocabulary: np.ndarray # 語 (昇順)
+    term_offsets: np.ndarray # 語 i の postings は [term_offsets[i], term_offsets[i + 1])
+    postings_doc: np.ndarray
+    postings_tf: np.ndarray
+    doc_lengths: np.ndarray
+    years: np.ndarray # 出版年が不明なレコードは -1
+    search_method_codes: np.ndarray
+    search_methods: np.ndarray
+    source_stat: np.ndarray # index を作成した時の parquet の (サイズ，更新時刻)
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_lengths)
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text):
+        if CJK_PATTERN.match(token):
+            tokens += [token[idx:idx + 2] for idx in range(max(len(token) - 1, 1))]
+        elif len(token) > 1 and token not in STOP_WORDS:
+            tokens.append(token)
+
+    return tokens
+
+def tokenize_records(df_records: pd.DataFrame) -> List[List[str]]:
+    titles = normalize_text(df_records["title"], MATCH_KEY_NORMALIZATION).fillna("")
+    abstracts = normalize_text(df_records["abstract"], MATCH_KEY_NORMALIZATION).fillna("")
+
+    return [tokenize(title) * TITLE_WEIGHT + tokenize(abstract) for title, abstract in zip(titles, abstracts)]
+
+def build_search_index(df_records: pd.DataFrame, source_stat: Optional[List[int]] = None) -> SearchIndex:
+    doc_tokens = tokenize_records(df_records)
+    n_docs = len(doc_tokens)
+    doc_lengths = np.array([len(tokens) for tokens in doc_tokens], dtype=np.int64)
+
+    term_codes, vocabulary = pd.factorize(
+        np.array([token for tokens in doc_tokens for token in tokens], dtype=object), sort=True
+    )
+    doc_ids = np.repeat(np.arange(n_docs, dtype=np.int64), doc_lengths)
+
+    # (語, レコード) の組ごとの出現回数．語の id → レコードの位置の順に並ぶ
+    pair_keys, term_frequencies = np.unique(term_codes.astype(np.int64) * n_docs + doc_ids, return_counts=True)
+    postings_term = pair_keys // max(n_docs, 1)
+    term_offsets = np.searchsorted(postings_term, np.arange(len(vocabulary) + 1))
+
+    search_method_codes, search_methods = pd.factorize(df_records["search_method"].astype(str))
+    years = pd.to_numeric(df_records["year"], errors="coerce").fillna(-1).to_numpy(dtype=np.int16)
+
+    return SearchIndex(
+        vocabulary=np.asarray(vocabulary, dtype=str),
+        term_offsets=term_offsets.astype(np.int64),
+        postings_doc=(pair_keys % max(n_docs, 1)).astype(np.int32),
+        postings_tf=term_frequencies.astype(np.float32),
+        doc_lengths=doc_lengths.astype(np.float32),
+        years=years,
+        search_method_codes=search_method_codes.astype(np.int16),
+        search_methods=np.asarray(search_methods, dtype=str),
+        source_stat=np.array(source_stat or [0, 0], dtype=np.int64)
+    )
+
+def get_index_path(config: Config, table_name: str) -> Path:
+    return config.processed_data_dir / SEARCH_INDEX_DIRNAME / f"{table_name}.npz"
+
+def save_search_index(search_index: SearchIndex, index_path: Path) -> None:
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = index_path.with_name(f".{index_path.stem}.tmp.npz")
+    np.savez(temp_path, **dataclasses.asdict(search_index))
+    temp_path.replace(index_path)
+
+def load_search_index(config: Config, table_name: str = DEFAULT_TABLE) -> SearchIndex:
+    index_path = get_index_path(config, table_name)
+    source_stat = get_source_stat(get_table_path(config, table_name))
+
+    if index_path.exists():
+        with np.load(index_path) as arrays:
+            search_index = SearchIndex(**{field.name: arrays[field.name] for field in dataclasses.fields(SearchIndex)})
+        if search_index.source_stat.tolist() == source_stat:
+            return search_index
+
+    # 元の表が更新された (または index がない) 場合は作り直して保存
+    search_index = build_search_index(read_records(config, table_name), source_stat)
+    save_search_index(search_index, index_path)
+    return search_index
+
+def score_records(search_index: SearchIndex, query: str = REVIEW_QUERY) -> np.ndarray:
+    scores = np.zeros(search_index.n_docs, dtype=np.float32)
+    if search_index.n_docs == 0:
+        return scores
+
+    query_normalized = normalize_text(pd.Series([query]), MATCH_KEY_NORMALIZATION).iloc[0]
+    average_length = max(float(search_index.doc_lengths.mean()), 1.0)
+    for term in sorted(set(tokenize(query_normalized))):
+        term_id = np.searchsorted(search_index.vocabulary, term)
+        if term_id == len(search_index.vocabulary) or search_index.vocabulary[term_id] != term:
+            continue
+
+        start, end = search_index.term_offsets[term_id], search_index.term_offsets[term_id + 1]
+        docs = search_index.postings_doc[start:end]
+        term_frequencies = search_index.postings_tf[start:end]
+
+        n_matched = end - start
+        idf = np.log(1 + (search_index.n_docs - n_matched + 0.5) / (n_matched + 0.5))
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * search_index.doc_lengths[docs] / average_length)
+        scores[docs] += idf * term_frequencies * (BM25_K1 + 1) / (term_frequencies + length_norm)
+
+    return scores
+
+def filter_records(
+    search_index: SearchIndex,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    search_methods: Optional[List[str]] = None
+) -> np.ndarray:
+    mask = np.ones(search_index.n_docs, dtype=bool)
+    if year_min is not None:
+        mask &= search_index.years >= year_min
+    if year_max is not None:
+        mask &= (search_index.years <= year_max) & (search_index.years != -1)
+    if search_methods is not None:
+        method_codes = np.nonzero(np.isin(search_index.search_methods, search_methods))[0]
+        mask &= np.isin(search_index.search_method_codes, method_codes)
+
+    return mask
+
+def search(
+    search_index: SearchIndex,
+    query: str = REVIEW_QUERY,
+    top_k: Optional[int] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    search_methods: Optional[List[str]] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    scores = score_records(search_index, query)
+    candidates = np.nonzero((scores > 0) & filter_records(search_index, year_min, year_max, search_methods))[0]
+
+    if top_k is not None and top_k < len(candidates):
+        candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+    candidates = candidates[np.lexsort((candidates, -scores[candidates]))] # 同点はレコードの位置順
+
+    return candidates, scores[candidates]
+
+def rank_by_relevance(df_records: pd.DataFrame, search_index: SearchIndex, query: str = REVIEW_QUERY) -> pd.DataFrame:
+    # スコアの高い順 (同点は元の順番) に並べる．df_records は index を作成した表と同じ行の順番
+    order = np.argsort(-score_records(search_index, query), kind="stable")
+
+    return df_records.iloc[order].reset_index(drop=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rank records by BM25 against the review's query terms")
+    parser.add_argument("query", nargs="*", help=f"query terms (default: {REVIEW_QUERY})")
+    parser.add_argument("--table", default=DEFAULT_TABLE)
+    parser.add_argument("--year-min", type=int)
+    parser.add_argument("--year-max", type=int)
+    parser.add_argument("--search-method", action="append", dest="search_methods")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    config = Config()
+    search_index = load_search_index(config, args.table)
+
+    start = time.perf_counter()
+    positions, scores = search(
+        search_index, " ".join(args.query) or REVIEW_QUERY, args.top, args.year_min, args.year_max, args.search_methods
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    df_records = read_records(config, args.table)
+    df_result = df_records.iloc[positions][["authors", "year", "title", "search_method"]]
+    df_result.insert(0, "score", np.round(scores, 3))
+    print(df_result.to_string())
+    print(f"{len(positions)} records were ranked in {elapsed_ms:.1f} ms")
+
+if __name__ == "__main__":
+    main()
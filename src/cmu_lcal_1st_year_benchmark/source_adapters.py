@@ -0,0 +1,283 @@
+import dataclasses
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+import pandas as pd
+from config import Config
+from profiler import profiled
+from record_export import read_table
+from record_schema import OUTPUT_COLUMNS, enforce_schema
+from ris_reader import RIS_COLUMNS, read_ris
+from spreadsheet_reader import read_spreadsheet
+from stage_catalog import SOURCE_FILES
+
+"""
+1. source 名 → adapter (reader, 読み込む列, 列名の対応, 定数列, 派生列) を SOURCE_ADAPTERS に登録
+    - 読み込むファイルは stage_catalog.SOURCE_FILES (pipeline の stage の入力と共有)
+2. load_source で adapter に従い，必要な列のみ読み込み (usecols)
+    - dtype を指定した列は，読み込み時にその型とする (xls / xlsx は spreadsheet_reader で読み込み)
+3. apply_adapter で列名の変更・定数列・派生列をまとめて 1 つの DataFrame として作成
+    - 列は OUTPUT_COLUMNS + adapter の extra_columns (corpus_id 等)
+    - .loc による列の追加や rename を繰り返さないため，中間の DataFrame を作らない
+    - 作成した DataFrame には record_schema の共通スキーマを適用
+4. 新しい source は SOURCE_FILES と SOURCE_ADAPTERS にエントリを追加するだけで良い
+"""
+
+
+def read_csv_source(
+    file_path: Path, usecols: Optional[List[str]], dtype: Optional[Dict[Hashable, Any]] = None
+) -> pd.DataFrame:
+    return pd.read_csv(file_path, usecols=usecols, dtype=dtype)
+
+def read_table_source(
+    file_path: Path, usecols: Optional[List[str]], dtype: Optional[Dict[Hashable, Any]] = None
+) -> pd.DataFrame:
+    return read_table(file_path, usecols) # 各 stage が保存した parquet (まだない場合は csv)，型は保存時のまま
+
+def read_xls_source(
+    file_path: Path, usecols: Optional[List[str]], dtype: Optional[Dict[Hashable, Any]] = None
+) -> pd.DataFrame:
+    return read_spreadsheet(file_path, usecols, dtype)
+
+def read_ris_source(
+    file_path: Path, usecols: Optional[List[str]], dtype: Optional[Dict[Hashable, Any]] = None
+) -> pd.DataFrame:
+    df_result = read_ris(file_path) # read_ris は常に RIS_COLUMNS のみを返す
+
+    if usecols is None:
+        return df_result
+    return df_result[usecols]
+
+@dataclasses.dataclass(frozen=True)
+class SourceAdapter:
+    data_dir: str
+    filename: str
+    reader: Callable[[Path, Optional[List[str]], Optional[Dict[Hashable, Any]]], pd.DataFrame]
+    usecols: Optional[List[str]] = None
+    dtype: Optional[Dict[Hashable, Any]] = None # 読み込み時に指定する列の型
+    column_map: Dict[str, str] = dataclasses.field(default_factory=dict)
+    constant_columns: Dict[str, Any] = dataclasses.field(default_factory=dict)
+    derived_columns: Dict[str, Callable[[pd.DataFrame], pd.Series]] = dataclasses.field(default_factory=dict)
+    dropna_subset: Optional[List[str]] = None # 指定した列が全て NA の行を除去
+    extra_columns: List[str] = dataclasses.field(default_factory=list) # OUTPUT_COLUMNS の後ろにそのまま残す列
+    author_format: str = "comma" # 著者の文字列の形式 (author_index で解析)
+
+def doi_link(df_result: pd.DataFrame) -> pd.Series:
+    return "https://doi.org/" + df_result["doi"]
+
+def semantic_scholar_adapter(source_name: str, search_method: str) -> SourceAdapter:
+    data_dir, filename = SOURCE_FILES[source_name]
+    return SourceAdapter(
+        data_dir=data_dir,
+        filename=filename,
+        reader=read_table_source,
+        usecols=["authors", "year", "title", "abstract", "doi", "corpus_id"],
+        column_map={column: column for column in ["authors", "year", "title", "abstract", "doi"]},
+        constant_columns={"document_type": "", "search_method": search_method},
+        derived_columns={"link": doi_link},
+        dropna_subset=["authors", "year", "title"],
+        extra_columns=["corpus_id"] # record_linkage で Semantic Scholar の id として使用
+    )
+
+def google_scholar_adapter(source_name: str, search_method: str) -> SourceAdapter:
+    data_dir, filename = SOURCE_FILES[source_name]
+    return SourceAdapter(
+        data_dir=data_dir,
+        filename=filename,
+        reader=read_table_source,
+        usecols=["title", "publication_info", "link"],
+        column_map={"title": "title", "link": "link"},
+        constant_columns={"abstract": "", "doi": "", "document_type": "", "search_method": search_method},
+        derived_columns={
+            "authors": lambda df_result: df_result["publication_info"].str.split("-").str[0],
+            "year": lambda df_result: df_result["publication_info"].str.extract(r"([0-9]{4})")[0]
+        }
+    )
+
+def apa_adapter(source_name: str, search_method: str, with_link: bool = True) -> SourceAdapter:
+    data_dir, filename = SOURCE_FILES[source_name]
+    return SourceAdapter(
+        data_dir=data_dir,
+        filename=filename,
+        reader=read_table_source,
+        author_format="apa",
+        usecols=["authors", "year", "title", "doi"],
+        column_map={column: column for column in ["authors", "year", "title", "doi"]},
+        constant_columns={"abstract": "", "document_type": "", "search_method": search_method},
+        derived_columns={"link": doi_link} if with_link else {}
+    )
+
+def proquest_adapter(source_name: str, search_method: str, with_doi: bool = True) -> SourceAdapter:
+    column_map = {
+        "Title": "title",
+        "Abstract": "abstract",
+        "Authors": "authors",
+        "digitalObjectIdentifier": "doi",
+        "documentType": "document_type",
+        "year": "year",
+        "DocumentURL": "link"
+    }
+    constant_columns = {"search_method": search_method}
+    if not with_doi:
+        column_map.pop("digitalObjectIdentifier")
+        constant_columns["doi"] = ""
+
+    data_dir, filename = SOURCE_FILES[source_name]
+    return SourceAdapter(
+        data_dir=data_dir,
+        filename=filename,
+        reader=read_xls_source,
+        author_format="semicolon",
+        usecols=list(column_map.keys()),
+        dtype={column: str for column in column_map if column != "year"},
+        column_map=column_map,
+        constant_columns=constant_columns
+    )
+
+def ebsco_adapter(source_name: str, search_method: str) -> SourceAdapter:
+    data_dir, filename = SOURCE_FILES[source_name]
+    return SourceAdapter(
+        data_dir=data_dir,
+        filename=filename,
+        reader=read_csv_source,
+        author_format="semicolon",
+        usecols=["title", "abstract", "publicationDate", "contributors", "docTypes", "doi", "plink"],
+        column_map={
+            "title": "title",
+            "abstract": "abstract",
+            "contributors": "authors",
+            "docTypes": "document_type",
+            "doi": "doi",
+            "plink": "link"
+        },
+        constant_columns={"search_method": search_method},
+        derived_columns={"year": lambda df_result: df_result["publicationDate"] // 10000}
+    )
+
+def ris_adapter(source_name: str, search_method: str) -> SourceAdapter:
+    data_dir, filename = SOURCE_FILES[source_name]
+    return SourceAdapter(
+        data_dir=data_dir,
+        filename=filename,
+        reader=read_ris_source,
+        author_format="semicolon",
+        usecols=RIS_COLUMNS,
+        column_map={"authors": "authors", "year": "year", "abstract": "abstract", "url": "link"},
+        constant_columns={"search_method": search_method},
+        derived_columns={
+            "title": lambda df_result: df_result["title"].fillna(df_result["primary_title"]),
+            "doi": lambda df_result: df_result["doi"].fillna("").str.removeprefix("https://doi.org/")
+        }
+    )
+
+def scraped_adapter(source_name: str) -> SourceAdapter:
+    # scrape_*.py の出力は既に authors, year, title, abstract, doi, link, search_method を持つ
+    columns = ["authors", "title", "year", "abstract", "doi", "link", "search_method"]
+    data_dir, filename = SOURCE_FILES[source_name]
+    return SourceAdapter(
+        data_dir=data_dir,
+        filename=filename,
+        reader=read_table_source,
+        usecols=columns,
+        column_map={column: column for column in columns}
+    )
+
+def manual_search_method(journal: str) -> str:
+    return f"manual_search[{journal}]"
+
+SOURCE_ADAPTERS: Dict[str, SourceAdapter] = {
+    # db search
+    "ancestry": semantic_scholar_adapter("ancestry", "ancestry"),
+    "forward": semantic_scholar_adapter("forward", "forward"),
+    "google": google_scholar_adapter("google", "google"),
+    "apa": apa_adapter("apa", "apa"),
+    "eric": proquest_adapter("eric", "eric"),
+    "llba": proquest_adapter("llba", "llba"),
+    "proquest": proquest_adapter("proquest", "proquest", with_doi=False),
+    "psycinfo": ebsco_adapter("psycinfo", "psycinfo"),
+
+    # additional db search (there are no doi in additional apa search result)
+    "additional_ancestry": semantic_scholar_adapter("additional_ancestry", "ancestry"),
+    "additional_apa": apa_adapter("additional_apa", "apa", with_link=False),
+
+    # manual search
+    "applied_linguistics": scraped_adapter("applied_linguistics"),
+    "annual_review_of_applied_linguistics": proquest_adapter(
+        "annual_review_of_applied_linguistics", manual_search_method("annual_review_of_applied_linguistics")
+    ),
+    "foreign_language_annals": ris_adapter("foreign_language_annals", manual_search_method("foreign_language_annals")),
+    "international_journal_of_applied_linguistics": ris_adapter(
+        "international_journal_of_applied_linguistics",
+        manual_search_method("international_journal_of_applied_linguistics")
+    ),
+    "language_learning": ris_adapter("language_learning", manual_search_method("language_learning")),
+    "second_language_research": ris_adapter(
+        "second_language_research", manual_search_method("second_language_research")
+    ),
+    "studies_of_second_language_acquisition": proquest_adapter(
+        "studies_of_second_language_acquisition", manual_search_method("studies_of_second_language_acquisition")
+    ),
+    "system": ris_adapter("system", manual_search_method("system")),
+    "journal_of_pragmatics": ris_adapter("journal_of_pragmatics", manual_search_method("journal_of_pragmatics")),
+    "intercultural_pragmatics": scraped_adapter("intercultural_pragmatics"),
+    "east_asian_pragmatics": ebsco_adapter("east_asian_pragmatics", manual_search_method("east_asian_pragmatics")),
+    "japanese_language_and_literature": ris_adapter(
+        "japanese_language_and_literature", manual_search_method("japanese_language_and_literature")
+    ),
+
+    # additional manual search
+    "additional_applied_linguistics": scraped_adapter("additional_applied_linguistics"),
+    "additional_foreign_language_annals": ris_adapter(
+        "additional_foreign_language_annals", manual_search_method("foreign_language_annals")
+    ),
+    "additional_language_learning": ris_adapter(
+        "additional_language_learning", manual_search_method("language_learning")
+    ),
+    "additional_second_language_research": ris_adapter(
+        "additional_second_language_research", manual_search_method("second_language_research")
+    ),
+    "additional_system": ris_adapter("additional_system", manual_search_method("system")),
+    "additional_journal_of_pragmatics": ris_adapter(
+        "additional_journal_of_pragmatics", manual_search_method("journal_of_pragmatics")
+    ),
+    "additional_japanese_language_and_literature": ris_adapter(
+        "additional_japanese_language_and_literature", manual_search_method("japanese_language_and_literature")
+    )
+}
+
+def apply_adapter(df_raw: pd.DataFrame, adapter: SourceAdapter) -> pd.DataFrame:
+    # 1. remove records whose subset columns are all NA
+    if adapter.dropna_subset is not None:
+        df_raw = df_raw.dropna(subset=adapter.dropna_subset, how="all")
+
+    # 2. collect renamed, derived and constant columns
+    columns: Dict[str, Any] = {
+        new_col: df_raw[cur_col] for cur_col, new_col in adapter.column_map.items()
+    }
+    for new_col, expression in adapter.derived_columns.items():
+        columns[new_col] = expression(df_raw)
+    columns.update(adapter.constant_columns)
+
+    # 3. build the output frame at once (columns not provided by the source are NA)
+    output_columns = {column: columns.get(column, np.nan) for column in OUTPUT_COLUMNS}
+    output_columns.update({column: df_raw[column] for column in adapter.extra_columns})
+    df_result_processed = pd.DataFrame(output_columns, index=df_raw.index, copy=False)
+
+    return enforce_schema(df_result_processed)
+
+@profiled
+def load_source(config: Config, source_name: str) -> pd.DataFrame:
+    if source_name not in SOURCE_ADAPTERS:
+        raise KeyError(f"Adapter for {source_name} was not found")
+    adapter = SOURCE_ADAPTERS[source_name]
+
+    file_path: Path = getattr(config, adapter.data_dir) / adapter.filename
+    df_raw = adapter.reader(file_path, adapter.usecols, adapter.dtype)
+
+    return apply_adapter(df_raw, adapter)
+
+def load_sources(config: Config, source_names: List[str]) -> Dict[str, pd.DataFrame]:
+    datasets = {source_name: load_source(config, source_name) for source_name in source_names}
+
+    return datasets
@@ -0,0 +1,109 @@
+import importlib.util
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Literal, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+# python-calamine は任意の依存 (pip install ".[calamine]")
+CALAMINE_AVAILABLE = importlib.util.find_spec("python_calamine") is not None
+
+# get_engine が選ぶ pd.read_excel の engine
+ExcelEngine = Literal["calamine", "xlrd", "openpyxl"]
+
+"""
+xls / xlsx の読み込みを 1 つの関数 (read_spreadsheet) にまとめ，使える中で最も速い engine で読み込む
+
+1. python-calamine (Rust 製) があれば，pandas の calamine engine で xls / xlsx を読み込み
+    - calamine は xlsx の _x0002_ 等のエスケープを制御文字に戻すが，openpyxl はそのまま残す
+    - engine によって結果が変わらないように，制御文字は _xHHHH_ の形に戻す (escape_control_characters)
+2. ない場合は，xls は xlrd，xlsx は openpyxl の read_only モードで 1 行ずつ読み込み (read_xlsx_rows)
+    - 結果は pd.read_excel(engine="openpyxl") と同じ (ヘッダのない列は "Unnamed: <列番号>"，整数の float は int)
+3. usecols (列名のリスト) で必要な列のみを読み込み，dtype で列の型を指定 (str の場合も欠損は NaN のまま)
+"""
+
+
+def get_engine(file_path: Path) -> ExcelEngine:
+    if CALAMINE_AVAILABLE:
+        return "calamine"
+    return "xlrd" if file_path.suffix == ".xls" else "openpyxl"
+
+def escape_control_characters(df_sheet: pd.DataFrame) -> pd.DataFrame:
+    df_sheet = df_sheet.copy()
+    for column in df_sheet.select_dtypes(include="object").columns:
+        mask_escaped = df_sheet[column].map(
+            lambda value: isinstance(value, str) and ILLEGAL_CHARACTERS_RE.search(value) is not None
+        ).astype(bool)
+        if mask_escaped.any():
+            df_sheet.loc[mask_escaped, column] = df_sheet.loc[mask_escaped, column].map(
+                lambda value: ILLEGAL_CHARACTERS_RE.sub(lambda match: f"_x{ord(match.group()):04X}_", value)
+            )
+
+    return df_sheet
+
+def normalize_cell_value(value: Any) -> Any:
+    # pandas の openpyxl engine と同様に，整数の float は int として扱う
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def apply_dtype_hints(df_sheet: pd.DataFrame, dtype: Dict[Hashable, Any]) -> pd.DataFrame:
+    df_sheet = df_sheet.copy()
+    for column, column_dtype in dtype.items():
+        if column not in df_sheet.columns:
+            continue
+        if column_dtype is str: # pd.read_excel(dtype=str) と同様に，欠損は文字列にしない
+            values = df_sheet[column]
+            df_sheet[column] = values.astype(str).astype(object).where(values.notna(), np.nan)
+        else:
+            df_sheet[column] = df_sheet[column].astype(column_dtype)
+
+    return df_sheet
+
+def read_xlsx_rows(file_path: Path, usecols: Optional[List[str]] = None) -> pd.DataFrame:
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        # シート全体を list にせず，1 行ずつ usecols の値のみを取り出す
+        worksheet_rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(worksheet_rows, ())
+        columns = [
+            column if column is not None else f"Unnamed: {column_id}" for column_id, column in enumerate(header)
+        ]
+        column_ids = [column_id for column_id, column in enumerate(columns) if usecols is None or column in usecols]
+
+        records: List[List[Any]] = []
+        n_empty_rows = 0 # 末尾の空行は除くため，値のある行が続くまで追加しない
+        for row in worksheet_rows:
+            if row.count(None) == len(row):
+                n_empty_rows += 1
+                continue
+
+            records.extend([None] * len(column_ids) for _ in range(n_empty_rows))
+            n_empty_rows = 0
+            records.append(
+                [normalize_cell_value(row[column_id]) if column_id < len(row) else None for column_id in column_ids]
+            )
+    finally:
+        workbook.close() # read_only モードではファイルを開いたままになるため
+
+    df_sheet = pd.DataFrame.from_records(
+        records, columns=[columns[column_id] for column_id in column_ids]
+    ).infer_objects()
+
+    return df_sheet.where(df_sheet.notna(), np.nan) # 空のセルは None ではなく NaN
+
+def read_spreadsheet(
+    file_path: Path, usecols: Optional[List[str]] = None, dtype: Optional[Dict[Hashable, Any]] = None
+) -> pd.DataFrame:
+    engine = get_engine(file_path)
+
+    if engine == "openpyxl":
+        df_sheet = read_xlsx_rows(file_path, usecols)
+    else:
+        df_sheet = pd.read_excel(file_path, engine=engine, usecols=usecols)
+        if engine == "calamine":
+            df_sheet = escape_control_characters(df_sheet)
+
+    return apply_dtype_hints(df_sheet, dtype or {})
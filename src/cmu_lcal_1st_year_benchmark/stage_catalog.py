@@ -0,0 +1,167 @@
+import dataclasses
+from typing import Dict, List, Tuple
+
+"""
+stage のスクリプトと pipeline で共有する名前 (source とそのファイル，表，判定のワークブック，検索ラウンド) の一覧
+
+1. pipeline (pipeline_stages) は stage の入出力の宣言にこのモジュールのみを使い，stage のスクリプトは subprocess で実行
+    - pipeline の起動時に pandas / pyarrow / openpyxl を import しないよう，標準ライブラリ以外は import しない
+2. 各スクリプト (source_adapters, summarize_db_result, decision_store 等) は，ここから名前を import して使う
+3. stage の宣言 (pipeline_stages.STAGES) はここに置かない
+    - artifact_store は stage が import するモジュールのコードもキーに含めるため
+    - 宣言を変更しただけで，全ての stage が古くならないように
+"""
+
+
+# (Config の dir 名, dir からの相対パス)
+PathSpec = Tuple[str, str]
+
+# source 名 → 読み込むファイル (source_adapters の adapter と pipeline の stage の入力で共有)
+SOURCE_FILES: Dict[str, PathSpec] = {
+    # db search
+    "ancestry": ("processed_data_dir", "ancestry_search_result.parquet"),
+    "forward": ("processed_data_dir", "forward_search_result.parquet"),
+    "google": ("processed_data_dir", "google_scholar_result.parquet"),
+    "apa": ("processed_data_dir", "apa_ancestry_search_result.parquet"),
+    "eric": ("external_data_dir", "ERIC_result.xls"),
+    "llba": ("external_data_dir", "LLBA_result.xls"),
+    "proquest": ("external_data_dir", "ProQuest_D&T_result.xls"),
+    "psycinfo": ("external_data_dir", "PsycINFO_result.csv"),
+
+    # additional db search
+    "additional_ancestry": ("processed_data_dir", "additional_ancestry_search_result.parquet"),
+    "additional_apa": ("processed_data_dir", "additional_apa_ancestry_search_result.parquet"),
+
+    # manual search
+    "applied_linguistics": ("processed_data_dir", "applied_linguistics_manual_search_result.parquet"),
+    "annual_review_of_applied_linguistics": ("external_data_dir", "annual_review_of_applied_linguistics.xls"),
+    "foreign_language_annals": ("external_data_dir", "foreign_language_annals.txt"),
+    "international_journal_of_applied_linguistics": (
+        "external_data_dir", "international_journal_of_applied_linguistics.txt"
+    ),
+    "language_learning": ("external_data_dir", "language_learning.txt"),
+    "second_language_research": ("external_data_dir", "second_language_research.txt"),
+    "studies_of_second_language_acquisition": ("external_data_dir", "studies_of_second_language_acquisition.xls"),
+    "system": ("external_data_dir", "system.txt"),
+    "journal_of_pragmatics": ("external_data_dir", "journal_of_pragmatics.ris"),
+    "intercultural_pragmatics": ("processed_data_dir", "intercultural_pragmatics_manual_search_result.parquet"),
+    "east_asian_pragmatics": ("external_data_dir", "east_asian_pragmatics.csv"),
+    "japanese_language_and_literature": ("external_data_dir", "japanese_language_and_literature.txt"),
+
+    # additional manual search
+    "additional_applied_linguistics": (
+        "processed_data_dir", "additional_applied_linguistics_manual_search_result.parquet"
+    ),
+    "additional_foreign_language_annals": ("external_data_dir", "foreign_language_annals_additional.txt"),
+    "additional_language_learning": ("external_data_dir", "language_learning_additional.txt"),
+    "additional_second_language_research": ("external_data_dir", "second_language_research_additional.ris"),
+    "additional_system": ("external_data_dir", "system_additional.ris"),
+    "additional_journal_of_pragmatics": ("external_data_dir", "journal_of_pragmatics_additional.ris"),
+    "additional_japanese_language_and_literature": (
+        "external_data_dir", "japanese_language_and_literature_additional.ris"
+    )
+}
+
+# summarize_db_result
+DB_SEARCH_SOURCES = ["ancestry", "forward", "google", "apa", "eric", "llba", "proquest", "psycinfo"]
+SEARCH_METHOD_PRIORITY = {
+    "llba": 0,
+    "eric": 1,
+    "psycinfo": 2,
+    "proquest": 3,
+    "ancestry": 4,
+    "forward": 5,
+    "apa": 6,
+    "google": 7
+}
+
+# re_organize_db_result_for_manual_dup_remove
+ADDITIONAL_DB_SEARCH_SOURCES = ["additional_ancestry", "additional_apa"]
+
+# mearge_manual_search_results
+MANUAL_SEARCH_SOURCES = [
+    "applied_linguistics",
+    "annual_review_of_applied_linguistics",
+    "foreign_language_annals",
+    "international_journal_of_applied_linguistics",
+    "language_learning",
+    "second_language_research",
+    "studies_of_second_language_acquisition",
+    "system",
+    "journal_of_pragmatics",
+    "intercultural_pragmatics",
+    "east_asian_pragmatics",
+    "japanese_language_and_literature"
+]
+
+# re_mearge_manual_search_results
+ADDITIONAL_MANUAL_SEARCH_SOURCES = [
+    "additional_applied_linguistics",
+    "annual_review_of_applied_linguistics",
+    "additional_foreign_language_annals",
+    "additional_language_learning",
+    "additional_second_language_research",
+    "additional_system",
+    "additional_journal_of_pragmatics",
+    "additional_japanese_language_and_literature"
+]
+
+# 各 stage が parquet で保存する表 (processed/<名前>.parquet)
+RECORD_TABLES = [
+    "ancestry_search_result",
+    "forward_search_result",
+    "google_scholar_result",
+    "apa_ancestry_search_result",
+    "applied_linguistics_manual_search_result",
+    "intercultural_pragmatics_manual_search_result",
+    "db_search_merged_unique",
+    "db_search_records",
+    "manual_search_merged_unique",
+    "db_manual_search_records",
+    "additional_ancestry_search_result",
+    "additional_apa_ancestry_search_result",
+    "additional_applied_linguistics_manual_search_result",
+    "additional_db_search_records",
+    "additional_manual_search_merged_unique",
+    "additional_db_manual_search_records",
+    "db_search_linked"
+]
+EXPORT_FORMATS = ["csv", "xlsx"]
+
+# decision_store
+DECISION_STORE_FILENAME = "decision_store.parquet"
+# 人手の判定が記録されたワークブック (external) → 判定の列
+DECISION_WORKBOOKS: Dict[str, str] = {
+    "db_search_records_manual_dup_remove.xlsx": "is_duplicated",
+    "additional_db_search_records_manual_dup_remove.xlsx": "is_duplicated",
+    "title_abstract_screening.xlsx": "is_eligible",
+    "title_abstract_screening_additional.xlsx": "is_eligible"
+}
+
+# fingerprint_index
+FINGERPRINT_INDEX_DIRNAME = "fingerprint_index"
+FIRST_ROUND = "first"
+ADDITIONAL_ROUND = "additional"
+SEARCH_ROUNDS: List[str] = [FIRST_ROUND, ADDITIONAL_ROUND] # 検索ラウンドの順番
+
+
+@dataclasses.dataclass(frozen=True)
+class ScreeningWorkbook:
+    filename: str
+    table_name: str # record_export で保存した元の表
+    decision: str
+    extra_columns: List[str] = dataclasses.field(default_factory=list) # 判定の列の後ろに追加する空の列
+
+SCREENING_WORKBOOKS: List[ScreeningWorkbook] = [
+    ScreeningWorkbook("db_search_records_manual_dup_remove.xlsx", "db_search_records", "is_duplicated"),
+    ScreeningWorkbook(
+        "additional_db_search_records_manual_dup_remove.xlsx", "additional_db_search_records", "is_duplicated"
+    ),
+    ScreeningWorkbook("title_abstract_screening.xlsx", "db_manual_search_records", "is_eligible", ["Downloaded"]),
+    ScreeningWorkbook(
+        "title_abstract_screening_additional.xlsx",
+        "additional_db_manual_search_records",
+        "is_eligible",
+        ["Downloaded"]
+    )
+]
@@ -0,0 +1,408 @@
+import argparse
+import dataclasses
+import json
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from config import Config
+from openpyxl import Workbook  # type: ignore
+
+SEED = 0
+DUPLICATE_RATE = 0.1 # 複数の source に出現する文献の割合 (の目安)
+DOI_MISSING_RATE = 0.25
+N_SENTENCES = 2000
+
+# 現在のコーパスの source ごとのレコード数 (scale = 1)
+BASE_RECORDS: Dict[str, int] = {
+    "eric": 7,
+    "llba": 266,
+    "proquest": 466,
+    "psycinfo": 2,
+    "journal_of_pragmatics": 72,
+    "applied_linguistics": 228,
+    "intercultural_pragmatics": 100,
+    "apa": 69,
+    "ancestry": 239,
+    "forward": 1226,
+    "google": 255
+}
+PROQUEST_DATABASES = {"eric": ("ERIC_result.xlsx", "ERIC"), "llba": ("LLBA_result.xlsx", "LLBA"),
+                      "proquest": ("ProQuest_D&T_result.xlsx", "ProQuest Dissertations & Theses Global")}
+PROQUEST_COLUMNS = [
+    "Title", "Abstract", "StoreId", "AccessionNumber", "ArticleType", "Authors", "contractNumber",
+    "digitalObjectIdentifier", "documentType", "entryDate", "isbn", "issn", "issue", "language", "languageOfSummary",
+    "pages", "pubdate", "pubtitle", "publicationType", "year", "publisher", "sourceAttrib", "volume", "DocumentURL",
+    "identifierKeywords", "startPage", "subjectTerms", "subjects", "FindACopy", "Database"
+]
+EBSCO_COLUMNS = [
+    "longDBName", "shortDBName", "an", "title", "abstract", "publicationDate", "contributors", "docTypes", "pubTypes",
+    "coverDate", "peerReviewed", "source", "subjects", "isiType", "doids", "isbns", "issns", "publisherLocations",
+    "identifiers", "isOpenAccess", "bookEdition", "language", "publisher", "pageEnd", "pageStart", "pageCount",
+    "volume", "issue", "doi", "notes", "mid", "degreeLevel", "plink"
+]
+OXFORD_RECORDS_PER_PAGE = 20
+DE_GRUYTER_RECORDS_PER_PAGE = 50
+SERPAPI_RECORDS_PER_PAGE = 20
+SERPAPI_QUERY = "pragmatics AND (L2 Japanese) AND (instruction OR teaching)"
+
+WORDS = [
+    "pragmatic", "pragmatics", "competence", "instruction", "explicit", "implicit", "learners", "Japanese",
+    "second", "language", "foreign", "acquisition", "development", "request", "requests", "refusal", "apology",
+    "speech", "act", "acts", "politeness", "honorifics", "study", "abroad", "classroom", "teaching", "effects",
+    "awareness", "metapragmatic", "discourse", "interaction", "conversation", "analysis", "corpus", "learner",
+    "proficiency", "fluency", "comprehension", "production", "implicature", "routines", "formulaic", "sequences",
+    "intercultural", "interlanguage", "sociopragmatic", "pragmalinguistic", "feedback", "task", "based", "role",
+    "play", "elicitation", "longitudinal", "experimental", "meta", "analysis", "review", "EFL", "ESL", "JFL", "L2",
+    "English", "Korean", "Chinese", "Spanish", "speakers", "native", "nonnative", "heritage", "online", "video",
+    "assessment", "rating", "perception", "stance", "epistemic", "evaluation", "identity", "context", "university",
+    "students", "teachers", "textbooks", "materials", "input", "output", "noticing", "attention", "practice"
+]
+FUNCTION_WORDS = ["of", "in", "on", "and", "the", "for", "by", "with", "through", "among", "to", "a"]
+GIVEN_NAMES = [
+    "Naoko", "Yumiko", "Kenneth", "Nicola", "Maria", "Ju-Yeon", "Kaoru", "Yasuhiro", "Erika", "Ryoko", "Sachiko",
+    "Noriko", "Gabriele", "Carsten", "Soo Jung", "Eva", "Andrew", "Hiroko", "Takako", "Minako", "Junko", "Satomi",
+    "Haruko", "Kathleen", "Shinichi", "Wei", "Li", "Julie", "Marta", "Jin", "Tomoko", "Kazuya", "Aya", "Daniel"
+]
+SURNAMES = [
+    "Taguchi", "Tateyama", "Fordyce", "Halenko", "Economidou-Kogetsidis", "Ryu", "Horie", "Shirai", "Marcet",
+    "Sasamoto", "Kiyama", "Ishihara", "Kasper", "Roever", "Youn", "Alcón-Soler", "Cohen", "Cook", "Yoshimi",
+    "Kinginger", "Iwasaki", "Ohta", "Yabuuchi", "Siegal", "Li", "Wang", "Plonsky", "Zhuang", "Jeon", "Kaya",
+    "Takahashi", "Matsumura", "Nguyen", "Bardovi-Harlig", "Mori", "Hasegawa", "Shively", "Félix-Brasdefer"
+]
+JOURNALS = [
+    ("Journal of Pragmatics", "pragma"), ("Applied Linguistics", "applin"), ("Language Learning", "lang"),
+    ("Intercultural Pragmatics", "ip"), ("System", "system"), ("Foreign Language Annals", "flan"),
+    ("Second Language Research", "slr"), ("Studies in Second Language Acquisition", "sla"),
+    ("Japanese Language and Literature", "jll"), ("Language Learning Journal", "llj")
+]
+
+"""
+各 stage の benchmark 用に，現在のコーパスと同じ形式の入力ファイルを任意の規模で生成する
+
+1. 文献 (著者, 出版年, タイトル, アブストラクト, doi, 雑誌, 巻号, ページ) の pool を生成 (generate_works)
+    - 単語・文の pool からランダムに作成し，seed を固定して再現可能にする
+    - pool は全 source のレコード数の (1 - DUPLICATE_RATE) 倍程度とし，source 間で同じ文献が重複するようにする
+2. source ごとに BASE_RECORDS × scale 件の文献を pool から取り出し，各 source の形式で書き出す
+    - ERIC/LLBA/ProQuest ... ProQuest の列構成の xlsx (xlwt がないため .xls ではなく .xlsx)
+    - PsycINFO ... EBSCO の列構成の csv
+    - Journal of Pragmatics ... RIS
+    - Applied Linguistics / Intercultural Pragmatics ... Oxford Academic / De Gruyter の検索結果 HTML
+    - APA ... APA 形式の参考文献の tsv
+    - ancestry / forward ... Semantic Scholar の get_paper の結果 (json)
+    - google ... SerpApi の Google Scholar の結果 (json, ページごと)
+3. 元のコーパスと同じ dir 構成 (raw/processed/external) に書き出し，その dir を指す Config を返す
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class SyntheticWork:
+    authors: List[Tuple[str, str]] # (given, surname)
+    year: int
+    title: str
+    abstract: str
+    doi: str # doi がない文献は ""
+    journal: str
+    volume: int
+    issue: int
+    start_page: int
+    end_page: int
+    serial: int
+
+def format_given_surname(authors: List[Tuple[str, str]]) -> List[str]:
+    return [f"{given} {surname}" for given, surname in authors]
+
+def format_surname_given(authors: List[Tuple[str, str]]) -> List[str]:
+    return [f"{surname}, {given}" for given, surname in authors]
+
+def format_apa_authors(authors: List[Tuple[str, str]]) -> str:
+    names = [f"{surname}, {given[0]}." for given, surname in authors]
+    if len(names) == 1:
+        return names[0]
+    return ", ".join(names[:-1]) + ", & " + names[-1]
+
+def generate_title(rng: np.random.Generator) -> str:
+    n_words = int(rng.integers(5, 14))
+    words = [WORDS[i] if rng.random() > 0.25 else FUNCTION_WORDS[i % len(FUNCTION_WORDS)]
+             for i in rng.integers(0, len(WORDS), n_words)]
+
+    title = " ".join(words)
+    if rng.random() < 0.3: # サブタイトル付きのタイトル
+        title = f"{title}: {' '.join(WORDS[i] for i in rng.integers(0, len(WORDS), int(rng.integers(3, 7))))}"
+    return title[0].upper() + title[1:]
+
+def generate_works(rng: np.random.Generator, n_works: int) -> pd.DataFrame:
+    sentences = [
+        " ".join(WORDS[i] for i in rng.integers(0, len(WORDS), int(rng.integers(8, 25)))).capitalize() + "."
+        for _ in range(N_SENTENCES)
+    ]
+
+    works = []
+    for serial in range(n_works):
+        n_authors = int(rng.integers(1, 5))
+        journal, journal_code = JOURNALS[int(rng.integers(0, len(JOURNALS)))]
+        year = int(max(1970, 2024 - rng.geometric(0.08))) # 最近の文献ほど多い
+        start_page = int(rng.integers(1, 900))
+
+        works.append({
+            "authors": [(GIVEN_NAMES[int(rng.integers(0, len(GIVEN_NAMES)))],
+                         SURNAMES[int(rng.integers(0, len(SURNAMES)))]) for _ in range(n_authors)],
+            "year": year,
+            "title": generate_title(rng),
+            "abstract": " ".join(sentences[i] for i in rng.integers(0, N_SENTENCES, int(rng.integers(4, 10)))),
+            "doi": "" if rng.random() < DOI_MISSING_RATE else f"10.{int(rng.integers(1000, 9999))}/"
+                                                               f"{journal_code}.{year}.{serial:06d}",
+            "journal": journal,
+            "volume": int(rng.integers(1, 80)),
+            "issue": int(rng.integers(1, 6)),
+            "start_page": start_page,
+            "end_page": start_page + int(rng.integers(5, 40)),
+            "serial": serial
+        })
+
+    return pd.DataFrame(works)
+
+def sample_works(rng: np.random.Generator, df_works: pd.DataFrame, n_records: int) -> pd.DataFrame:
+    idx = rng.choice(len(df_works), size=min(n_records, len(df_works)), replace=False)
+    return df_works.iloc[np.sort(idx)].reset_index(drop=True)
+
+def iter_works(df_works: pd.DataFrame) -> Iterator[SyntheticWork]:
+    # 列は generate_works で作成した順 (SyntheticWork のフィールドと同じ)
+    for values in df_works.itertuples(index=False, name=None):
+        yield SyntheticWork(*values)
+
+def write_proquest_xlsx(df_works: pd.DataFrame, file_path: Path, database: str) -> None:
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(PROQUEST_COLUMNS)
+
+    for work in iter_works(df_works):
+        store_id = 2_000_000_000 + work.serial
+        row = {
+            "Title": work.title,
+            "Abstract": work.abstract,
+            "StoreId": store_id,
+            "AccessionNumber": f" EJ{work.serial:07d}",
+            "ArticleType": "Scholarly Journals",
+            "Authors": ";".join(format_surname_given(work.authors)),
+            "digitalObjectIdentifier": work.doi or None,
+            "documentType": " Article , Report",
+            "entryDate": f" {work.year}",
+            "issue": float(work.issue),
+            "language": " English",
+            "pages": f" {work.start_page}-{work.end_page}",
+            "pubdate": str(work.year),
+            "pubtitle": work.journal,
+            "publicationType": " Scholarly Journals",
+            "year": work.year,
+            "volume": float(work.volume),
+            "DocumentURL": f"https://www.proquest.com/scholarly-journals/docview/{store_id}/se-2?accountid=9902",
+            "startPage": work.start_page,
+            "Database": database
+        }
+        worksheet.append([row.get(column) for column in PROQUEST_COLUMNS])
+
+    workbook.save(file_path)
+
+def write_ebsco_csv(df_works: pd.DataFrame, file_path: Path) -> None:
+    df_ebsco = pd.DataFrame({
+        "longDBName": "APA PsycInfo",
+        "shortDBName": "psyh",
+        "an": [f"{work.year}-{work.serial:05d}-001" for work in iter_works(df_works)],
+        "title": df_works["title"] + ".",
+        "abstract": df_works["abstract"],
+        "publicationDate": df_works["year"] * 10000 + 101,
+        "contributors": [" ; ".join(format_surname_given(authors)) for authors in df_works["authors"]],
+        "docTypes": "Journal Article",
+        "coverDate": df_works["year"].astype(str),
+        "source": df_works["journal"],
+        "volume": df_works["volume"],
+        "issue": df_works["issue"],
+        "pageStart": df_works["start_page"],
+        "pageEnd": df_works["end_page"],
+        "doi": df_works["doi"].replace("", None),
+        "plink": [f"https://research.ebsco.com/linkprocessor/plink?id={work.serial:08d}"
+                  for work in iter_works(df_works)]
+    }, columns=EBSCO_COLUMNS)
+
+    df_ebsco.to_csv(file_path, index=False)
+
+def write_ris(df_works: pd.DataFrame, file_path: Path) -> None:
+    with open(file_path, "w", encoding="utf-8") as f:
+        for work in iter_works(df_works):
+            lines = ["TY  - JOUR"] + [f"AU  - {author}" for author in format_surname_given(work.authors)]
+            lines += [f"TI  - {work.title}", f"JO  - {work.journal}", f"VL  - {work.volume}", f"IS  - {work.issue}"]
+            if work.doi:
+                lines += [f"UR  - https://doi.org/{work.doi}", f"DO  - https://doi.org/{work.doi}"]
+            lines += [f"SP  - {work.start_page}", f"EP  - {work.end_page}", f"PY  - {work.year}"]
+            lines += [f"AB  - {work.abstract}", "ER  - ", ""]
+            f.write("\n".join(lines) + "\n")
+
+def render_oxford_record(work: SyntheticWork) -> str:
+    doi = work.doi or f"10.1093/applin/syn{work.serial:06d}" # Oxford Academic の結果には必ず doi がある
+    return f"""<div class="sr-list al-article-box al-normal clearfix">
+<div class="sri-wrap al-date clearfix">
+<div class="sri-type article-type-display-name at-result-type-label">Journal Article</div>
+</div>
+<h4 class="sri-title customLink al-title at-sr-item-title-link">
+<a class="article-link at-sr-article-title-link" href="/applij/article/{work.volume}/{work.issue}/{work.start_page}">
+<span class="access-title">{work.title}</span><span class="get-access at-get-access">Get access</span></a>
+</h4>
+<div class="sri-authors al-authors-list">{", ".join(format_given_surname(work.authors))}</div>
+<div class="al-citation-list">
+<span><em>Applied Linguistics</em>, Volume {work.volume}, Issue {work.issue}, {work.year}, \
+Pages {work.start_page}–{work.end_page}, <a href="https://doi.org/{doi}">https://doi.org/{doi}</a></span>
+</div>
+<div class="sri-date al-pub-date"><strong>Published:</strong> 22 January {work.year}</div>
+<div class="snippet">
+            ...{work.abstract[:300]}...
+        </div>
+</div>
+"""
+
+def render_de_gruyter_record(work: SyntheticWork) -> str:
+    doi = work.doi or f"10.1515/ip-{work.year}-{work.serial:06d}"
+    authors = ", \n                 ".join(format_given_surname(work.authors))
+    return f"""<div class="searchResult d-flex py-3" id="main-content">
+<div class="searchResultContent w-100">
+<div class="resultTitle">
+<div>
+<span class="newResultType ps-2 borderResultType mx-1">Article</span>
+<span class="newResultType ps-2 borderResultType"><span class="pubDate">August 16, {work.year}</span> </span>
+</div>
+<a class="d-block linkHoverDark" href="/document/doi/{doi}/html">
+<h3 class="titleSearchPageResult mb-0">
+        {work.title}
+</h3>
+</a>
+</div>
+<div class="resultMetadata">
+<span class="contributors suggested-products__tertiary-author-info me-2">
+                 {authors}
+        </span>
+</div>
+<div class="snippets snippetsContent three-line-ellipsis my-2">
+<span class="snippet">{work.abstract[:300]}</span>
+</div>
+<div class="searchResultActions d-flex flex-wrap mt-2 pt-1">
+<a class="downloadPdf btn btn-main-content me-2" data-doi="{doi}" href="/document/doi/{doi}/pdf">
+<span class="">Download PDF</span>
+</a>
+</div>
+</div>
+</div>
+"""
+
+def write_html_pages(
+    df_works: pd.DataFrame, output_dir: Path, records_per_page: int, render_record: Callable[[SyntheticWork], str]
+) -> int:
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    n_pages = 0
+    for n_pages, start in enumerate(range(0, len(df_works), records_per_page), start=1):
+        records = "".join(render_record(work) for work in iter_works(df_works.iloc[start:start + records_per_page]))
+        html = f"<html><head><title>Search results</title></head><body>\n{records}</body></html>\n"
+        (output_dir / f"page_{n_pages}.html").write_text(html)
+
+    return n_pages
+
+def write_apa_tsv(df_works: pd.DataFrame, file_path: Path) -> None:
+    with open(file_path, "w", encoding="utf-8") as f:
+        for work in iter_works(df_works):
+            reference = f"{format_apa_authors(work.authors)} ({work.year}). {work.title}. {work.journal}, " \
+                        f"{work.volume}({work.issue}), {work.start_page}-{work.end_page}."
+            if work.doi:
+                reference += f" https://doi.org/{work.doi}"
+            f.write(reference + "\n")
+
+def write_semantic_scholar_json(df_works: pd.DataFrame, file_path: Path) -> None:
+    papers = {}
+    for work in iter_works(df_works):
+        external_ids: Dict[str, Union[int, str]] = {"CorpusId": 100_000_000 + work.serial}
+        if work.doi:
+            external_ids["DOI"] = work.doi
+
+        papers[f"CorpusId:{100_000_000 + work.serial}"] = {
+            "authors": [{"authorId": None, "name": name} for name in format_given_surname(work.authors)],
+            "year": work.year,
+            "title": work.title,
+            "abstract": work.abstract,
+            "externalIds": external_ids
+        }
+
+    file_path.write_text(json.dumps(papers))
+
+def write_serpapi_json(df_works: pd.DataFrame, output_dir: Path) -> None:
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    for offset in range(0, len(df_works), SERPAPI_RECORDS_PER_PAGE):
+        organic_results = []
+        for position, work in enumerate(iter_works(df_works.iloc[offset:offset + SERPAPI_RECORDS_PER_PAGE])):
+            authors = ", ".join(f"{given[0]} {surname}" for given, surname in work.authors)
+            organic_results.append({
+                "position": position + 1,
+                "title": work.title,
+                "result_id": f"{work.serial:012d}",
+                "link": f"https://example.org/articles/{work.serial}",
+                "snippet": work.abstract[:200],
+                "publication_info": {"summary": f"{authors} - {work.journal}, {work.year} - example.org"}
+            })
+
+        result = {
+            "search_information": {"total_results": len(df_works), "query_displayed": SERPAPI_QUERY},
+            "organic_results": organic_results
+        }
+        (output_dir / f"{SERPAPI_QUERY}_{offset}.json").write_text(json.dumps(result, ensure_ascii=False))
+
+def get_synthetic_config(root: Path) -> Config:
+    return Config(
+        raw_data_dir=root / "raw",
+        processed_data_dir=root / "processed",
+        external_data_dir=root / "external",
+        env_dir=root / "environment"
+    )
+
+def generate_corpus(root: Path, scale: float, seed: int = SEED) -> Dict[str, int]:
+    config = get_synthetic_config(root)
+    for data_dir in [config.raw_data_dir, config.processed_data_dir, config.external_data_dir]:
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    n_records = {source: max(1, round(n_base * scale)) for source, n_base in BASE_RECORDS.items()}
+    n_works = max(max(n_records.values()), round(sum(n_records.values()) * (1 - DUPLICATE_RATE)))
+    df_works = generate_works(rng, n_works)
+
+    sources = {source: sample_works(rng, df_works, n) for source, n in n_records.items()}
+
+    for source, (filename, database) in PROQUEST_DATABASES.items():
+        write_proquest_xlsx(sources[source], config.external_data_dir / filename, database)
+    write_ebsco_csv(sources["psycinfo"], config.external_data_dir / "PsycINFO_result.csv")
+    write_ris(sources["journal_of_pragmatics"], config.external_data_dir / "journal_of_pragmatics.ris")
+    write_html_pages(
+        sources["applied_linguistics"], config.external_data_dir / "applied_linguistics",
+        OXFORD_RECORDS_PER_PAGE, render_oxford_record
+    )
+    write_html_pages(
+        sources["intercultural_pragmatics"], config.external_data_dir / "intercultural_pragmatics",
+        DE_GRUYTER_RECORDS_PER_PAGE, render_de_gruyter_record
+    )
+    write_apa_tsv(sources["apa"], config.external_data_dir / "plonsky_zhuang.tsv")
+    write_semantic_scholar_json(sources["ancestry"], config.raw_data_dir / "ancestry_semantic_scholar.json")
+    write_semantic_scholar_json(sources["forward"], config.raw_data_dir / "forward_semantic_scholar.json")
+    write_serpapi_json(sources["google"], config.raw_data_dir / "google_search_bkup")
+
+    return {source: len(df_source) for source, df_source in sources.items()}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus in the layouts of the real inputs")
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier of the current corpus size")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+
+    n_records = generate_corpus(args.output_dir, args.scale, args.seed)
+    print(f"{sum(n_records.values())} synthetic records were generated in {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
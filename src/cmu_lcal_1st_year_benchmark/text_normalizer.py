@@ -0,0 +1,74 @@
+import dataclasses
+import html
+from typing import Dict, Literal, Optional
+
+import pandas as pd
+from record_schema import TEXT_DTYPE
+
+# pyarrow の正規表現 (RE2) でそのまま実行できるように，compile せずに文字列で指定
+# RE2 の \s は ASCII の空白のみのため，python の \s が含む unicode の空白 (\xa0, \u3000 等) も列挙
+OTHER_WHITESPACE_CHARACTERS = "\\t\\n\\r\\f\\v\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000"
+# 1 つの " " には一致させない (全ての空白を置換すると，文字列が長い抄録では数倍遅くなる)
+WHITESPACE_PATTERN = f"[ {OTHER_WHITESPACE_CHARACTERS}]{{2,}}|[{OTHER_WHITESPACE_CHARACTERS}]"
+HTML_ENTITY_PATTERN = r"&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);"
+QUOTE_PATTERN = "\""
+
+"""
+スクレイピング・merge で使う文字列の正規化を，Series 全体に対してまとめて行う
+
+1. TextNormalization に行う処理を指定し，normalize_text で Series 全体に適用
+    - unicode の正規化 (NFC) → HTML の実体参照 (&amp; 等) の復元 → 二重引用符 (") の除去 → 空白の統一 → casefold の順
+    - 空白の統一は，改行・タブ・連続した空白を 1 つの空白にして前後の空白を除く (while で置換を繰り返さない)
+    - 正規表現は pyarrow の compute で行単位のループなしに実行し，実体参照の復元は & を含む行のみ行う
+    - 欠損は欠損のまま返す
+2. 用途ごとの設定
+    - TEXT_NORMALIZATION ... 著者・タイトル・抄録
+    - UNQUOTED_TEXT_NORMALIZATION ... 二重引用符で囲まれた著者・タイトル (De Gruyter)
+    - MATCH_KEY_NORMALIZATION ... 照合用のキー (casefold したタイトル等)
+3. normalize_columns で DataFrame の列ごとに設定を指定して適用 (各 scraper の TEXT_NORMALIZATIONS)
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class TextNormalization:
+    unicode_form: Optional[Literal["NFC", "NFKC", "NFD", "NFKD"]] = "NFC"
+    unescape_html: bool = True
+    strip_quotes: bool = False
+    collapse_whitespace: bool = True
+    casefold: bool = False
+
+TEXT_NORMALIZATION = TextNormalization()
+UNQUOTED_TEXT_NORMALIZATION = TextNormalization(strip_quotes=True)
+MATCH_KEY_NORMALIZATION = TextNormalization(casefold=True)
+
+def unescape_html_entities(text: pd.Series) -> pd.Series:
+    mask_entity = text.str.contains(HTML_ENTITY_PATTERN).fillna(False).to_numpy(dtype=bool)
+    if not mask_entity.any():
+        return text
+
+    text = text.copy()
+    text[mask_entity] = text[mask_entity].map(html.unescape)
+    return text
+
+def normalize_text(text: pd.Series, normalization: TextNormalization = TEXT_NORMALIZATION) -> pd.Series:
+    text_normalized = text.astype(TEXT_DTYPE)
+
+    if normalization.unicode_form is not None:
+        text_normalized = text_normalized.str.normalize(normalization.unicode_form)
+    if normalization.unescape_html:
+        text_normalized = unescape_html_entities(text_normalized)
+    if normalization.strip_quotes:
+        text_normalized = text_normalized.str.replace(QUOTE_PATTERN, "", regex=True)
+    if normalization.collapse_whitespace:
+        text_normalized = text_normalized.str.replace(WHITESPACE_PATTERN, " ", regex=True).str.strip()
+    if normalization.casefold:
+        text_normalized = text_normalized.str.casefold()
+
+    return text_normalized
+
+def normalize_columns(df_records: pd.DataFrame, normalizations: Dict[str, TextNormalization]) -> pd.DataFrame:
+    df_records = df_records.copy()
+    for column, normalization in normalizations.items():
+        df_records[column] = normalize_text(df_records[column], normalization)
+
+    return df_records
@@ -0,0 +1,52 @@
+import json
+import os
+import resource
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+TRACE_DIR_ENV = "PIPELINE_TRACE_DIR"
+
+"""
+profiler の trace event を書き出す部分のうち，標準ライブラリのみで動くもの
+
+1. pipeline は起動時に pandas を import しないため，profiler ではなくこのモジュールから stage を計測
+2. run_profiled_command で stage を子プロセスとして実行し，wall time, CPU time, peak RSS を記録
+    - 子プロセスには PIPELINE_TRACE_DIR を渡し，@profiled を付けた関数の span も同じ dir に書き出させる
+    - 子プロセスの CPU time と peak RSS は os.wait4 の rusage から取得
+3. trace.json と summary.csv へのまとめは profiler (python profiler.py <trace dir>) で行う
+"""
+
+
+def get_peak_rss_mb(usage: Optional[resource.struct_rusage] = None) -> float:
+    usage = usage or resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_maxrss / 1024 # Linux では KB 単位
+
+def write_events(trace_dir: Path, events: List[Dict[str, Any]]) -> None:
+    trace_dir.mkdir(parents=True, exist_ok=True)
+    events_path = trace_dir / f"events_{os.getpid()}_{time.time_ns()}.json"
+    events_path.write_text(json.dumps(events))
+
+def run_profiled_command(command: List[str], cwd: Path, name: str, trace_dir: Path) -> None:
+    env = dict(os.environ, **{TRACE_DIR_ENV: str(trace_dir)})
+
+    start_us = time.time_ns() // 1000
+    start_wall = time.perf_counter()
+    process = subprocess.Popen(command, cwd=cwd, env=env)
+    _, status, usage = os.wait4(process.pid, 0) # 子プロセスのみの rusage を取得
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    write_events(trace_dir, [{
+        "name": name,
+        "cat": "stage",
+        "ph": "X",
+        "ts": start_us,
+        "dur": (time.perf_counter() - start_wall) * 1e6,
+        "pid": process.pid,
+        "tid": 0,
+        "args": {"cpu_s": usage.ru_utime + usage.ru_stime, "peak_rss_mb": get_peak_rss_mb(usage)}
+    }])
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)